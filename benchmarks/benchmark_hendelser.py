@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datasett import VaerDatasett
+from hendelser import finn_hendelser, oppsummer_hendelser, zverdier
+from benchmark_modelltrening import lag_data
+
+# Måler tiden for å finne alle hendelsestypene i hendelser.py på syntetiske døgndata for mange
+# stasjoner over flere tiår (standard 300 byer og 50 år).
+#
+# Kjøres med: python benchmarks/benchmark_hendelser.py [antall_byer] [antall_år]
+
+
+def mål(navn, funksjon):
+    start = time.perf_counter()
+    resultat = funksjon()
+    print(f"{navn:<36} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return resultat
+
+
+def main(antall_byer=300, antall_år=50):
+    datasett = VaerDatasett(lag_data(antall_byer, antall_år))
+    matrise = mål("daglig tabell", datasett.daglig)
+    print(f"{matrise.shape[0]:,} dager, {matrise.shape[1]} serier\n")
+
+    mål("z-verdier", lambda: zverdier(matrise))
+    hendelser = mål("alle hendelsestyper", lambda: finn_hendelser(matrise))
+    print(f"\n{len(hendelser):,} hendelser")
+    print(oppsummer_hendelser(hendelser).sum().to_string())
+
+
+if __name__ == '__main__':
+    argumenter = [int(a) for a in sys.argv[1:3]]
+    main(*argumenter)
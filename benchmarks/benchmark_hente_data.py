@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import requests
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from hente_data import hent_data_fra_frost
+from hente_data_async import hent_mange_fra_frost
+from frost_stub import FrostStub
+
+# Måler forespørsler per sekund mot en lokal Frost-stub:
+# - hent_data_fra_frost uten session (ny tilkobling per kall)
+# - hent_data_fra_frost med én requests.Session (keep-alive)
+# - AsyncFrostKlient med mange forespørsler underveis samtidig
+#
+# Kjøres med: python benchmarks/benchmark_hente_data.py [antall_forespørsler] [forsinkelse_sekunder]
+
+
+def mål(navn, antall, funksjon):
+    start = time.perf_counter()
+    funksjon()
+    tid = time.perf_counter() - start
+    print(f"{navn:<32} {antall / tid:8.1f} forespørsler/s ({tid:.2f} s)")
+
+
+def main(antall=200, forsinkelse=0.01):
+    liste_med_params = [{'sources': f'SN{i}', 'referencetime': '2022-01-01/2022-02-01'} for i in range(antall)]
+
+    with FrostStub(forsinkelse=forsinkelse) as stub:
+        endpoint = stub.endpoint
+        print(f"{antall} forespørsler, {forsinkelse * 1000:.0f} ms simulert serverforsinkelse\n")
+
+        mål("synkron, uten session", antall,
+            lambda: [hent_data_fra_frost(endpoint, p, 'id') for p in liste_med_params])
+
+        with requests.Session() as session:
+            mål("synkron, med session", antall,
+                lambda: [hent_data_fra_frost(endpoint, p, 'id', session=session) for p in liste_med_params])
+
+        mål("asynkron, 20 samtidige", antall,
+            lambda: hent_mange_fra_frost(endpoint, liste_med_params, 'id', maks_samtidige=20))
+
+
+if __name__ == '__main__':
+    antall = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    forsinkelse = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    main(antall, forsinkelse)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import statistics
+
+# Måler hvor lang tid det tar å importere modulene i src/ i en ny Python-prosess (slik en
+# arbeidsprosess gjør), og hvor mye av tiden som går til de tunge bibliotekene. Hver måling kjøres
+# i en egen prosess, så ingenting er importert på forhånd.
+#
+# Kjøres med: python benchmarks/benchmark_import.py [antall_gjentakelser]
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+MODULER = ["prediktiv_analyse", "statistikk_funksjoner", "datasett", "figurgenerering"]
+TUNGE = ["matplotlib", "seaborn", "plotly", "sklearn", "scipy"]
+
+KODE = """
+import sys, time
+start = time.perf_counter()
+import {modul}
+tid = time.perf_counter() - start
+print(tid, ",".join(m for m in {tunge!r} if m in sys.modules))
+"""
+
+
+def mål_import(modul, gjentakelser):
+    tider = []
+    for _ in range(gjentakelser):
+        utdata = subprocess.run([sys.executable, "-c", KODE.format(modul=modul, tunge=TUNGE)], cwd=SRC,
+                                capture_output=True, text=True, check=True).stdout.split()
+        tider.append(float(utdata[0]))
+    return statistics.median(tider), utdata[1] if len(utdata) > 1 else "-"
+
+
+def main(gjentakelser=5):
+    print(f"{'modul':<24} {'median':>8}  tunge biblioteker som lastes")
+    for modul in MODULER + TUNGE:
+        tid, lastet = mål_import(modul, gjentakelser)
+        print(f"{modul:<24} {tid:7.2f} s  {lastet}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datasett import VaerDatasett
+from imputering import finn_hull, imputer
+from benchmark_modelltrening import lag_data
+
+# Måler tiden for å finne og fylle hull i alle serier med imputering.py på syntetiske døgndata
+# for mange stasjoner, der 10 % av dagene er fjernet i hull på 1–10 dager. Lineær interpolasjon
+# sammenlignes med pandas' interpolate for én serie om gangen.
+#
+# Kjøres med: python benchmarks/benchmark_imputering.py [antall_byer] [antall_år]
+
+
+def mål(navn, funksjon):
+    start = time.perf_counter()
+    resultat = funksjon()
+    print(f"{navn:<40} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return resultat
+
+
+def lag_hull(matrise, andel=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    verdier = matrise.to_numpy(copy=True)
+    antall_hull = int(andel * verdier.size / 5.5)
+    start = rng.integers(0, len(verdier) - 10, antall_hull)
+    lengde = rng.integers(1, 11, antall_hull)
+    kolonne = rng.integers(0, verdier.shape[1], antall_hull)
+    for s, l, k in zip(start, lengde, kolonne):
+        verdier[s:s + l, k] = np.nan
+    return pd.DataFrame(verdier, index=matrise.index, columns=matrise.columns)
+
+
+def per_serie(matrise):
+    return pd.DataFrame({kolonne: matrise[kolonne].interpolate(limit_area="inside") for kolonne in matrise.columns})
+
+
+def main(antall_byer=300, antall_år=20):
+    matrise = lag_hull(VaerDatasett(lag_data(antall_byer, antall_år)).daglig())
+    print(f"{matrise.shape[0]:,} dager, {matrise.shape[1]} serier, "
+          f"{int(matrise.isna().sum().sum()):,} manglende verdier\n")
+
+    hull = mål("finn_hull", lambda: finn_hull(matrise))
+    print(f"  {len(hull):,} hull")
+    vektorisert = mål("lineær (alle serier samtidig)", lambda: imputer(matrise, "lineær"))
+    løkke = mål("lineær (pandas, én serie om gangen)", lambda: per_serie(matrise))
+    assert np.allclose(vektorisert.to_numpy(), løkke.to_numpy(), equal_nan=True)
+    mål("klimatologi", lambda: imputer(matrise, "klimatologi"))
+    mål("nabostasjon", lambda: imputer(matrise, "nabostasjon"))
+    mål("nabostasjon, så klimatologi", lambda: imputer(matrise, ["nabostasjon", "klimatologi"]))
+
+
+if __name__ == '__main__':
+    argumenter = [int(a) for a in sys.argv[1:3]]
+    main(*argumenter)
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from krysskorrelasjon import krysskorrelasjon, rullerende_korrelasjon
+
+# Måler krysskorrelasjon med forsinkelse for alle par av stasjoner over mange år med døgndata,
+# med direkte metode og FFT, og rullerende korrelasjon for alle par.
+#
+# Kjøres med: python benchmarks/benchmark_krysskorrelasjon.py [antall_stasjoner] [antall_år]
+
+
+def lag_matrise(antall_stasjoner, antall_år, seed=42):
+    """Lager døgnverdier for mange stasjoner som følger hverandre med noen dagers forsinkelse."""
+    rng = np.random.default_rng(seed)
+    antall_dager = int(antall_år * 365.25)
+    felles = rng.normal(size=antall_dager + antall_stasjoner)
+    verdier = np.column_stack([felles[i % 5:i % 5 + antall_dager] + rng.normal(size=antall_dager)
+                               for i in range(antall_stasjoner)])
+    verdier[rng.random(verdier.shape) < 0.02] = np.nan
+    return pd.DataFrame(verdier, index=pd.date_range('1970-01-01', periods=antall_dager, freq='D'),
+                        columns=[f'SN{10000 + i}' for i in range(antall_stasjoner)])
+
+
+def mål(navn, funksjon):
+    start = time.perf_counter()
+    funksjon()
+    print(f"{navn:<32} {time.perf_counter() - start:7.2f} s")
+
+
+def main(antall_stasjoner=100, antall_år=50):
+    matrise = lag_matrise(antall_stasjoner, antall_år)
+    antall_par = antall_stasjoner * antall_stasjoner
+    print(f"{antall_stasjoner} stasjoner, {len(matrise):,} dager, {antall_par:,} par\n")
+
+    for maks_forsinkelse in (7, 90):
+        for metode in ("direkte", "fft"):
+            mål(f"forsinkelse ±{maks_forsinkelse}, {metode}",
+                lambda: krysskorrelasjon(matrise, maks_forsinkelse, metode))
+    mål("rullerende (90 dager), 30 stasjoner", lambda: rullerende_korrelasjon(matrise.iloc[:, :30], vindu=90))
+
+
+if __name__ == '__main__':
+    antall_stasjoner = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    antall_år = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(antall_stasjoner, antall_år)
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datasett import VaerDatasett
+from prediktiv_analyse import tren_modell, tren_modeller
+
+# Måler modeller per sekund for tren_modeller (alle byer og målvariabler på én gang) mot å kalle
+# tren_modell for hver by og målvariabel, på syntetiske døgndata for mange stasjoner.
+#
+# Kjøres med: python benchmarks/benchmark_modelltrening.py [antall_byer] [antall_år]
+
+
+def lag_data(antall_byer, antall_år, seed=42):
+    """Lager behandlede værdata med temperatur og nedbør for mange byer, med ca. 5 % manglende verdier."""
+    rng = np.random.default_rng(seed)
+    datoer = pd.date_range('1970-01-01', periods=365 * antall_år, freq='D')
+    antall_dager = len(datoer)
+    dag_i_året = np.tile(datoer.dayofyear.to_numpy(), antall_byer)
+    temperatur = 5 - 10 * np.cos(2 * np.pi * dag_i_året / 365.25) + rng.normal(0, 3, antall_byer * antall_dager)
+    nedbør = np.maximum(0, 2 + 0.1 * temperatur + rng.normal(0, 3, antall_byer * antall_dager))
+    byer = np.repeat([f'By{i}' for i in range(antall_byer)], antall_dager)
+    tid = np.tile(datoer.to_numpy(), antall_byer)
+
+    df = pd.concat([pd.DataFrame({'by': byer, 'referenceTime': tid, 'variable': variabel, 'value': verdier})
+                    for variabel, verdier in (('air_temperature P1D', temperatur),
+                                              ('precipitation_amount P1D', nedbør))], ignore_index=True)
+    return df[rng.random(len(df)) > 0.05].reset_index(drop=True)
+
+
+def main(antall_byer=300, antall_år=20):
+    df = lag_data(antall_byer, antall_år)
+    datasett = VaerDatasett(df)
+    print(f"{len(df):,} rader, {antall_byer} byer, {antall_år} år\n")
+
+    start = time.perf_counter()
+    resultat = tren_modeller(datasett)
+    tid = time.perf_counter() - start
+    print(f"{'samlet':<10} {tid:7.2f} s  {len(resultat) / tid:8.0f} modeller/s")
+
+    start = time.perf_counter()
+    antall = 0
+    for by in datasett.byer():
+        data = datasett.strukturer(by=by)
+        for maalvariabel in ("temperatur", "nedbør"):
+            tren_modell(data, maalvariabel)
+            antall += 1
+    tid = time.perf_counter() - start
+    print(f"{'per by':<10} {tid:7.2f} s  {antall / tid:8.0f} modeller/s")
+
+
+if __name__ == '__main__':
+    argumenter = [int(a) for a in sys.argv[1:3]]
+    main(*argumenter)
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from data_behandling import DataBehandler
+
+# Måler rader per sekund for DataBehandler.omstrukturerer_data på en syntetisk rådataramme
+# med samme kolonner som VaerData.csv, og sammenligner med den opprinnelige fremgangsmåten
+# (pd.to_datetime(...).dt.date, str.extract per rad og reorganisering med kopi).
+#
+# Kjøres med: python benchmarks/benchmark_omstrukturering.py [antall_rader] [hopp_over_gammel]
+
+ELEMENTER = ['mean(air_temperature P1D)', 'sum(precipitation_amount P1D)', 'mean(wind_speed P1D)']
+ENHETER = ['degC', 'mm', 'm/s']
+
+
+def lag_rådata(antall_rader, antall_stasjoner=300, seed=42):
+    """Lager en syntetisk rådataramme med døgnverdier for mange stasjoner og tre elementer."""
+    rng = np.random.default_rng(seed)
+    antall_dager = max(1, antall_rader // (antall_stasjoner * len(ELEMENTER)) + 1)
+    datoer = pd.date_range('1950-01-01', periods=antall_dager, freq='D').strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    indeks = np.arange(antall_rader)
+    element = indeks % len(ELEMENTER)
+    stasjon = (indeks // len(ELEMENTER)) % antall_stasjoner
+    dag = indeks // (len(ELEMENTER) * antall_stasjoner)
+
+    return pd.DataFrame({
+        'sourceId': np.array([f'SN{10000 + i}' for i in range(antall_stasjoner)], dtype=object)[stasjon],
+        'referenceTime': np.asarray(datoer, dtype=object)[dag],
+        'elementId': np.array(ELEMENTER, dtype=object)[element],
+        'value': rng.normal(5, 8, antall_rader).round(1),
+        'unit': np.array(ENHETER, dtype=object)[element],
+        'codequality': rng.integers(0, 7, antall_rader),
+    }), {f'By{i}': f'SN{10000 + i}' for i in range(antall_stasjoner)}
+
+
+def gammel_omstrukturering(df, byer):
+    df['referenceTime'] = pd.to_datetime(df['referenceTime']).dt.date
+    df[['statistikk', 'variable']] = df['elementId'].str.extract(r'(\w+)\(([^)]+)')
+    df['by'] = df['sourceId'].map({v: k for k, v in byer.items()})
+    return df[['by', 'sourceId', 'referenceTime', 'statistikk', 'variable', 'value', 'unit', 'codequality']]
+
+
+def mål(navn, antall_rader, funksjon):
+    start = time.perf_counter()
+    funksjon()
+    tid = time.perf_counter() - start
+    print(f"{navn:<10} {tid:7.2f} s  {antall_rader / tid / 1e6:7.2f} mill. rader/s")
+
+
+def main(antall_rader=10_000_000, hopp_over_gammel=False):
+    df, byer = lag_rådata(antall_rader)
+    print(f"{antall_rader:,} rader, {df['sourceId'].nunique()} stasjoner, {df['referenceTime'].nunique()} datoer\n")
+
+    mål("ny", antall_rader, lambda: DataBehandler(df.copy(), byer).omstrukturerer_data())
+    if not hopp_over_gammel:
+        mål("gammel", antall_rader, lambda: gammel_omstrukturering(df.copy(), byer))
+
+
+if __name__ == '__main__':
+    antall_rader = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    hopp_over_gammel = len(sys.argv) > 2 and sys.argv[2] == 'hopp_over_gammel'
+    main(antall_rader, hopp_over_gammel)
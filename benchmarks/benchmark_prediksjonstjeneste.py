@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+import time
+import http.client
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datasett import VaerDatasett
+from modellregister import Modellregister
+from prediksjonstjeneste import Prediksjonstjeneste, lag_server
+from benchmark_modelltrening import lag_data
+
+# Måler latens og gjennomstrømning for prediksjonstjenesten på syntetiske data: enkeltforespørsler
+# og bunker, både direkte i prosessen og over HTTP på denne maskinen. Modellene trenes i en
+# midlertidig mappe, så ingenting leses fra eller skrives til data/.
+#
+# Kjøres med: python benchmarks/benchmark_prediksjonstjeneste.py [antall_byer] [antall_år]
+
+
+def lag_forespørsler(byer, antall, seed=1):
+    rng = np.random.default_rng(seed)
+    forespørsler = []
+    for i in range(antall):
+        by = byer[rng.integers(len(byer))]
+        if i % 2:
+            forespørsler.append({'by': by, 'maalvariabel': 'temperatur', 'egenskaper': {'nedbør': float(rng.gamma(1, 3))}})
+        else:
+            forespørsler.append({'by': by, 'maalvariabel': 'temperatur'})
+    return forespørsler
+
+
+def skriv(navn, latenser, antall_prediksjoner):
+    latenser = np.array(latenser) * 1000
+    print(f"{navn:<28} p50 {np.percentile(latenser, 50):8.3f} ms  p99 {np.percentile(latenser, 99):8.3f} ms  "
+          f"{antall_prediksjoner / (latenser.sum() / 1000):10.0f} prediksjoner/s")
+
+
+def mål(navn, kall, bunker):
+    latenser = []
+    for bunke in bunker:
+        start = time.perf_counter()
+        kall(bunke)
+        latenser.append(time.perf_counter() - start)
+    skriv(navn, latenser, sum(len(b) if isinstance(b, list) else 1 for b in bunker))
+
+
+def main(antall_byer=300, antall_år=20):
+    datasett = VaerDatasett(lag_data(antall_byer, antall_år))
+    with tempfile.TemporaryDirectory() as mappe:
+        start = time.perf_counter()
+        Prediksjonstjeneste(datasett, register=Modellregister(mappe))
+        print(f"første oppstart (trener modellene): {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        tjeneste = Prediksjonstjeneste(datasett, register=Modellregister(mappe))
+        print(f"oppstart med lagrede modeller:      {time.perf_counter() - start:.2f} s\n")
+
+        enkle = lag_forespørsler(datasett.byer(), 5000)
+        bunker = [lag_forespørsler(datasett.byer(), 1000, seed=i) for i in range(20)]
+        mål("i prosessen, enkeltvis", tjeneste.prediker, enkle)
+        mål("i prosessen, bunker á 1000", tjeneste.prediker, bunker)
+
+        server = lag_server(tjeneste, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        tilkobling = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+
+        def post(innhold):
+            tilkobling.request('POST', '/prediker', body=json.dumps(innhold), headers={'Content-Type': 'application/json'})
+            return json.loads(tilkobling.getresponse().read())
+
+        mål("HTTP, enkeltvis", post, enkle[:2000])
+        mål("HTTP, bunker á 1000", post, bunker)
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    argumenter = [int(a) for a in sys.argv[1:3]]
+    main(*argumenter)
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datasett import VaerDatasett
+from prognose import Prognosemodell, walk_forward
+from benchmark_modelltrening import lag_data
+
+# Måler tiden for prognosemodellen i prognose.py på syntetiske døgndata for mange stasjoner:
+# trening fra bunnen av, walk-forward-evaluering, oppdatering med én ny dag og prognose for
+# neste dag (median av flere kjøringer).
+#
+# Kjøres med: python benchmarks/benchmark_prognose.py [antall_byer] [antall_år]
+
+
+def mål(navn, funksjon, gjentakelser=1):
+    tider = []
+    for _ in range(gjentakelser):
+        start = time.perf_counter()
+        funksjon()
+        tider.append(time.perf_counter() - start)
+    print(f"{navn:<32} {np.median(tider) * 1000:9.1f} ms")
+
+
+def main(antall_byer=300, antall_år=20):
+    df = lag_data(antall_byer, antall_år)
+    tid = pd.to_datetime(df['referenceTime'])
+    siste_dag = tid.max()
+    historikk, ny_dag = df[tid < siste_dag], df[tid == siste_dag]
+    datasett, datasett_historikk = VaerDatasett(df), VaerDatasett(historikk)
+    print(f"{len(df):,} rader, {antall_byer} byer, {antall_år} år\n")
+
+    mål("trening (alle dager)", lambda: Prognosemodell().tren(datasett))
+    mål("walk-forward (5 fold)", lambda: walk_forward(datasett))
+
+    modell = Prognosemodell().tren(datasett_historikk)
+    ny_dag_datasett = VaerDatasett(ny_dag)
+
+    def oppdater():
+        kopi = Prognosemodell()
+        kopi.__dict__.update({k: (v.copy() if hasattr(v, "copy") else v) for k, v in modell.__dict__.items()})
+        kopi.oppdater(ny_dag_datasett)
+
+    mål("oppdatering med én ny dag", oppdater, 20)
+    mål(f"prognose for neste dag ({antall_byer} byer)", modell.prediker, 20)
+
+
+if __name__ == '__main__':
+    argumenter = [int(a) for a in sys.argv[1:3]]
+    main(*argumenter)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from aiohttp import web
+
+# Lokal erstatning for Frost API som brukes i benchmarks og tester. Serveren svarer på
+# /observations/v0.jsonld med et Frost-lignende JSON-svar for stasjonen i 'sources', og kan
+# settes til å svare 429 Too Many Requests på hver n-te forespørsel.
+
+
+def lag_svar(kilde='SN18700', antall_dager=30):
+    """Lager et Frost-lignende JSON-svar med `antall_dager` observasjoner for én stasjon."""
+    data = []
+    for dag in range(antall_dager):
+        data.append({
+            'sourceId': f'{kilde}:0',
+            'referenceTime': f'2022-01-{dag % 28 + 1:02d}T00:00:00.000Z',
+            'observations': [
+                {'elementId': 'mean(air_temperature P1D)', 'value': -2.3, 'unit': 'degC', 'qualityCode': 0},
+                {'elementId': 'sum(precipitation_amount P1D)', 'value': 0.0, 'unit': 'mm', 'qualityCode': 0},
+            ],
+        })
+    return {'@type': 'ObservationResponse', 'totalItemCount': len(data), 'data': data}
+
+
+class FrostStub:
+    """
+    Starter en lokal HTTP-server i en egen tråd.
+
+    >>> with FrostStub(hver_n_te_429=5) as stub:
+    ...     url = stub.endpoint
+    """
+
+    def __init__(self, hver_n_te_429=0, retry_after='0', forsinkelse=0.0, antall_dager=30):
+        self.hver_n_te_429 = hver_n_te_429
+        self.retry_after = retry_after
+        self.forsinkelse = forsinkelse
+        self.antall_dager = antall_dager
+        self._svar = {}
+        self.antall_kall = 0
+        self._klar = threading.Event()
+
+    async def _håndter(self, request):
+        self.antall_kall += 1
+        if self.forsinkelse:
+            await asyncio.sleep(self.forsinkelse)
+        if self.hver_n_te_429 and self.antall_kall % self.hver_n_te_429 == 0:
+            return web.Response(status=429, headers={'Retry-After': self.retry_after})
+        # Svaret gjelder stasjonen i forespørselen, så rekkefølgen på svarene kan sjekkes
+        kilde = request.query.get('sources', 'SN18700')
+        if kilde not in self._svar:
+            self._svar[kilde] = lag_svar(kilde, self.antall_dager)
+        respons = web.json_response(self._svar[kilde])
+        respons.enable_compression()
+        return respons
+
+    def _kjør(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get('/observations/v0.jsonld', self._håndter)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        self._loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.endpoint = f'http://127.0.0.1:{port}/observations/v0.jsonld'
+        self._klar.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def __enter__(self):
+        self._tråd = threading.Thread(target=self._kjør, daemon=True)
+        self._tråd.start()
+        self._klar.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._tråd.join()
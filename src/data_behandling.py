@@ -1,7 +1,49 @@
 import pandas as pd
 import json
+import os
+import shutil
 import numpy as np
 
+# Parquet-lagringen (pyarrow) og aggregatene importeres først i metodene som bruker dem, slik at
+# det går raskt å importere DataBehandler for å bare omstrukturere data (f.eks. i hente_data).
+
+# Kategoriene for 'codequality', fra best til dårligst
+KVALITETSKATEGORIER = ["God", "Middels", "Dårlig"]
+
+# Tekstkolonner med få unike verdier, som lagres som kategorier
+KATEGORISKE_KOLONNER = ['by', 'sourceId', 'statistikk', 'variable', 'unit']
+
+
+def _tolk_datoer(verdier):
+    """
+    Gjør om tidspunkter (f.eks. '2022-01-01T00:00:00.000Z') til datoer som datetime64.
+    ISO-strenger tolkes direkte fra de ti første tegnene; andre formater tolkes generelt.
+    """
+    if pd.api.types.is_datetime64_any_dtype(verdier):
+        tider = pd.DatetimeIndex(verdier)
+        return (tider.tz_localize(None) if tider.tz is not None else tider).normalize()
+
+    tekst = pd.Index(verdier, dtype=object).astype(str)
+    datoer = pd.to_datetime(tekst.str[:10], format='%Y-%m-%d', errors='coerce')
+    if datoer.isna().any():
+        # Ikke ISO-format; faller tilbake til generell tolkning av hele verdien
+        datoer = pd.DatetimeIndex(pd.to_datetime(pd.Index(verdier, dtype=object), utc=True, format='mixed'))
+        datoer = datoer.tz_localize(None).normalize()
+    return datoer
+
+
+def _kategori_fra_koder(koder, verdier_per_kode):
+    """
+    Lager en Categorical der rad i får verdien verdier_per_kode[koder[i]].
+    Kode -1 og manglende verdier gir NaN.
+    """
+    verdier_per_kode = pd.Series(verdier_per_kode, dtype=object)
+    kategorier = pd.unique(verdier_per_kode.dropna())
+    kategori_koder = pd.Index(kategorier, dtype=object).get_indexer(verdier_per_kode)
+    rad_koder = np.append(kategori_koder, -1)[koder]
+    return pd.Categorical.from_codes(rad_koder, categories=pd.Index(kategorier, dtype=object))
+
+
 class DataBehandler:
     def __init__(self, df, byer_dict):
         """
@@ -55,27 +97,55 @@ class DataBehandler:
     def omstrukturerer_data(self):
         """
         Forbedrer lesbarheten og strukturen i datasettet:
-        - Konverterer tidskolonnen 'referenceTime' til kun dato.
+        - Konverterer tidskolonnen 'referenceTime' til kun dato (datetime64).
         - Splitter opp 'elementId' i to kolonner: 'statistikk' og 'variable'.
         - Legger til bynavn basert på 'sourceId'.
         - Reorganiserer kolonnene i en ny, mer ryddig rekkefølge.
 
+        Kolonnene 'referenceTime', 'elementId' og 'sourceId' har få unike verdier sammenlignet
+        med antall rader. Hver unike verdi tolkes derfor bare én gang, og resultatet spres ut
+        til radene via heltallskoder (pd.factorize), i stedet for å tolke hver rad for seg.
+
         Returnerer:
             pd.DataFrame: Et oppdatert og forbedret DataFrame.
         """
+        df = self.df
+
         # Fjerner tidspunkt og beholder kun dato
-        self.df['referenceTime'] = pd.to_datetime(self.df['referenceTime']).dt.date
+        tid_koder, unike_tider = pd.factorize(df['referenceTime'])
+        if len(unike_tider):
+            datoer = _tolk_datoer(unike_tider).to_numpy()
+        else:
+            # Alle tidspunktene mangler
+            datoer = np.array([], dtype='datetime64[ns]')
+        # Kode -1 (manglende tidspunkt) peker på NaT lagt til sist, som i _kategori_fra_koder
+        referenceTime = np.append(datoer, np.datetime64('NaT'))[tid_koder]
 
         # Splitter elementId inn i to separate kolonner: 'statistikk' og 'variable'
-        self.df[['statistikk', 'variable']] = self.df['elementId'].str.extract(r'(\w+)\(([^)]+)')
+        element_koder, unike_elementer = pd.factorize(df['elementId'])
+        deler = pd.Series(unike_elementer, dtype=object).str.extract(r'(\w+)\(([^)]+)')
+        statistikk = _kategori_fra_koder(element_koder, deler[0])
+        variable = _kategori_fra_koder(element_koder, deler[1])
 
         # Mapper 'sourceId' til bynavn basert på byer-dictionary
-        self.df['by'] = self.df['sourceId'].map({v: k for k, v in self.byer.items()})
-
-        # Reorganiserer kolonner for bedre struktur
-        self.df = self.df[['by', 'sourceId', 'referenceTime', 'statistikk', 'variable', 'value', 'unit', 'codequality']]
-
-        return self.df
+        kilde_koder, unike_kilder = pd.factorize(df['sourceId'])
+        by = _kategori_fra_koder(kilde_koder, pd.Series(unike_kilder, dtype=object).map({v: k for k, v in self.byer.items()}))
+        sourceId = _kategori_fra_koder(kilde_koder, pd.Series(unike_kilder, dtype=object))
+
+        # Bygger den nye tabellen direkte i ny rekkefølge, uten mellomliggende kopier
+        self.df = pd.DataFrame({
+            'by': by,
+            'sourceId': sourceId,
+            'referenceTime': referenceTime,
+            'statistikk': statistikk,
+            'variable': variable,
+            'value': df['value'].to_numpy(),
+            'unit': df['unit'],
+            'codequality': df['codequality'],
+        }, index=df.index)
+
+        # Lagrer tekstkolonnene som kategorier for å spare minne
+        return self.konverter_til_kategorier()
 
     
     def lagre_data(self, filsti='../data/BehandletVaerData.csv'):
@@ -116,6 +186,70 @@ class DataBehandler:
             print(f"\nKlarte ikke å lagre rådata til {filsti}. Feil: {e}")
 
 
+    def lagre_data_parquet(self, mappe='../data/BehandletVaerData'):
+        """
+        Lagrer den behandlede DataFrame-en som et Parquet-datasett partisjonert på variabel og år.
+
+        Parametere:
+        - mappe (str): Mappen datasettet lagres i. Standard er '../data/BehandletVaerData'.
+
+        Returnerer:
+        - None
+
+        Skriver en bekreftelse hvis lagringen lykkes, eller en feilmelding hvis noe går galt.
+        """
+        from lagring import lagre_parquet
+        try:
+            lagre_parquet(self.df, mappe, partisjoner=('variable', 'år'))
+            print(f"\nBehandlet data lagret i: {mappe}")
+        except Exception as e:
+            print(f"\nKlarte ikke å lagre data til {mappe}. Feil: {e}")
+
+    def lagre_rådata_parquet(self, mappe='../data/VaerData'):
+        """
+        Lagrer rådataen som et Parquet-datasett. Rådataen har ikke kolonnen 'variable' ennå,
+        så den partisjoneres på 'elementId' og år.
+
+        Parametere:
+        - mappe (str): Mappen datasettet lagres i. Standard er '../data/VaerData'.
+
+        Returnerer:
+        - None
+
+        Skriver en bekreftelse hvis lagringen lykkes, eller en feilmelding hvis noe går galt.
+        """
+        from lagring import lagre_parquet
+        try:
+            lagre_parquet(self.df, mappe, partisjoner=('elementId', 'år'))
+            print(f"\nRådata lagret i: {mappe}")
+        except Exception as e:
+            print(f"\nKlarte ikke å lagre rådata til {mappe}. Feil: {e}")
+
+    def lagre_aggregater(self, mappe='../data/Aggregater', legg_til=False):
+        """
+        Lagrer aggregater per uke, måned, sesong og år for hver by og variabel ved siden av de
+        behandlede dataene, slik at trendplott kan lese dem i stedet for å gruppere dagverdiene.
+
+        Parametere:
+        - mappe (str): Mappen aggregatene lagres i. Standard er '../data/Aggregater'.
+        - legg_til (bool): Hvis True er radene nye dager som legges til de lagrede aggregatene
+          (bare de berørte periodene endres). Ellers erstattes aggregatene.
+
+        Returnerer:
+        - None
+
+        Skriver en bekreftelse hvis lagringen lykkes, eller en feilmelding hvis noe går galt.
+        """
+        from tidsaggregater import beregn_aggregater, lagre_aggregater, oppdater_aggregater
+        try:
+            if legg_til:
+                oppdater_aggregater(self.df, mappe)
+            else:
+                lagre_aggregater(beregn_aggregater(self.df), mappe)
+            print(f"\nAggregater lagret i: {mappe}")
+        except Exception as e:
+            print(f"\nKlarte ikke å lagre aggregater til {mappe}. Feil: {e}")
+
     def tell_kalde_dager(self):
         """
         Returnerer en DataFrame med rader for alle dager der temperaturen (air_temperature P1D) er under 0 grader,
@@ -135,6 +269,29 @@ class DataBehandler:
 
         print(f"Fant {len(kalde_dager)} kalde dager.")
         return kalde_dager
+
+    def finn_hendelser(self, typer=None):
+        """
+        Finner kuldeperioder, hetebølger, dager med kraftig nedbør og mistenkelige verdier for
+        alle byer (se hendelser.finn_hendelser). Krever at dataene er omstrukturert.
+
+        Parametere:
+        - typer (list): Hendelsestypene som skal finnes. Standard er alle i hendelser.HENDELSESTYPER.
+
+        Returnerer:
+        - DataFrame med én rad per hendelse (by, start, slutt, varighet og toppverdi)
+        """
+        # Importeres her, slik at DataBehandler (og hente_data) ikke laster analysemodulene
+        from hendelser import HENDELSESTYPER, KOLONNER, finn_hendelser
+
+        if not {'by', 'referenceTime', 'variable', 'value'}.issubset(self.df.columns):
+            print("DataFrame mangler nødvendige kolonner.")
+            return pd.DataFrame(columns=KOLONNER)
+
+        hendelser = finn_hendelser(self.df[['by', 'referenceTime', 'variable', 'value']], typer)
+        antall = hendelser['hendelse'].value_counts()
+        print("Fant " + ", ".join(f"{antall.get(t, 0)} {t}" for t in (typer or HENDELSESTYPER)) + ".")
+        return hendelser
     
     def klassifiser_codequality(self):
         """
@@ -143,26 +300,127 @@ class DataBehandler:
         - 3-5: Middels
         - 6 og høyere: Dårlig
 
+        Klassifiseringen gjøres vektorisert med faste intervaller (np.digitize) i stedet for
+        en Python-funksjon per rad. Verdier som allerede er klassifisert beholdes, og andre
+        verdier (f.eks. negative tall eller desimaltall) regnes som Dårlig, som før.
+
         Returnerer:
-            DataFrame med oppdatert 'codequality'-kolonne som kategorisk tekst.
+            DataFrame med oppdatert 'codequality'-kolonne som ordnet kategori (God < Middels < Dårlig).
         """
         if 'codequality' not in self.df.columns:
             print("Kolonnen 'codequality' finnes ikke i DataFrame.")
             return self.df
 
-        def vurder(x):
-            if pd.isna(x):
-                return x  # Behold NaN som NaN
-            elif x in [0, 1, 2]:
-                return "God"
-            elif x in [3, 4, 5]:
-                return "Middels"
-            else:
-                return "Dårlig"
+        kolonne = self.df['codequality']
+        if isinstance(kolonne.dtype, pd.CategoricalDtype):
+            kolonne = kolonne.astype(object)
+
+        tall = pd.to_numeric(kolonne, errors='coerce').to_numpy(dtype=float)
+        # Intervallene [0, 3), [3, 6) og [6, ∞) gir kodene 0, 1 og 2
+        koder = np.digitize(tall, [0, 3, 6]) - 1
+        ugyldig = (koder < 0) | (tall != np.floor(tall))
+        koder[ugyldig] = 2
 
-        self.df['codequality'] = self.df['codequality'].apply(vurder)
+        # Verdier som allerede er tekstkategorier beholdes
+        if not pd.api.types.is_numeric_dtype(kolonne):
+            eksisterende = pd.Index(KVALITETSKATEGORIER).get_indexer(kolonne)
+            koder = np.where(eksisterende >= 0, eksisterende, koder)
+        koder[kolonne.isna().to_numpy()] = -1
+
+        self.df['codequality'] = pd.Categorical.from_codes(koder.astype(np.int8),
+                                                           categories=KVALITETSKATEGORIER, ordered=True)
         return self.df
 
+    def konverter_til_kategorier(self, kolonner=KATEGORISKE_KOLONNER):
+        """
+        Gjør om tekstkolonner med få unike verdier (by, stasjon, variabel, statistikk, enhet)
+        til pandas Categorical, slik at hver verdi bare lagres én gang og hver rad som en heltallskode.
+
+        Parametere:
+        - kolonner (list): Kolonnene som skal konverteres. Kolonner som ikke finnes, eller som
+          er numeriske, hoppes over.
+
+        Returnerer:
+            DataFrame med kategoriske kolonner.
+        """
+        for kolonne in kolonner:
+            if kolonne in self.df.columns and not pd.api.types.is_numeric_dtype(self.df[kolonne]) \
+                    and not isinstance(self.df[kolonne].dtype, pd.CategoricalDtype):
+                self.df[kolonne] = self.df[kolonne].astype('category')
+        return self.df
+
+    @classmethod
+    def behandle_i_biter(cls, kilde, mål, byer_dict, bitestørrelse=1_000_000, aggregat_mappe=None):
+        """
+        Behandler rådata som er for store til å ligge i minnet i sin helhet. Dataene leses bit
+        for bit og går gjennom de samme stegene som ellers (omstrukturerer_data,
+        fyll_manglende_codequality og klassifiser_codequality), og hver ferdige bit skrives
+        rett til målet. Minnebruken styres dermed av bitestørrelsen, ikke av filstørrelsen.
+
+        Modusen til 'codequality' må gjelde hele datasettet, så den finnes i en første
+        gjennomgang som bare leser 'codequality' og teller forekomstene.
+
+        Parametere:
+        - kilde (str): Rådata som CSV-fil eller Parquet (fil eller mappe).
+        - mål (str): CSV-fil (slutter på .csv) eller Parquet-mappe (partisjonert på variabel og år).
+          En eksisterende CSV-fil overskrives. En eksisterende mappe slettes bare hvis den er et
+          datasett skrevet av lagre_parquet (bare 'variable=...'-mapper); ellers må den være tom.
+        - byer_dict (dict): Ordbok som kobler bynavn til stasjonskoder.
+        - bitestørrelse (int): Antall rader som behandles om gangen.
+        - aggregat_mappe (str): Hvis oppgitt bygges også aggregatene per uke, måned, sesong og år
+          underveis og lagres i denne mappen (se tidsaggregater).
+
+        Returnerer:
+        - int: Antall rader som ble skrevet, eller None hvis målmappen ikke kunne overskrives.
+        """
+        from lagring import er_partisjonert_datasett, lagre_parquet, les_i_biter
+        from tidsaggregater import beregn_aggregater, lagre_aggregater, slå_sammen_aggregater
+
+        skriv_csv = str(mål).endswith('.csv')
+        if not skriv_csv and os.path.isdir(mål) and os.listdir(mål):
+            # Sletter bare en mappe som tydelig er et tidligere datasett, ikke hva som helst
+            if not er_partisjonert_datasett(mål):
+                print(f"Feil: Mappen {mål} er ikke tom og ser ikke ut som et Parquet-datasett. "
+                      "Velg en annen mappe eller tøm den først.")
+                return None
+            shutil.rmtree(mål)
+
+        # Første gjennomgang: teller verdiene i 'codequality' for å finne modus
+        tellinger = None
+        for bit in les_i_biter(kilde, bitestørrelse, kolonner=['codequality']):
+            antall = bit['codequality'].value_counts()
+            tellinger = antall if tellinger is None else tellinger.add(antall, fill_value=0)
+        mest_vanlige = None
+        if tellinger is not None and len(tellinger):
+            # Som Series.mode(): ved likt antall velges den minste verdien
+            mest_vanlige = tellinger[tellinger == tellinger.max()].index.min()
+
+        # Andre gjennomgang: behandler og skriver én bit om gangen
+        totalt = 0
+        aggregater = {}
+        for nummer, bit in enumerate(les_i_biter(kilde, bitestørrelse)):
+            behandler = cls(bit, byer_dict)
+            behandler.omstrukturerer_data()
+            if mest_vanlige is not None:
+                behandler.df['codequality'] = behandler.df['codequality'].fillna(mest_vanlige)
+            behandler.klassifiser_codequality()
+
+            if skriv_csv:
+                behandler.df.to_csv(mål, index=False, mode='w' if nummer == 0 else 'a', header=nummer == 0)
+            else:
+                lagre_parquet(behandler.df, mål, partisjoner=('variable', 'år'), bitnummer=nummer)
+            totalt += len(behandler.df)
+
+            if aggregat_mappe is not None:
+                for oppløsning, aggregat in beregn_aggregater(behandler.df).items():
+                    aggregater[oppløsning] = slå_sammen_aggregater(aggregater.get(oppløsning), aggregat)
+
+        if aggregat_mappe is not None and aggregater:
+            lagre_aggregater(aggregater, aggregat_mappe)
+
+        print(f"\nBehandlet {totalt} rader i biter på {bitestørrelse} og lagret i: {mål}")
+        return totalt
+
     @staticmethod
     def les_byer_fra_fil(filbane):
         """
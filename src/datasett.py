@@ -0,0 +1,198 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from lagring import les_data
+
+# Datasett som leses og pivoteres én gang. Dataene holdes i minnet som brede tabeller
+# (dato × (by, variabel)) med sum og antall observasjoner, slik at gjennomsnitt per by, på tvers
+# av byer og listen over byer kan hentes ut uten å lese filen eller pivotere på nytt.
+
+STANDARD_NAVN = {
+    "air_temperature P1D": "temperatur",
+    "precipitation_amount P1D": "nedbør",
+    "wind_speed P1D": "vindstyrke",
+}
+
+
+class VaerDatasett:
+    def __init__(self, df):
+        """
+        Bygger de brede tabellene fra værdata i langt format.
+
+        Parametre:
+        - df (DataFrame): Værdata med kolonnene by, referenceTime, variable og value
+          (som BehandletVaerData.csv).
+        """
+        dato = pd.to_datetime(df["referenceTime"], utc=True).dt.tz_localize(None).dt.normalize()
+        gruppert = (df.assign(dato=dato)
+                      .groupby(["dato", "by", "variable"], observed=True, dropna=False)["value"]
+                      .agg(["sum", "count"]))
+
+        # Én enkelt pivotering; alt annet hentes ut av disse to tabellene
+        self.summer = gruppert["sum"].unstack(["by", "variable"]).sort_index()
+        self.antall = gruppert["count"].unstack(["by", "variable"]).reindex(self.summer.index).fillna(0)
+        self.summer.index.name = "dato"
+        self.antall.index.name = "dato"
+
+        # Byene i samme rekkefølge som de først dukker opp i dataene
+        self._byer = [str(by) for by in pd.unique(df["by"].dropna())]
+        self._visninger = {}
+        self._innholdshash = None
+
+    @classmethod
+    def fra_fil(cls, filsti):
+        """
+        Leser værdata fra CSV eller Parquet (bare kolonnene som trengs) og bygger datasettet.
+
+        Parametre:
+        - filsti (str): Filsti til CSV-filen eller Parquet-mappen.
+        """
+        return cls(les_data(filsti, kolonner=["by", "referenceTime", "variable", "value"]))
+
+    def byer(self):
+        """Returnerer en liste med unike byer i datasettet."""
+        return list(self._byer)
+
+    def variabler(self):
+        """Returnerer en liste med unike variabler i datasettet."""
+        return list(pd.unique(self.summer.columns.get_level_values("variable").dropna()))
+
+    def innholdshash(self):
+        """
+        Returnerer en hash av dataene (summer og antall per dato, by og variabel), som er lik for
+        datasett med like data. Regnes bare ut første gang.
+        """
+        if self._innholdshash is None:
+            hasher = hashlib.sha256()
+            for tabell in (self.summer, self.antall):
+                hasher.update(repr(list(tabell.columns)).encode("utf-8"))
+                hasher.update(pd.util.hash_pandas_object(tabell, index=True).to_numpy().tobytes())
+            self._innholdshash = hasher.hexdigest()
+        return self._innholdshash
+
+    def bred(self, by=None, variabler=None):
+        """
+        Returnerer gjennomsnittsverdier med én rad per dato og én kolonne per variabel.
+
+        Parametre:
+        - by (str): Hvis by er oppgitt brukes bare denne byen; ellers tas gjennomsnittet av alle
+          observasjoner på tvers av byer (som pivot_table med aggfunc="mean").
+        - variabler (list): Variablene som skal være med. Standard er alle.
+
+        Returnerer:
+        - DataFrame: Indeks 'dato' og én kolonne per variabel. Resultatet mellomlagres, så
+          samme visning regnes bare ut én gang.
+        """
+        nøkkel = (by, tuple(variabler) if variabler is not None else None)
+        if nøkkel not in self._visninger:
+            if by:
+                if by in self.summer.columns.get_level_values("by"):
+                    summer = self.summer.xs(by, axis=1, level="by")
+                    antall = self.antall.xs(by, axis=1, level="by")
+                else:
+                    summer = pd.DataFrame(index=self.summer.index[:0])
+                    antall = summer
+            else:
+                summer = self.summer.T.groupby(level="variable", sort=False).sum(min_count=1).T
+                antall = self.antall.T.groupby(level="variable", sort=False).sum().T
+            if variabler is not None:
+                summer = summer.reindex(columns=list(variabler))
+                antall = antall.reindex(columns=list(variabler))
+            gjennomsnitt = summer / antall.where(antall > 0)
+            gjennomsnitt.columns.name = "variable"
+            self._visninger[nøkkel] = gjennomsnitt.dropna(how="all")
+        return self._visninger[nøkkel].copy()
+
+    def matrise(self, byer=None, variabler=None):
+        """
+        Returnerer gjennomsnittsverdier med én rad per dato og én kolonne per (by, variabel),
+        der alle kolonnene er justert på samme datoer.
+
+        Parametre:
+        - byer (list): Byene som skal være med. Standard er alle.
+        - variabler (list): Variablene som skal være med. Standard er alle.
+
+        Returnerer:
+        - DataFrame: Indeks 'dato' og kolonner med MultiIndex (by, variable).
+        """
+        gjennomsnitt = self.summer / self.antall.where(self.antall > 0)
+        kolonner = gjennomsnitt.columns
+        maske = np.ones(len(kolonner), dtype=bool)
+        if byer is not None:
+            maske &= kolonner.get_level_values("by").isin(list(byer))
+        if variabler is not None:
+            maske &= kolonner.get_level_values("variable").isin(list(variabler))
+        return gjennomsnitt.loc[:, maske].dropna(how="all")
+
+    def daglig(self, byer=None, variabler=None):
+        """
+        Som matrise, men med én rad for hver dag fra første til siste dato (dager uten data får
+        NaN) og én kolonne for hver kombinasjon av byene og variablene, også de uten data.
+
+        Parametre:
+        - byer (list): Byene som skal være med. Standard er alle.
+        - variabler (list): Variablene som skal være med. Standard er alle.
+
+        Returnerer:
+        - DataFrame: Indeks 'dato' med daglig frekvens og kolonner med MultiIndex (by, variable).
+        """
+        byer = self.byer() if byer is None else list(byer)
+        variabler = self.variabler() if variabler is None else list(variabler)
+        matrise = self.matrise(byer, variabler)
+        if len(matrise):
+            matrise = matrise.asfreq("D")
+        kolonner = pd.MultiIndex.from_product([byer, variabler], names=["by", "variable"])
+        return matrise.reindex(columns=kolonner)
+
+    def strukturer(self, by=None, variabler=("air_temperature P1D", "precipitation_amount P1D"),
+                   navn=None, fjern_manglende=True):
+        """
+        Returnerer data på formen som brukes i den prediktive analysen: kolonnen 'dato' og én
+        kolonne per variabel med norske navn (f.eks. temperatur og nedbør).
+
+        Parametre:
+        - by (str): Hvis by er oppgitt filtreres data kun for denne byen.
+        - variabler (tuple): Variablene som skal være med.
+        - navn (dict): Nye kolonnenavn for variablene. Standard er STANDARD_NAVN.
+        - fjern_manglende (bool): Fjern datoer der en av variablene mangler.
+
+        Returnerer:
+        - DataFrame: Kolonnene dato og de valgte variablene.
+        """
+        navn = navn or STANDARD_NAVN
+        df = self.bred(by, sorted(variabler)).rename(columns=navn).reset_index()
+        if fjern_manglende:
+            df = df.dropna(subset=[navn.get(v, v) for v in variabler]).reset_index(drop=True)
+        return df
+
+
+_datasett_cache = {}
+
+
+def filversjon(filsti):
+    """Returnerer en nøkkel som endres når filen (eller en fil i Parquet-mappen) endres."""
+    if os.path.isdir(filsti):
+        filer = [os.path.join(mappe, fil) for mappe, _, filnavn in os.walk(filsti) for fil in filnavn]
+    else:
+        filer = [filsti]
+    statistikk = [os.stat(fil) for fil in filer]
+    return (len(filer), max((s.st_mtime_ns for s in statistikk), default=0), sum(s.st_size for s in statistikk))
+
+
+def hent_datasett(filsti):
+    """
+    Returnerer et VaerDatasett for filen, og leser filen bare på nytt hvis den er endret siden sist.
+
+    Parametre:
+    - filsti (str): Filsti til CSV-filen eller Parquet-mappen.
+
+    Returnerer:
+    - VaerDatasett
+    """
+    nøkkel = os.path.abspath(filsti)
+    versjon = filversjon(filsti)
+    lagret = _datasett_cache.get(nøkkel)
+    if lagret is None or lagret[0] != versjon:
+        _datasett_cache[nøkkel] = (versjon, VaerDatasett.fra_fil(filsti))
+    return _datasett_cache[nøkkel][1]
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+# Lager alle standardfigurene (statistikk, trender, korrelasjon og regresjon) for alle byer og
+# variabler som filer, uten å vise dem. Figurene lages i en prosesspool med Agg-backend, og en
+# manifestfil i figurmappen holder en hash av inndataene og koden til hver figur, slik at figurer
+# som ikke er endret siden forrige kjøring hoppes over.
+
+MANIFEST = ".figurer.json"
+MATPLOTLIB_FORMATER = ("png", "svg", "pdf")
+
+VARIABLER = {
+    "air_temperature P1D": "lufttemperatur",
+    "precipitation_amount P1D": "nedbør",
+    "wind_speed P1D": "vindstyrke",
+}
+MÅLVARIABLER = ("temperatur", "nedbør")
+REGRESJONSPLOTT = ("scatter", "søyle", "linje")
+
+# Modulene figurene og inndataene deres lages i; endres koden, lages figurene på nytt
+_KILDEFILER = ("statistikk_funksjoner.py", "prediktiv_analyse.py", "visning.py", "nedsampling.py", "figurgenerering.py",
+               "datasett.py", "tidsaggregater.py", "lagring.py")
+
+
+def _hash_objekt(objekt, hasher):
+    """Oppdaterer hasher med innholdet i objekt (DataFrame, Series, numpy-tabell eller enkle verdier)."""
+    if isinstance(objekt, (pd.DataFrame, pd.Series)):
+        hasher.update(repr((type(objekt).__name__, objekt.shape, list(map(str, getattr(objekt, "columns", [])))))
+                      .encode("utf-8"))
+        hasher.update(pd.util.hash_pandas_object(objekt, index=True).to_numpy().tobytes())
+    elif isinstance(objekt, np.ndarray):
+        hasher.update(repr((objekt.dtype.str, objekt.shape)).encode("utf-8"))
+        hasher.update(np.ascontiguousarray(objekt).tobytes())
+    elif isinstance(objekt, dict):
+        for nøkkel in sorted(objekt, key=str):
+            hasher.update(repr(nøkkel).encode("utf-8"))
+            _hash_objekt(objekt[nøkkel], hasher)
+    elif isinstance(objekt, (list, tuple)):
+        hasher.update(f"{type(objekt).__name__}{len(objekt)}".encode("utf-8"))
+        for element in objekt:
+            _hash_objekt(element, hasher)
+    else:
+        hasher.update(repr(objekt).encode("utf-8"))
+
+
+def _kodeversjon():
+    """Hash av kildefilene til plottefunksjonene."""
+    hasher = hashlib.sha256()
+    mappe = os.path.dirname(os.path.abspath(__file__))
+    for filnavn in _KILDEFILER:
+        with open(os.path.join(mappe, filnavn), "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def jobbnøkkel(jobb, kodeversjon=""):
+    """
+    Lager en nøkkel for en figurjobb ut fra funksjonen, argumentene (inkludert dataene),
+    formatene og versjonen av koden.
+    """
+    hasher = hashlib.sha256(kodeversjon.encode("utf-8"))
+    _hash_objekt((jobb["modul"], jobb["funksjon"], jobb["args"], jobb["kwargs"], jobb["formater"]), hasher)
+    return hasher.hexdigest()
+
+
+def _jobb(navn, modul, funksjon, args=(), kwargs=None, formater=("png",)):
+    return {"navn": navn, "modul": modul, "funksjon": funksjon, "args": tuple(args),
+            "kwargs": dict(kwargs or {}), "formater": tuple(formater)}
+
+
+def _filnavn(tekst):
+    """Gjør om en tekst til et trygt filnavn."""
+    return "".join(tegn if tegn.isalnum() or tegn in "-_" else "_" for tegn in str(tekst).replace(" ", "_"))
+
+
+def lag_standardjobber(df, byer=None, variabler=None, formater=("png",)):
+    """
+    Lager listen over standardfigurene for dataene. Beregninger som deles av mange figurer
+    (statistikk, aggregater, korrelasjon og strukturerte data per by) gjøres én gang her, og hver
+    jobb får bare med seg den delen av dataene den trenger.
+
+    Parametre:
+    - df (DataFrame): Behandlede værdata (som BehandletVaerData.csv).
+    - byer (list): Byene det skal lages figurer for. Standard er alle.
+    - variabler (dict): Variabel -> visningsnavn. Standard er VARIABLER.
+    - formater (tuple): Filformater for matplotlib-figurene ("png", "svg" eller "pdf").
+      Interaktive figurer lagres alltid som HTML.
+
+    Returnerer:
+    - list: Jobbene, som ordbøker med navn, modul, funksjon, args, kwargs og formater.
+    """
+    from datasett import VaerDatasett
+    from statistikk_funksjoner import beregn_all_statistikk, beregn_korrelasjonsmatrise
+    from tidsaggregater import beregn_aggregater
+
+    variabler = dict(variabler or VARIABLER)
+    variabler = {v: navn for v, navn in variabler.items() if (df["variable"] == v).any()}
+    datasett = VaerDatasett(df)
+    byer = list(byer) if byer is not None else datasett.byer()
+    formater = tuple(f for f in formater if f in MATPLOTLIB_FORMATER) or ("png",)
+
+    statistikk = beregn_all_statistikk(df)
+    måned = beregn_aggregater(df[df["variable"].isin(list(variabler))], ["måned"])["måned"]
+    jobber = []
+
+    for variabel, visningsnavn in variabler.items():
+        per_by = statistikk[statistikk["variable"] == variabel].set_index("by")
+        per_by = per_by.loc[per_by.index.isin(byer), ["gjennomsnitt", "median", "standardavvik"]]
+        jobber.append(_jobb(f"statistikk_{_filnavn(visningsnavn)}", "statistikk_funksjoner", "plott_statistikk",
+                            (per_by, ["gjennomsnitt", "median", "standardavvik"], visningsnavn), formater=formater))
+        trend = måned[(måned["variable"] == variabel) & måned["by"].isin(byer)].reset_index(drop=True)
+        jobber.append(_jobb(f"trend_{_filnavn(visningsnavn)}", "statistikk_funksjoner", "plott_trend_over_tid",
+                            (None, variabel, visningsnavn), {"aggregater": trend}, formater=formater))
+        data = df.loc[(df["variable"] == variabel) & df["by"].isin(byer), ["by", "referenceTime", "variable", "value"]]
+        jobber.append(_jobb(f"interaktiv_trend_{_filnavn(visningsnavn)}", "statistikk_funksjoner",
+                            "interaktiv_trend_plot", (data.reset_index(drop=True), variabel, visningsnavn),
+                            formater=("html",)))
+
+    korrelasjon = beregn_korrelasjonsmatrise(df, byer=byer, variabler=list(variabler))
+    jobber.append(_jobb("korrelasjonsmatrise", "statistikk_funksjoner", "plott_korrelasjonsmatrise",
+                        (korrelasjon,), formater=formater))
+
+    par = [(a, b) for i, a in enumerate(variabler) for b in list(variabler)[i + 1:]]
+    for by in byer:
+        bred = datasett.bred(by, list(variabler))
+        for var1, var2 in par:
+            if var1 not in bred.columns or var2 not in bred.columns:
+                continue
+            felles = bred[[var1, var2]].dropna()
+            if felles.empty:
+                continue
+            jobber.append(_jobb(f"korrelasjon_{_filnavn(by)}_{_filnavn(variabler[var1])}_{_filnavn(variabler[var2])}",
+                                "statistikk_funksjoner", "plott_korrelasjon",
+                                (felles[var1], felles[var2], var1, var2, by), formater=formater))
+
+        strukturert = datasett.strukturer(by=by)
+        if len(strukturert) < 10:
+            continue
+        for målvariabel in MÅLVARIABLER:
+            for plott in REGRESJONSPLOTT:
+                jobber.append(_jobb(f"regresjon_{_filnavn(by)}_{_filnavn(målvariabel)}_{plott}", "figurgenerering",
+                                    "regresjonsfigur", (strukturert, målvariabel, plott), formater=formater))
+    return jobber
+
+
+def regresjonsfigur(data, målvariabel, plott="scatter", vis=False):
+    """
+    Trener modellen for én by og målvariabel (som i PrediktivAnalyse.ipynb) og lager figuren.
+
+    Parametre:
+    - data (DataFrame): Strukturerte data for byen (fra hent_og_strukturer_data).
+    - målvariabel (str): "temperatur" eller "nedbør".
+    - plott (str): "scatter", "søyle" eller "linje".
+    - vis (bool): Vis figuren.
+
+    Returnerer:
+    - Figure: Matplotlib-figuren.
+    """
+    import prediktiv_analyse
+    _, X_test, y_test, y_pred, _, _ = prediktiv_analyse.tren_modell(data, målvariabel)
+    funksjon = getattr(prediktiv_analyse, f"vis_regresjon_resultat_{plott}")
+    return funksjon(X_test, y_test, y_pred, data, målvariabel, vis=vis)
+
+
+def _start_arbeider():
+    """Bruker Agg-backend i arbeidsprosessene, slik at ingen vinduer åpnes."""
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def _lagre(figur, filsti_uten_endelse, formater):
+    """Lagrer en matplotlib- eller Plotly-figur i de oppgitte formatene og returnerer filene."""
+    filer = []
+    if hasattr(figur, "savefig"):
+        import matplotlib.pyplot as plt
+        try:
+            for format_ in formater:
+                filsti = f"{filsti_uten_endelse}.{format_}"
+                figur.savefig(filsti, format=format_, dpi=120, bbox_inches="tight")
+                filer.append(filsti)
+        finally:
+            plt.close(figur)
+    else:
+        for format_ in formater:
+            filsti = f"{filsti_uten_endelse}.{format_}"
+            if format_ == "html":
+                figur.write_html(filsti, include_plotlyjs="cdn")
+            else:
+                # Krever kaleido
+                figur.write_image(filsti)
+            filer.append(filsti)
+    return filer
+
+
+def _kjør_jobb(jobb, mappe):
+    """Lager og lagrer én figur. Kjøres i en arbeidsprosess."""
+    import importlib
+    start = time.perf_counter()
+    funksjon = getattr(importlib.import_module(jobb["modul"]), jobb["funksjon"])
+    figur = funksjon(*jobb["args"], **jobb["kwargs"], vis=False)
+    filer = _lagre(figur, os.path.join(mappe, jobb["navn"]), jobb["formater"])
+    return filer, time.perf_counter() - start
+
+
+def _les_manifest(mappe):
+    try:
+        with open(os.path.join(mappe, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _lagre_manifest(mappe, manifest):
+    midlertidig = os.path.join(mappe, MANIFEST + ".tmp")
+    with open(midlertidig, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(midlertidig, os.path.join(mappe, MANIFEST))
+
+
+def generer_figurer(data, mappe='../figurer', formater=("png",), byer=None, variabler=None, maks_arbeidere=None):
+    """
+    Lager alle standardfigurene som filer. Figurer der verken dataene eller koden er endret siden
+    forrige kjøring (og filene finnes), hoppes over.
+
+    Parametre:
+    - data (DataFrame eller str): Behandlede værdata, eller filstien til dem (CSV eller Parquet).
+    - mappe (str): Mappen figurene lagres i. Standard er '../figurer'.
+    - formater (tuple): Filformater for matplotlib-figurene ("png", "svg" eller "pdf").
+    - byer (list): Byene det skal lages figurer for. Standard er alle.
+    - variabler (dict): Variabel -> visningsnavn. Standard er temperatur, nedbør og vind.
+    - maks_arbeidere (int): Antall prosesser. 0 lager figurene i denne prosessen. Standard er
+      antall prosessorkjerner.
+
+    Returnerer:
+    - dict: 'laget', 'hoppet_over' og 'feilet' (navnene på figurene) og 'sekunder'.
+    """
+    start = time.perf_counter()
+    if isinstance(data, str):
+        from lagring import les_data
+        data = les_data(data)
+    os.makedirs(mappe, exist_ok=True)
+
+    jobber = lag_standardjobber(data, byer, variabler, formater)
+    kodeversjon = _kodeversjon()
+    manifest = _les_manifest(mappe)
+    resultat = {"laget": [], "hoppet_over": [], "feilet": []}
+
+    nye = []
+    for jobb in jobber:
+        nøkkel = jobbnøkkel(jobb, kodeversjon)
+        filer = [os.path.join(mappe, f"{jobb['navn']}.{f}") for f in jobb["formater"]]
+        if manifest.get(jobb["navn"]) == nøkkel and all(os.path.exists(f) for f in filer):
+            resultat["hoppet_over"].append(jobb["navn"])
+        else:
+            nye.append((jobb, nøkkel))
+
+    def ferdig(jobb, nøkkel, framtid_eller_feil):
+        try:
+            framtid_eller_feil()
+        except Exception as e:
+            print(f"Klarte ikke å lage figuren {jobb['navn']}. Feil: {e}")
+            resultat["feilet"].append(jobb["navn"])
+            manifest.pop(jobb["navn"], None)
+            return
+        manifest[jobb["navn"]] = nøkkel
+        resultat["laget"].append(jobb["navn"])
+
+    if maks_arbeidere == 0:
+        _start_arbeider()
+        for jobb, nøkkel in nye:
+            ferdig(jobb, nøkkel, lambda: _kjør_jobb(jobb, mappe))
+    elif nye:
+        with ProcessPoolExecutor(max_workers=maks_arbeidere, initializer=_start_arbeider) as pool:
+            framtider = {pool.submit(_kjør_jobb, jobb, mappe): (jobb, nøkkel) for jobb, nøkkel in nye}
+            for framtid in as_completed(framtider):
+                jobb, nøkkel = framtider[framtid]
+                ferdig(jobb, nøkkel, framtid.result)
+
+    _lagre_manifest(mappe, manifest)
+    resultat["sekunder"] = time.perf_counter() - start
+    print(f"\nFigurer i {mappe}: {len(resultat['laget'])} laget, {len(resultat['hoppet_over'])} uendret, "
+          f"{len(resultat['feilet'])} feilet ({resultat['sekunder']:.1f} s)")
+    return resultat
+
+
+if __name__ == '__main__':
+    # Kjøres fra src/ med: python figurgenerering.py [datafil] [figurmappe] [format ...]
+    datafil = sys.argv[1] if len(sys.argv) > 1 else '../data/BehandletVaerData.csv'
+    figurmappe = sys.argv[2] if len(sys.argv) > 2 else '../figurer'
+    valgte_formater = tuple(sys.argv[3:]) or ("png",)
+    generer_figurer(datafil, figurmappe, valgte_formater)
@@ -0,0 +1,228 @@
+import codecs
+import json
+import re
+from array import array
+import numpy as np
+import pandas as pd
+
+# Strømmende parser for svar fra Frost API (JSON-LD). I stedet for å lese hele svaret inn i
+# minnet og lage én ordbok per observasjon, leses svaret bit for bit. Hvert element i 'data'
+# tolkes for seg og skrives rett inn i typede kolonnebuffere, slik at minnebruken holder seg
+# nær størrelsen på den ferdige tabellen.
+
+KOLONNER = ['sourceId', 'referenceTime', 'elementId', 'value', 'unit', 'codequality']
+
+_DATA_START = re.compile(r'"data"\s*:\s*\[')
+
+
+def _som_numpy(buffer, dtype):
+    # Kopierer bufferet, slik at parseren kan fortsette å fylle det etterpå
+    return np.array(buffer, dtype=dtype) if len(buffer) else np.empty(0, dtype=dtype)
+
+
+class KategoriBuffer:
+    """
+    Kolonnebuffer for tekst med få unike verdier (stasjon, tidspunkt, element, enhet).
+    Hver unik verdi lagres én gang, og hver rad lagres som en heltallskode.
+    """
+
+    def __init__(self):
+        self.koder = array('i')
+        self.verdier = []
+        self._oppslag = {}
+
+    def legg_til(self, verdi):
+        if verdi is None:
+            self.koder.append(-1)
+            return
+        kode = self._oppslag.get(verdi)
+        if kode is None:
+            kode = len(self.verdier)
+            self._oppslag[verdi] = kode
+            self.verdier.append(verdi)
+        self.koder.append(kode)
+
+    def __len__(self):
+        return len(self.koder)
+
+    def til_pandas(self, kategorisk=True):
+        koder = _som_numpy(self.koder, np.int32)
+        kategorier = pd.Categorical.from_codes(koder, categories=pd.Index(self.verdier, dtype=object))
+        return kategorier if kategorisk else np.asarray(kategorier, dtype=object)
+
+    def til_arrow(self):
+        import pyarrow as pa
+        koder = _som_numpy(self.koder, np.int32)
+        indekser = pa.array(koder, mask=koder < 0)
+        return pa.DictionaryArray.from_arrays(indekser, pa.array(self.verdier, type=pa.string()))
+
+
+class FrostStrømParser:
+    """
+    Tolker svar fra Frost bit for bit og fyller kolonnene sourceId, referenceTime, elementId,
+    value, unit og codequality direkte.
+
+    >>> parser = FrostStrømParser()
+    >>> for bit in response.iter_content(65536):
+    ...     parser.mat(bit)
+    >>> metadata = parser.avslutt()
+    >>> df = parser.til_dataframe()
+
+    Samme parser kan brukes for flere sider (nextLink): kall mat(...) og avslutt() for hver side.
+    """
+
+    def __init__(self):
+        self.kolonner = {
+            'sourceId': KategoriBuffer(),
+            'referenceTime': KategoriBuffer(),
+            'elementId': KategoriBuffer(),
+            'unit': KategoriBuffer(),
+        }
+        self.value = array('d')
+        self.codequality = array('d')
+        self._dekoder = json.JSONDecoder()
+        self._start_side()
+
+    def _start_side(self):
+        self._tekstdekoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._tilstand = 'hode'
+        self._hode = ''
+        self._hale = ''
+
+    def __len__(self):
+        return len(self.value)
+
+    def forkast_side(self, antall_rader):
+        """
+        Forkaster en halvlest side, f.eks. etter et brudd i nedlastingen.
+
+        Parametere:
+        - antall_rader (int): Antall rader parseren hadde før siden startet (len(parser)).
+        """
+        for buffer in self.kolonner.values():
+            del buffer.koder[antall_rader:]
+        del self.value[antall_rader:]
+        del self.codequality[antall_rader:]
+        self._start_side()
+
+    def legg_til_element(self, element):
+        """Legger til observasjonene i ett element fra 'data' (én stasjon og ett tidspunkt)."""
+        kilde = element['sourceId'].split(':')[0]
+        tid = element['referenceTime']
+        for observasjon in element['observations']:
+            self.kolonner['sourceId'].legg_til(kilde)
+            self.kolonner['referenceTime'].legg_til(tid)
+            self.kolonner['elementId'].legg_til(observasjon['elementId'])
+            self.kolonner['unit'].legg_til(observasjon.get('unit'))
+            verdi = observasjon.get('value')
+            self.value.append(np.nan if verdi is None else float(verdi))
+            kvalitet = observasjon.get('qualityCode')
+            self.codequality.append(np.nan if kvalitet is None or kvalitet == '' else float(kvalitet))
+
+    def mat(self, bit):
+        """
+        Tar imot neste bit av svaret (bytes eller str) og tolker alle hele elementer i bufferet.
+        """
+        if isinstance(bit, bytes):
+            bit = self._tekstdekoder.decode(bit)
+        self._buffer += bit
+
+        if self._tilstand == 'hode':
+            treff = _DATA_START.search(self._buffer)
+            if not treff:
+                return
+            self._hode = self._buffer[:treff.start()]
+            self._buffer = self._buffer[treff.end():]
+            self._tilstand = 'data'
+
+        if self._tilstand == 'data':
+            self._tolk_elementer()
+
+        if self._tilstand == 'hale':
+            self._hale += self._buffer
+            self._buffer = ''
+
+    def _tolk_elementer(self):
+        posisjon = 0
+        lengde = len(self._buffer)
+        while True:
+            # Hopper over mellomrom og komma mellom elementene
+            while posisjon < lengde and self._buffer[posisjon] in ' \t\r\n,':
+                posisjon += 1
+            if posisjon >= lengde:
+                break
+            if self._buffer[posisjon] == ']':
+                self._tilstand = 'hale'
+                posisjon += 1
+                break
+            try:
+                element, slutt = self._dekoder.raw_decode(self._buffer, posisjon)
+            except json.JSONDecodeError:
+                # Elementet er ikke komplett ennå; venter på neste bit
+                break
+            self.legg_til_element(element)
+            posisjon = slutt
+        self._buffer = self._buffer[posisjon:]
+
+    def avslutt(self):
+        """
+        Avslutter gjeldende side og gjør parseren klar for neste.
+
+        Returnerer:
+        - dict: Metadata fra svaret (alt utenom 'data'), f.eks. 'nextLink'.
+        - None: Hvis svaret ble avsluttet før hele 'data'-listen var lest. Radene fra siden er
+          da fortsatt med, og kan fjernes med forkast_side.
+        """
+        self.mat(self._tekstdekoder.decode(b'', final=True))
+        if self._tilstand == 'hode':
+            # Svaret har ingen 'data' (f.eks. en feilmelding); tolkes som vanlig JSON
+            tekst = self._buffer
+            self._start_side()
+            try:
+                return json.loads(tekst) if tekst.strip() else {}
+            except json.JSONDecodeError:
+                print("Klarte ikke å tolke svaret som JSON.")
+                return {}
+        if self._tilstand == 'data':
+            self._start_side()
+            print("Svaret ble avsluttet før hele 'data'-listen var lest.")
+            return None
+
+        tekst = self._hode + '"data": []' + self._hale
+        self._start_side()
+        try:
+            metadata = json.loads(tekst)
+        except json.JSONDecodeError:
+            print("Klarte ikke å tolke metadata i svaret.")
+            return {}
+        metadata.pop('data', None)
+        return metadata
+
+    def til_dataframe(self, kategorisk=True):
+        """
+        Lager en DataFrame av kolonnebufferne.
+
+        Parametere:
+        - kategorisk (bool): Hvis True blir tekstkolonnene pandas Categorical, ellers vanlige strenger.
+
+        Returnerer:
+        - DataFrame: Kolonnene sourceId, referenceTime, elementId, value, unit og codequality.
+        """
+        data = {navn: buffer.til_pandas(kategorisk) for navn, buffer in self.kolonner.items()}
+        data['value'] = _som_numpy(self.value, np.float64)
+        data['codequality'] = _som_numpy(self.codequality, np.float64)
+        return pd.DataFrame(data, columns=KOLONNER)
+
+    def til_arrow(self):
+        """
+        Lager en pyarrow.Table av kolonnebufferne, med ordbokkodede tekstkolonner.
+
+        Returnerer:
+        - pyarrow.Table: Kolonnene sourceId, referenceTime, elementId, value, unit og codequality.
+        """
+        import pyarrow as pa
+        kolonner = {navn: buffer.til_arrow() for navn, buffer in self.kolonner.items()}
+        kolonner['value'] = pa.array(_som_numpy(self.value, np.float64), from_pandas=True)
+        kolonner['codequality'] = pa.array(_som_numpy(self.codequality, np.float64), from_pandas=True)
+        return pa.table({navn: kolonner[navn] for navn in KOLONNER})
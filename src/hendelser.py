@@ -0,0 +1,184 @@
+import warnings
+import numpy as np
+import pandas as pd
+from datasett import VaerDatasett, hent_datasett
+from imputering import klimatologi, løpelengder
+
+# Finner kuldeperioder, hetebølger, dager med kraftig nedbør og mistenkelige verdier (uteliggere)
+# for alle byer samtidig. Hver verdi sammenlignes med normalen for dagen i året i samme by
+# (glidende klimatologi), og sammenhengende dager over terskelen finnes med run-length encoding.
+
+# Definisjonen av hver hendelsestype:
+# - variabel: Variabelen (eller en liste av variabler) hendelsen gjelder. None betyr alle.
+# - mål: "z" (avvik fra normalen i standardavvik) eller "persentil" (verdien mot byens
+#   persentil over dager med minst 1 mm, for nedbør som er svært skjevt fordelt).
+# - retning: 1 for høye verdier, -1 for lave og 0 for begge (bare 1 for "persentil").
+# - terskel: Grensen for z-verdien eller persentilen.
+# - min_lengde: Minste antall sammenhengende dager.
+HENDELSESTYPER = {
+    "kuldeperiode": {"variabel": "air_temperature P1D", "mål": "z", "retning": -1, "terskel": 1.5, "min_lengde": 3},
+    "hetebølge": {"variabel": "air_temperature P1D", "mål": "z", "retning": 1, "terskel": 1.5, "min_lengde": 3},
+    "kraftig_nedbør": {"variabel": "precipitation_amount P1D", "mål": "persentil", "retning": 1, "terskel": 99,
+                       "min_lengde": 1},
+    # Nedbør er for skjevt fordelt til at z-verdier skiller feilmålinger fra kraftige regnskyll
+    "uteligger": {"variabel": ["air_temperature P1D", "wind_speed P1D"], "mål": "z", "retning": 0, "terskel": 5.0,
+                  "min_lengde": 1},
+}
+
+KOLONNER = ["hendelse", "by", "variable", "fra_dato", "til_dato", "varighet", "topp", "topp_dato", "topp_z"]
+
+
+def daglig_matrise(data, byer=None, variabler=None):
+    """
+    Henter værdata som én tabell med én rad per dag og én kolonne per (by, variabel).
+
+    Parametre:
+    - data: VaerDatasett, filsti til CSV-filen eller Parquet-mappen, værdata i langt format, eller
+      en ferdig daglig tabell (f.eks. fra imputering.imputer), som brukes som den er.
+    - byer (list): Byene som skal være med. Standard er alle.
+    - variabler (list): Variablene som skal være med. Standard er alle.
+    """
+    if isinstance(data, pd.DataFrame) and isinstance(data.columns, pd.MultiIndex):
+        return data
+    if isinstance(data, str):
+        data = hent_datasett(data)
+    elif not isinstance(data, VaerDatasett):
+        data = VaerDatasett(data)
+    return data.daglig(byer, variabler)
+
+
+def zverdier(matrise, glatting=15):
+    """
+    Beregner avviket fra normalen for hver dag og serie, målt i standardavvik. Normalen er
+    gjennomsnittet over alle år for dagene innenfor ±glatting dager av samme dag i året (se
+    imputering.klimatologi), og standardavviket beregnes over det samme vinduet.
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag med DatetimeIndex og én kolonne per serie.
+    - glatting (int): Antall dager på hver side som tas med i normalen.
+
+    Returnerer:
+    - DataFrame: z-verdiene med samme form som matrise. NaN der verdien mangler eller
+      standardavviket er null.
+    """
+    dag = matrise.index.dayofyear - 1
+    avvik = matrise - klimatologi(matrise, glatting).to_numpy()[dag]
+    # Standardavviket regnes fra avviket fra normalen for hver enkelt dag, slik at endringen i
+    # normalen gjennom vinduet (f.eks. om våren) ikke blåser opp standardavviket
+    standardavvik = np.sqrt(klimatologi(avvik ** 2, glatting).to_numpy()[dag])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = avvik.to_numpy(dtype=float) / np.where(standardavvik > 0, standardavvik, np.nan)
+    return pd.DataFrame(z, index=matrise.index, columns=matrise.columns)
+
+
+def _persentil_over_våte_dager(verdier, persentil, våt=1.0):
+    """Persentilen for hver kolonne over dagene med minst `våt` mm."""
+    våte = np.where(verdier >= våt, verdier, np.nan)
+    # Kolonner uten våte dager gir NaN (og en advarsel fra numpy, som ikke er interessant her)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(våte, persentil, axis=0)
+
+
+def _topp(styrke, kolonne, start, lengde):
+    """
+    Finner raden med størst styrke i hvert løp, uten løkke over løpene.
+
+    Returnerer:
+    - ndarray: Radnummeret til toppen i hvert løp.
+    """
+    løp = np.repeat(np.arange(len(lengde)), lengde)
+    første = np.cumsum(lengde) - lengde
+    rad = np.repeat(start, lengde) + np.arange(lengde.sum()) - np.repeat(første, lengde)
+    verdi = styrke[rad, np.repeat(kolonne, lengde)]
+    # Sorterer på løp og så synkende styrke; første element i hvert løp er toppen
+    rekkefølge = np.lexsort((-verdi, løp))
+    return rad[rekkefølge[første]]
+
+
+def finn_hendelser(data, typer=None, byer=None, glatting=15, definisjoner=None):
+    """
+    Finner hendelser for alle byer samtidig og returnerer dem som én tabell.
+
+    Parametre:
+    - data: Værdataene, se daglig_matrise(). Manglende dager bryter en hendelse; fyll korte hull
+      med imputering.imputer først for å slå dem sammen.
+    - typer (list): Hendelsestypene som skal finnes. Standard er alle i definisjonene.
+    - byer (list): Byene som skal være med. Standard er alle.
+    - glatting (int): Antall dager på hver side som tas med i normalen, se zverdier().
+    - definisjoner (dict): Egne definisjoner på samme form som HENDELSESTYPER.
+
+    Returnerer:
+    - DataFrame: Én rad per hendelse med kolonnene hendelse, by, variable, fra_dato, til_dato,
+      varighet (dager), topp (den mest ekstreme verdien), topp_dato og topp_z (z-verdien den dagen),
+      sortert etter hendelse, by og fra_dato.
+    """
+    definisjoner = definisjoner or HENDELSESTYPER
+    typer = list(definisjoner) if typer is None else list(typer)
+    ukjente = [t for t in typer if t not in definisjoner]
+    if ukjente:
+        raise ValueError(f"Ukjent hendelsestype {ukjente[0]!r}. Velg blant {', '.join(definisjoner)}.")
+
+    matrise = daglig_matrise(data, byer)
+    if byer is not None:
+        matrise = matrise.loc[:, matrise.columns.get_level_values("by").isin(byer)]
+    verdier = matrise.to_numpy(dtype=float)
+    z = zverdier(matrise, glatting).to_numpy()
+    variabel_per_kolonne = matrise.columns.get_level_values("variable")
+
+    deler = []
+    for type_ in typer:
+        definisjon = definisjoner[type_]
+        retning = definisjon["retning"]
+        kolonner = np.arange(verdier.shape[1])
+        if definisjon["variabel"] is not None:
+            valgte = definisjon["variabel"]
+            kolonner = kolonner[variabel_per_kolonne.isin([valgte] if isinstance(valgte, str) else valgte)]
+        if len(kolonner) == 0:
+            continue
+
+        # Styrken er større jo mer ekstrem dagen er, slik at toppen er dagen med størst styrke
+        if definisjon["mål"] == "z":
+            styrke = np.abs(z[:, kolonner]) if retning == 0 else retning * z[:, kolonner]
+            maske = styrke >= definisjon["terskel"]
+        else:
+            styrke = retning * verdier[:, kolonner]
+            maske = styrke >= _persentil_over_våte_dager(styrke, definisjon["terskel"])
+
+        kolonne, start, lengde = løpelengder(maske)
+        lange = lengde >= definisjon["min_lengde"]
+        kolonne, start, lengde = kolonne[lange], start[lange], lengde[lange]
+        topp = _topp(np.nan_to_num(styrke, nan=-np.inf), kolonne, start, lengde)
+        serie = kolonner[kolonne]
+
+        navn = matrise.columns[serie]
+        deler.append(pd.DataFrame({
+            "hendelse": type_,
+            "by": navn.get_level_values("by"),
+            "variable": navn.get_level_values("variable"),
+            "fra_dato": matrise.index[start],
+            "til_dato": matrise.index[start + lengde - 1],
+            "varighet": lengde,
+            "topp": verdier[topp, serie],
+            "topp_dato": matrise.index[topp],
+            "topp_z": z[topp, serie],
+        }))
+
+    if not deler:
+        return pd.DataFrame(columns=KOLONNER)
+    return (pd.concat(deler, ignore_index=True)
+            .sort_values(["hendelse", "by", "fra_dato"], kind="stable", ignore_index=True))
+
+
+def oppsummer_hendelser(hendelser):
+    """
+    Teller hendelsene per by og type.
+
+    Returnerer:
+    - DataFrame: Én rad per by og én kolonne per hendelsestype med antall hendelser, og
+      kolonnen dager_totalt med summen av varighetene.
+    """
+    antall = hendelser.pivot_table(index="by", columns="hendelse", values="varighet", aggfunc="size",
+                                   fill_value=0, observed=True)
+    antall["dager_totalt"] = hendelser.groupby("by", observed=True)["varighet"].sum()
+    return antall
@@ -1,8 +1,17 @@
 import requests
 import time
+import threading
+import json
+import os
+import pandas as pd
+from datetime import date, timedelta
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from frost_parser import FrostStrømParser
 # Kilde:
 # Met.no. (u.å.). *Python-eksempel for Frost API*. Hentet fra https://frost.met.no/python_example.html
-def hent_data_fra_frost(endpoint, params, client_id, maks_forsøk=3, ventetid=2):
+def hent_data_fra_frost(endpoint, params, client_id, maks_forsøk=3, ventetid=2, session=None, rate_begrenser=None,
+                        cache=None):
     """
     Henter data fra Frost API med støtte for flere forsøk og feilhåndtering.
 
@@ -12,22 +21,36 @@ def hent_data_fra_frost(endpoint, params, client_id, maks_forsøk=3, ventetid=2)
     - client_id (str): API-nøkkel (client ID).
     - maks_forsøk (int): Antall ganger funksjonen prøver å hente data.
     - ventetid (int): Antall sekunder mellom hvert forsøk.
+    - session (requests.Session): Valgfri session som gjenbruker tilkoblingen mellom kall.
+    - rate_begrenser (RateBegrenser): Valgfri felles begrensning på antall kall per sekund.
+    - cache (ResponsCache): Valgfri cache på disk. Ved treff sendes ingen forespørsel.
 
     Returnerer:
     - dict: JSON-data dersom forespørselen lykkes.
     - None: Hvis alle forsøk feiler.
     """
+    if cache is not None:
+        lagret = cache.hent(endpoint, params)
+        if lagret is not None:
+            return lagret
+
+    klient = session if session is not None else requests
 
     for forsøk in range(1, maks_forsøk + 1):
         try:
-            response = requests.get(endpoint, params=params, auth=(client_id, ''))
+            if rate_begrenser is not None:
+                rate_begrenser.vent(endpoint)
+            response = klient.get(endpoint, params=params, auth=(client_id, ''))
 
             if response.status_code == 200:
                 try:
-                    return response.json()
+                    data = response.json()
                 except ValueError:
                     print("Klarte ikke å tolke svaret som JSON.")
                     break
+                if cache is not None:
+                    cache.lagre(endpoint, params, data)
+                return data
 
             elif response.status_code == 401:
                 print("Ugyldig client ID (401 Unauthorized).")
@@ -55,3 +78,436 @@ def hent_data_fra_frost(endpoint, params, client_id, maks_forsøk=3, ventetid=2)
 
     print("Kunne ikke hente data etter flere forsøk.")
     return None
+
+
+class RateBegrenser:
+    """
+    Trådsikker begrensning av antall forespørsler per sekund, felles for alle tråder
+    og med egen kø per vert (f.eks. frost.met.no).
+    """
+
+    def __init__(self, maks_per_sekund=10):
+        """
+        Parametere:
+        - maks_per_sekund (float): Hvor mange forespørsler som maksimalt sendes per sekund til hver vert.
+        """
+        self.intervall = 1.0 / maks_per_sekund if maks_per_sekund else 0.0
+        self._neste_tidspunkt = {}
+        self._lås = threading.Lock()
+
+    def vent(self, url):
+        """
+        Blokkerer til det er lov å sende en ny forespørsel til verten i `url`.
+        Hver tråd reserverer sitt eget tidspunkt, slik at ventingen skjer utenfor låsen.
+        """
+        vert = urlparse(url).netloc
+        with self._lås:
+            nå = time.monotonic()
+            tidspunkt = max(nå, self._neste_tidspunkt.get(vert, nå))
+            self._neste_tidspunkt[vert] = tidspunkt + self.intervall
+        if tidspunkt > nå:
+            time.sleep(tidspunkt - nå)
+
+
+def hent_alle_sider(endpoint, params, client_id, session=None, rate_begrenser=None, maks_sider=1000, **kwargs):
+    """
+    Henter data fra Frost og følger 'nextLink' til alle sidene er hentet.
+
+    Parametere:
+    - endpoint, params, client_id: Som i hent_data_fra_frost.
+    - session (requests.Session): Valgfri session for gjenbruk av tilkobling.
+    - rate_begrenser (RateBegrenser): Valgfri felles rate-begrensning.
+    - maks_sider (int): Øvre grense for antall sider, som vern mot evige løkker.
+    - kwargs: Sendes videre til hent_data_fra_frost (f.eks. maks_forsøk, ventetid, cache).
+
+    Returnerer:
+    - dict: Svaret fra første side, der 'data' inneholder observasjonene fra alle sidene.
+    - None: Hvis en av sidene ikke kunne hentes.
+    """
+    første = hent_data_fra_frost(endpoint, params, client_id, session=session,
+                                 rate_begrenser=rate_begrenser, **kwargs)
+    if not første or 'data' not in første:
+        return første
+
+    data = list(første['data'])
+    neste = første.get('nextLink')
+    antall_sider = 1
+
+    while neste and antall_sider < maks_sider:
+        # nextLink inneholder allerede alle parametrene, så de sendes ikke på nytt
+        side = hent_data_fra_frost(neste, None, client_id, session=session,
+                                   rate_begrenser=rate_begrenser, **kwargs)
+        if not side or 'data' not in side:
+            print(f"Klarte ikke å hente side {antall_sider + 1} ({neste}).")
+            return None
+        data.extend(side['data'])
+        neste = side.get('nextLink')
+        antall_sider += 1
+
+    resultat = {k: v for k, v in første.items() if k not in ('data', 'nextLink')}
+    resultat['data'] = data
+    resultat['totalItemCount'] = len(data)
+    return resultat
+
+
+def del_opp_tidsrom(start_dato, slutt_dato, vindu_dager=365):
+    """
+    Deler et tidsrom opp i sammenhengende vinduer på maks `vindu_dager` dager.
+
+    Parametere:
+    - start_dato (str): Startdato på formen 'YYYY-MM-DD' (inkludert).
+    - slutt_dato (str): Sluttdato på formen 'YYYY-MM-DD' (ikke inkludert, slik Frost tolker referencetime).
+    - vindu_dager (int): Lengden på hvert vindu i dager.
+
+    Returnerer:
+    - list: Liste med referencetime-strenger, f.eks. ['2020-01-01/2021-01-01', '2021-01-01/2021-06-01'].
+    """
+    start = date.fromisoformat(start_dato)
+    slutt = date.fromisoformat(slutt_dato)
+    vinduer = []
+    while start < slutt:
+        neste = min(start + timedelta(days=vindu_dager), slutt)
+        vinduer.append(f"{start.isoformat()}/{neste.isoformat()}")
+        start = neste
+    return vinduer
+
+
+def del_opp_forespørsel(params, vindu_dager=365, kilder_per_del=1):
+    """
+    Deler én Frost-forespørsel opp i mindre deler (stasjoner × tidsvinduer).
+
+    Parametere:
+    - params (dict): Parametere som til hent_data_fra_frost. Må inneholde 'sources' og
+      'referencetime' på formen 'start/slutt'.
+    - vindu_dager (int): Antall dager per tidsvindu.
+    - kilder_per_del (int): Antall stasjoner som hentes sammen i hver del.
+
+    Returnerer:
+    - list: Liste med parameter-ordbøker, sortert etter stasjon og deretter tid.
+    """
+    kilder = [k.strip() for k in params['sources'].split(',') if k.strip()]
+    start_dato, slutt_dato = params['referencetime'].split('/')
+    vinduer = del_opp_tidsrom(start_dato[:10], slutt_dato[:10], vindu_dager)
+
+    deler = []
+    for i in range(0, len(kilder), kilder_per_del):
+        kildegruppe = ','.join(kilder[i:i + kilder_per_del])
+        for vindu in vinduer:
+            del_params = dict(params)
+            del_params['sources'] = kildegruppe
+            del_params['referencetime'] = vindu
+            deler.append(del_params)
+    return deler
+
+
+def hent_data_parallelt(endpoint, params, client_id, vindu_dager=365, kilder_per_del=1,
+                        maks_arbeidere=4, maks_per_sekund=10, session=None, **kwargs):
+    """
+    Henter store datamengder fra Frost ved å dele forespørselen opp i (stasjon × tidsvindu)-deler
+    som hentes samtidig i en begrenset trådpool. Alle trådene deler én rate-begrensning per vert,
+    og hver del følger 'nextLink' til alle sidene er hentet.
+
+    Parametere:
+    - endpoint (str): API-endepunkt (URL).
+    - params (dict): Parametere som til hent_data_fra_frost, med 'sources' og 'referencetime'.
+    - client_id (str): API-nøkkel (client ID).
+    - vindu_dager (int): Antall dager per tidsvindu.
+    - kilder_per_del (int): Antall stasjoner per del.
+    - maks_arbeidere (int): Antall tråder som henter samtidig.
+    - maks_per_sekund (float): Maks antall forespørsler per sekund mot verten.
+    - session (requests.Session): Valgfri session. Opprettes automatisk hvis den ikke er gitt.
+    - kwargs: Sendes videre til hent_data_fra_frost (f.eks. maks_forsøk, ventetid).
+
+    Returnerer:
+    - dict: {'data': [...], 'feilede_deler': [...]} der 'data' er observasjonene fra alle delene
+      i samme rekkefølge som delene (stasjon, så tid), og 'feilede_deler' er parameterne til
+      delene som ikke kunne hentes.
+    """
+    deler = del_opp_forespørsel(params, vindu_dager, kilder_per_del)
+    rate_begrenser = RateBegrenser(maks_per_sekund)
+    egen_session = session is None
+    if egen_session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=maks_arbeidere)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def hent_del(del_params):
+        return hent_alle_sider(endpoint, del_params, client_id, session=session,
+                               rate_begrenser=rate_begrenser, **kwargs)
+
+    try:
+        with ThreadPoolExecutor(max_workers=maks_arbeidere) as pool:
+            # map bevarer rekkefølgen på delene, uansett hvilken del som blir ferdig først
+            svar = list(pool.map(hent_del, deler))
+    finally:
+        if egen_session:
+            session.close()
+
+    data = []
+    feilede = []
+    for del_params, del_svar in zip(deler, svar):
+        if del_svar and 'data' in del_svar:
+            data.extend(del_svar['data'])
+        else:
+            feilede.append(del_params)
+
+    if feilede:
+        print(f"{len(feilede)} av {len(deler)} deler kunne ikke hentes.")
+    print(f"Hentet {len(data)} elementer fra {len(deler) - len(feilede)} deler.")
+
+    return {'data': data, 'feilede_deler': feilede}
+
+
+def frost_til_dataframe(json_data):
+    """
+    Gjør om svaret fra Frost til en DataFrame med én rad per observasjon.
+    Observasjonene skrives rett inn i kolonnebuffere (se frost_parser.py) i stedet for å
+    lage én ordbok per rad.
+
+    Parametere:
+    - json_data (dict): Svar fra Frost med nøkkelen 'data'.
+
+    Returnerer:
+    - DataFrame: Kolonnene sourceId, referenceTime, elementId, value, unit og codequality.
+    """
+    parser = FrostStrømParser()
+    for item in json_data.get('data', []):
+        parser.legg_til_element(item)
+    return parser.til_dataframe(kategorisk=False)
+
+
+def hent_data_strømmende(endpoint, params, client_id, session=None, som_arrow=False,
+                         bitstørrelse=1 << 16, maks_forsøk=3, ventetid=2):
+    """
+    Henter data fra Frost og tolker svaret mens det lastes ned, uten å holde hele svaret
+    eller én ordbok per observasjon i minnet. Følger 'nextLink' til alle sidene er hentet.
+
+    Parametere:
+    - endpoint (str): API-endepunkt (URL).
+    - params (dict): Parametere til API-kallet.
+    - client_id (str): API-nøkkel (client ID).
+    - session (requests.Session): Valgfri session for gjenbruk av tilkobling.
+    - som_arrow (bool): Returner en pyarrow.Table i stedet for en DataFrame.
+    - bitstørrelse (int): Antall byte som leses om gangen.
+    - maks_forsøk (int): Antall forsøk per side ved 429, serverfeil, nettverksfeil og svar som
+      brytes før de er ferdige.
+    - ventetid (int): Antall sekunder mellom hvert forsøk.
+
+    Returnerer:
+    - DataFrame (eller pyarrow.Table) med kolonnene sourceId, referenceTime, elementId, value,
+      unit og codequality, der tekstkolonnene er kategoriske.
+    - None: Hvis en side ikke kunne hentes.
+    """
+    klient = session if session is not None else requests
+    parser = FrostStrømParser()
+    url, side_params = endpoint, params
+
+    while url:
+        for forsøk in range(1, maks_forsøk + 1):
+            rader_før_side = len(parser)
+            try:
+                with klient.get(url, params=side_params, auth=(client_id, ''), stream=True) as response:
+                    if response.status_code == 200:
+                        for bit in response.iter_content(chunk_size=bitstørrelse):
+                            parser.mat(bit)
+                        metadata = parser.avslutt()
+                        if metadata is not None:
+                            break
+                        # Svaret ble brutt midt i 'data'; siden forkastes og hentes på nytt
+                        print(f"Ufullstendig svar. Forsøk {forsøk} av {maks_forsøk}...")
+                        parser.forkast_side(rader_før_side)
+                    elif response.status_code == 429 or 500 <= response.status_code < 600:
+                        print(f"Statuskode {response.status_code}. Forsøk {forsøk} av {maks_forsøk}...")
+                    else:
+                        print(f"Forespørsel feilet med statuskode {response.status_code}.")
+                        return None
+            except requests.exceptions.RequestException as e:
+                print(f"Nettverksfeil: {e}")
+                parser.forkast_side(rader_før_side)
+            time.sleep(ventetid)
+        else:
+            print("Kunne ikke hente data etter flere forsøk.")
+            return None
+        # nextLink inneholder allerede alle parametrene, så de sendes ikke på nytt
+        url, side_params = metadata.get('nextLink'), None
+
+    return parser.til_arrow() if som_arrow else parser.til_dataframe()
+
+
+def beregn_vannmerker(df):
+    """
+    Finner siste lagrede 'referenceTime' for hver kombinasjon av stasjon og element.
+
+    Parametere:
+    - df (DataFrame): Rådata med kolonnene sourceId, elementId og referenceTime.
+
+    Returnerer:
+    - dict: Ordbok på formen {"SN18700|mean(air_temperature P1D)": "2022-12-31T00:00:00.000Z"}.
+    """
+    if df.empty:
+        return {}
+    siste = df.groupby(['sourceId', 'elementId'])['referenceTime'].max()
+    return {f"{kilde}|{element}": str(tid) for (kilde, element), tid in siste.items()}
+
+
+def les_vannmerker(filsti='../data/vannmerker.json', rådata_filsti='../data/VaerData.csv'):
+    """
+    Leser vannmerkene fra fil. Finnes ikke filen, beregnes de fra rådataen (hvis den finnes).
+
+    Parametere:
+    - filsti (str): JSON-fil med vannmerker.
+    - rådata_filsti (str): CSV-fil med rådata som brukes hvis vannmerkefilen mangler.
+
+    Returnerer:
+    - dict: Vannmerker som fra beregn_vannmerker, eller en tom ordbok.
+    """
+    try:
+        with open(filsti, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        print(f"Feil ved lesing av JSON-format i filen {filsti}. Beregner vannmerker fra rådata.")
+
+    if rådata_filsti and os.path.exists(rådata_filsti):
+        df = pd.read_csv(rådata_filsti, usecols=['sourceId', 'elementId', 'referenceTime'])
+        return beregn_vannmerker(df)
+    return {}
+
+
+def lagre_vannmerker(vannmerker, filsti='../data/vannmerker.json'):
+    """
+    Lagrer vannmerkene til en JSON-fil.
+
+    Parametere:
+    - vannmerker (dict): Vannmerker som fra beregn_vannmerker.
+    - filsti (str): Filstien vannmerkene skal lagres til.
+    """
+    try:
+        with open(filsti, 'w', encoding='utf-8') as f:
+            json.dump(vannmerker, f, indent=4, ensure_ascii=False, sort_keys=True)
+    except Exception as e:
+        print(f"Klarte ikke å lagre vannmerker til {filsti}. Feil: {e}")
+
+
+def legg_til_rådata(df, filsti):
+    """
+    Legger rader til på slutten av rådatafilen, eller lager filen hvis den ikke finnes.
+    Kolonnene må være de samme som i filen; står de i en annen rekkefølge, ordnes de som i filen.
+
+    Parametere:
+    - df (DataFrame): Radene som skal legges til.
+    - filsti (str): CSV-filen.
+
+    Returnerer:
+    - bool: True hvis radene ble skrevet.
+    """
+    try:
+        if not os.path.exists(filsti) or os.path.getsize(filsti) == 0:
+            df.to_csv(filsti, index=False)
+            return True
+        kolonner = list(pd.read_csv(filsti, nrows=0).columns)
+        if sorted(kolonner) != sorted(df.columns):
+            print(f"Kolonnene i {filsti} ({', '.join(kolonner)}) stemmer ikke med de nye radene "
+                  f"({', '.join(df.columns)}). Ingenting ble lagt til.")
+            return False
+        df[kolonner].to_csv(filsti, index=False, mode='a', header=False)
+        return True
+    except Exception as e:
+        print(f"Klarte ikke å legge til rådata i {filsti}. Feil: {e}")
+        return False
+
+
+def hent_inkrementelt(endpoint, params, client_id, rådata_filsti='../data/VaerData.csv',
+                      vannmerke_filsti='../data/vannmerker.json', **kwargs):
+    """
+    Henter bare dagene som mangler lokalt, og legger dem til i rådatafilen.
+
+    For hver kombinasjon av stasjon og element hentes data fra og med neste tidspunkt etter
+    siste lagrede 'referenceTime' (vannmerket), der steget er 'timeresolutions' i params
+    (f.eks. P1D). Elementer med samme starttidspunkt og de samme stasjonene hentes i samme
+    forespørsel, og kombinasjoner uten vannmerke hentes fra starten av 'referencetime' i params.
+
+    Parametere:
+    - endpoint (str): API-endepunkt (URL).
+    - params (dict): Parametere som til hent_data_fra_frost, med 'sources', 'elements' og 'referencetime'.
+    - client_id (str): API-nøkkel (client ID).
+    - rådata_filsti (str): CSV-filen nye rader legges til i.
+    - vannmerke_filsti (str): JSON-filen vannmerkene lagres i.
+    - kwargs: Sendes videre til hent_alle_sider (f.eks. session, maks_forsøk).
+
+    Returnerer:
+    - DataFrame: De nye radene som ble lagt til (tom hvis alt allerede var hentet).
+    """
+    vannmerker = les_vannmerker(vannmerke_filsti, rådata_filsti)
+    kilder = [k.strip() for k in params['sources'].split(',') if k.strip()]
+    elementer = [e.strip() for e in params['elements'].split(',') if e.strip()]
+    start_dato, slutt_dato = params['referencetime'].split('/')
+
+    # Neste forventede observasjon ligger én tidsoppløsning (f.eks. P1D) etter vannmerket
+    try:
+        steg = pd.Timedelta(params.get('timeresolutions', ''))
+    except ValueError:
+        steg = pd.NaT
+    if pd.isna(steg):
+        steg = pd.Timedelta(seconds=1)
+    slutt = pd.Timestamp(slutt_dato).tz_localize(None)
+
+    # Finner stasjonene hvert element må hentes for, per tidspunkt de må hentes fra
+    per_start = {}
+    for kilde in kilder:
+        for element in elementer:
+            vannmerke = vannmerker.get(f"{kilde}|{element}")
+            if vannmerke:
+                fra = pd.Timestamp(vannmerke).tz_localize(None) + steg
+            else:
+                fra = pd.Timestamp(start_dato).tz_localize(None)
+            if fra >= slutt:
+                continue
+            fra = fra.strftime('%Y-%m-%d') if fra == fra.normalize() else fra.strftime('%Y-%m-%dT%H:%M:%SZ')
+            per_start.setdefault(fra, {}).setdefault(element, []).append(kilde)
+
+    # En forespørsel henter alle stasjonene i den med alle elementene i den, så bare elementer
+    # med nøyaktig de samme stasjonene slås sammen. Ellers ville en kombinasjon kunne hentes i
+    # to forespørsler med ulik start, og de overlappende radene bli lagt til to ganger.
+    grupper = []
+    for fra, stasjoner_per_element in sorted(per_start.items()):
+        per_stasjoner = {}
+        for element, kilder_i_gruppe in stasjoner_per_element.items():
+            per_stasjoner.setdefault(tuple(kilder_i_gruppe), []).append(element)
+        grupper.extend((fra, list(k), e) for k, e in per_stasjoner.items())
+
+    if not grupper:
+        print("Ingen nye dager å hente.")
+        return frost_til_dataframe({})
+
+    nye = []
+    for fra, kilder_i_gruppe, elementer_i_gruppe in grupper:
+        del_params = dict(params)
+        del_params['sources'] = ','.join(kilder_i_gruppe)
+        del_params['elements'] = ','.join(elementer_i_gruppe)
+        del_params['referencetime'] = f"{fra}/{slutt_dato}"
+        svar = hent_alle_sider(endpoint, del_params, client_id, **kwargs)
+        if svar and 'data' in svar:
+            nye.append(frost_til_dataframe(svar))
+        else:
+            print(f"Klarte ikke å hente data fra {fra} for {del_params['sources']}.")
+
+    df_nye = pd.concat(nye, ignore_index=True) if nye else frost_til_dataframe({})
+
+    # Beholder bare rader som er nyere enn vannmerket for sin kombinasjon
+    nøkler = df_nye['sourceId'] + '|' + df_nye['elementId']
+    grense = nøkler.map(vannmerker).fillna('')
+    df_nye = df_nye[df_nye['referenceTime'] > grense].reset_index(drop=True)
+
+    if df_nye.empty:
+        print("Ingen nye observasjoner.")
+        return df_nye
+
+    if not legg_til_rådata(df_nye, rådata_filsti):
+        return df_nye.iloc[:0]
+    vannmerker.update(beregn_vannmerker(df_nye))
+    lagre_vannmerker(vannmerker, vannmerke_filsti)
+    print(f"La til {len(df_nye)} nye observasjoner.")
+    return df_nye
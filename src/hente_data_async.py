@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import aiohttp
+
+# Asynkron variant av hent_data_fra_frost (se hente_data.py). Klienten holder én pool med
+# gjenbrukte (keep-alive) tilkoblinger, ber om gzip-komprimerte svar og lar mange
+# stasjons-/elementforespørsler være underveis samtidig.
+
+
+def tolk_retry_after(verdi):
+    """
+    Tolker en 'Retry-After'-header, som enten er et antall sekunder eller en HTTP-dato.
+
+    Parametere:
+    - verdi (str): Verdien i headeren, eller None.
+
+    Returnerer:
+    - float: Antall sekunder det skal ventes, eller None hvis headeren mangler eller er ugyldig.
+    """
+    if not verdi:
+        return None
+    try:
+        return max(0.0, float(verdi))
+    except ValueError:
+        pass
+    try:
+        tidspunkt = parsedate_to_datetime(verdi)
+    except (TypeError, ValueError):
+        return None
+    if tidspunkt.tzinfo is None:
+        tidspunkt = tidspunkt.replace(tzinfo=timezone.utc)
+    return max(0.0, (tidspunkt - datetime.now(timezone.utc)).total_seconds())
+
+
+class AsyncFrostKlient:
+    """
+    Asynkron klient for Frost API med gjenbruk av tilkoblinger.
+
+    Brukes som en asynkron kontekstbehandler:
+
+    >>> async with AsyncFrostKlient(client_id) as klient:
+    ...     svar = await klient.hent_mange(endpoint, liste_med_params)
+
+    I Jupyter kan man bruke `await` direkte i en celle. I vanlige skript kan man bruke
+    hjelpefunksjonen hent_mange_fra_frost, som starter en hendelsesløkke selv.
+    """
+
+    def __init__(self, client_id, maks_samtidige=10, maks_forsøk=5, basis_ventetid=0.5,
+                 maks_ventetid=30, timeout=60):
+        """
+        Parametere:
+        - client_id (str): API-nøkkel (client ID).
+        - maks_samtidige (int): Maks antall forespørsler underveis samtidig (og størrelsen på tilkoblingspoolen).
+        - maks_forsøk (int): Antall forsøk per forespørsel.
+        - basis_ventetid (float): Utgangspunkt i sekunder for eksponentiell backoff.
+        - maks_ventetid (float): Øvre grense i sekunder for ventetid mellom to forsøk.
+        - timeout (float): Total tidsgrense i sekunder per forespørsel.
+        """
+        self.client_id = client_id
+        self.maks_samtidige = maks_samtidige
+        self.maks_forsøk = maks_forsøk
+        self.basis_ventetid = basis_ventetid
+        self.maks_ventetid = maks_ventetid
+        self.timeout = timeout
+        self.antall_forespørsler = 0
+        self.antall_nye_forsøk = 0
+        self._session = None
+        self._semafor = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.maks_samtidige, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'Accept-Encoding': 'gzip', 'Authorization': self._basic_auth()},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semafor = asyncio.Semaphore(self.maks_samtidige)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    def _basic_auth(self):
+        """Lager Authorization-headeren for Frost, som bruker client ID som brukernavn og tomt passord."""
+        nøkkel = base64.b64encode(f"{self.client_id}:".encode('utf-8')).decode('ascii')
+        return f"Basic {nøkkel}"
+
+    def _ventetid(self, forsøk, retry_after=None):
+        """
+        Regner ut ventetid før neste forsøk: eksponentiell backoff med full jitter, eller
+        serverens 'Retry-After' pluss litt jitter hvis den er oppgitt.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.maks_ventetid) + random.uniform(0, self.basis_ventetid)
+        return random.uniform(0, min(self.maks_ventetid, self.basis_ventetid * 2 ** (forsøk - 1)))
+
+    async def hent(self, endpoint, params):
+        """
+        Henter én forespørsel fra Frost, med nye forsøk ved 429, serverfeil og nettverksfeil.
+
+        Parametere:
+        - endpoint (str): API-endepunkt (URL).
+        - params (dict): Parametere til API-kallet.
+
+        Returnerer:
+        - dict: JSON-data dersom forespørselen lykkes.
+        - None: Hvis alle forsøk feiler.
+        """
+        for forsøk in range(1, self.maks_forsøk + 1):
+            retry_after = None
+            try:
+                async with self._semafor:
+                    self.antall_forespørsler += 1
+                    async with self._session.get(endpoint, params=params) as response:
+                        if response.status == 200:
+                            try:
+                                return await response.json(content_type=None)
+                            except ValueError:
+                                print("Klarte ikke å tolke svaret som JSON.")
+                                return None
+
+                        elif response.status == 401:
+                            print("Ugyldig client ID (401 Unauthorized).")
+                            return None
+
+                        elif response.status == 403:
+                            print("Tilgang nektet (403 Forbidden).")
+                            return None
+
+                        elif response.status == 429:
+                            retry_after = tolk_retry_after(response.headers.get('Retry-After'))
+
+                        elif 500 <= response.status < 600:
+                            print(f"Serverfeil ({response.status}). Forsøk {forsøk} av {self.maks_forsøk}...")
+
+                        else:
+                            print(f"Forespørsel feilet med statuskode {response.status}.")
+                            return None
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Nettverksfeil: {e}")
+
+            if forsøk < self.maks_forsøk:
+                self.antall_nye_forsøk += 1
+                # Ventingen skjer utenfor semaforen, slik at andre forespørsler kan fortsette
+                await asyncio.sleep(self._ventetid(forsøk, retry_after))
+
+        print("Kunne ikke hente data etter flere forsøk.")
+        return None
+
+    async def hent_mange(self, endpoint, liste_med_params):
+        """
+        Henter mange forespørsler samtidig.
+
+        Parametere:
+        - endpoint (str): API-endepunkt (URL).
+        - liste_med_params (list): Liste med parameter-ordbøker, f.eks. én per stasjon eller element.
+
+        Returnerer:
+        - list: Svarene i samme rekkefølge som parameterne (None for forespørsler som feilet).
+        """
+        return await asyncio.gather(*(self.hent(endpoint, params) for params in liste_med_params))
+
+
+def hent_mange_fra_frost(endpoint, liste_med_params, client_id, **kwargs):
+    """
+    Synkron hjelpefunksjon som henter mange forespørsler samtidig med AsyncFrostKlient.
+    Kan ikke brukes inne i en kjørende hendelsesløkke (f.eks. Jupyter); bruk da klienten direkte.
+
+    Parametere:
+    - endpoint (str): API-endepunkt (URL).
+    - liste_med_params (list): Liste med parameter-ordbøker.
+    - client_id (str): API-nøkkel (client ID).
+    - kwargs: Sendes videre til AsyncFrostKlient (f.eks. maks_samtidige, maks_forsøk).
+
+    Returnerer:
+    - list: Svarene i samme rekkefølge som parameterne (None for forespørsler som feilet).
+    """
+    async def kjør():
+        async with AsyncFrostKlient(client_id, **kwargs) as klient:
+            start = time.perf_counter()
+            svar = await klient.hent_mange(endpoint, liste_med_params)
+            tid = time.perf_counter() - start
+            print(f"Hentet {len(svar)} forespørsler på {tid:.2f} s "
+                  f"({klient.antall_forespørsler} kall, {klient.antall_nye_forsøk} nye forsøk).")
+            return svar
+
+    return asyncio.run(kjør())
@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+from statistikk_funksjoner import korrelasjon_fra_summer
+
+# Utfylling av manglende dager i daglige serier. Alle metodene arbeider på en bred tabell med én
+# rad per dag (uten hull i kalenderen, se VaerDatasett.daglig) og én kolonne per (by, variabel),
+# og fyller alle seriene samtidig med numpy i stedet for å gå gjennom byene én og én.
+
+METODER = ("lineær", "tid", "klimatologi", "nabostasjon")
+
+
+def løpelengder(maske):
+    """
+    Finner sammenhengende løp av True nedover hver kolonne (run-length encoding), uten løkker.
+
+    Parametre:
+    - maske (ndarray): Boolsk tabell med formen (rader, kolonner), eller én kolonne (1D).
+
+    Returnerer:
+    - tuple: (kolonne, start, lengde) som heltallstabeller med ett element per løp, sortert
+      etter kolonne og så start. Løpet dekker radene start til og med start + lengde - 1.
+    """
+    maske = np.asarray(maske, dtype=bool)
+    if maske.ndim == 1:
+        maske = maske[:, None]
+    polstret = np.zeros((maske.shape[1], maske.shape[0] + 2), dtype=np.int8)
+    polstret[:, 1:-1] = maske.T
+    endring = np.diff(polstret, axis=1)
+    # nonzero går gjennom radene i rekkefølge, så starter og slutter kommer parvis per kolonne
+    kolonne, start = np.nonzero(endring == 1)
+    _, slutt = np.nonzero(endring == -1)
+    return kolonne, start, slutt - start
+
+
+def løpemaske(kolonne, start, lengde, form):
+    """
+    Gjør løp fra løpelengder() om til en boolsk tabell igjen.
+
+    Parametre:
+    - kolonne, start, lengde (ndarray): Løpene som skal markeres.
+    - form (tuple): Formen (rader, kolonner) på tabellen.
+
+    Returnerer:
+    - ndarray: True i radene som dekkes av løpene.
+    """
+    maske = np.zeros(form, dtype=bool)
+    if len(lengde) == 0:
+        return maske
+    # Radnummeret til hvert element i alle løpene: start gjentatt lengde ganger pluss 0, 1, 2, ...
+    forskyvning = np.arange(lengde.sum()) - np.repeat(np.cumsum(lengde) - lengde, lengde)
+    maske[np.repeat(start, lengde) + forskyvning, np.repeat(kolonne, lengde)] = True
+    return maske
+
+
+def finn_hull(matrise):
+    """
+    Finner alle hull (sammenhengende dager uten verdi) i hver serie.
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag og én kolonne per serie, f.eks. fra VaerDatasett.daglig().
+
+    Returnerer:
+    - DataFrame: Én rad per hull med kolonnenivåene (f.eks. by og variable), fra_dato, til_dato
+      og lengde (antall dager).
+    """
+    kolonne, start, lengde = løpelengder(matrise.isna().to_numpy())
+    kolonner = matrise.columns[kolonne]
+    if isinstance(kolonner, pd.MultiIndex):
+        hull = kolonner.to_frame(index=False)
+    else:
+        hull = pd.DataFrame({kolonner.name or "serie": kolonner})
+    hull["fra_dato"] = matrise.index[start]
+    hull["til_dato"] = matrise.index[start + lengde - 1]
+    hull["lengde"] = lengde
+    return hull
+
+
+def interpoler(verdier, x=None):
+    """
+    Lineær interpolasjon innenfor hullene i hver kolonne. Hull i starten eller slutten av en
+    serie (uten verdi på begge sider) fylles ikke.
+
+    Parametre:
+    - verdier (ndarray): Tabell med formen (rader, kolonner) og NaN for manglende verdier.
+    - x (ndarray): Posisjonen til hver rad, f.eks. tiden. Standard er radnummeret.
+
+    Returnerer:
+    - ndarray: Kopi av verdier med hullene fylt.
+    """
+    antall = verdier.shape[0]
+    x = np.arange(antall, dtype=float) if x is None else np.asarray(x, dtype=float)
+    gyldig = ~np.isnan(verdier)
+    rad = np.arange(antall)[:, None]
+    # Nærmeste rad med verdi før og etter hver rad, for alle kolonner samtidig
+    forrige = np.maximum.accumulate(np.where(gyldig, rad, -1), axis=0)
+    neste = np.minimum.accumulate(np.where(gyldig, rad, antall)[::-1], axis=0)[::-1]
+    # Regner bare ut verdiene der det mangler, med verdi på begge sider
+    rader, kolonner = np.nonzero(~gyldig & (forrige >= 0) & (neste < antall))
+    før, etter = forrige[rader, kolonner], neste[rader, kolonner]
+    v0, v1 = verdier[før, kolonner], verdier[etter, kolonner]
+    andel = (x[rader] - x[før]) / (x[etter] - x[før])
+    fylt = verdier.copy()
+    fylt[rader, kolonner] = v0 + andel * (v1 - v0)
+    return fylt
+
+
+def klimatologi(matrise, glatting=15):
+    """
+    Beregner normalverdien for hver dag i året og hver serie: gjennomsnittet over alle år av
+    dagene innenfor ±glatting dager (rundt årsskiftet også).
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag med DatetimeIndex og én kolonne per serie.
+    - glatting (int): Antall dager på hver side som tas med i gjennomsnittet.
+
+    Returnerer:
+    - DataFrame: Indeks 1–366 (dag i året) og samme kolonner som matrise. NaN der en serie
+      ikke har noen verdier i vinduet.
+    """
+    dag = matrise.index.dayofyear
+    summer = matrise.groupby(dag).sum().reindex(range(1, 367), fill_value=0.0).to_numpy()
+    antall = matrise.notna().groupby(dag).sum().reindex(range(1, 367), fill_value=0).to_numpy()
+
+    # Glidende sum rundt hele året med kumulative summer over en tabell som er forlenget i begge ender
+    def glidende(tabell):
+        forlenget = np.concatenate([tabell[-glatting:], tabell, tabell[:glatting]])
+        kumulativ = np.concatenate([np.zeros((1, tabell.shape[1])), np.cumsum(forlenget, axis=0)])
+        return kumulativ[2 * glatting + 1:] - kumulativ[:-2 * glatting - 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normal = glidende(summer) / glidende(antall.astype(float))
+    return pd.DataFrame(normal, index=pd.RangeIndex(1, 367, name="dag"), columns=matrise.columns)
+
+
+def naboregresjon(verdier, grupper=None, antall_naboer=3, min_overlapp=30):
+    """
+    Tilpasser y = a + b * x mellom hver serie og hver av de andre seriene i samme gruppe (f.eks.
+    samme variabel i andre byer), over dagene der begge har verdi.
+
+    Alle par beregnes samtidig fra summer som hentes med matriseprodukter (som i
+    korrelasjonsmatrise), og for hver serie rangeres de andre etter korrelasjonen.
+
+    Parametre:
+    - verdier (ndarray): Tabell med formen (dager, serier) og NaN for manglende verdier.
+    - grupper (array): Gruppen til hver serie. Bare serier i samme gruppe kan være naboer.
+      Standard er at alle er i samme gruppe.
+    - antall_naboer (int): Antall naboer som beholdes per serie.
+    - min_overlapp (int): Minste antall felles dager for at et par skal kunne brukes.
+
+    Returnerer:
+    - tuple: (naboer, a, b) med formen (serier, antall_naboer). naboer er kolonnenummeret til
+      naboene, best først, og -1 der det ikke finnes flere.
+    """
+    gyldig = ~np.isnan(verdier)
+    x = np.where(gyldig, verdier, 0.0)
+    m = gyldig.astype(float)
+    # Element [i, j] summerer over dagene der både serie i (x) og serie j (y) har verdi
+    n = m.T @ m
+    sum_x = x.T @ m
+    kvadratsum_x = (x ** 2).T @ m
+    kryss = x.T @ x
+    r = korrelasjon_fra_summer(n, sum_x, sum_x.T, kvadratsum_x, kvadratsum_x.T, kryss)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = (kryss - sum_x * sum_x.T / n) / (kvadratsum_x - sum_x ** 2 / n)
+        a = (sum_x.T - b * sum_x) / n
+
+    grupper = np.zeros(verdier.shape[1]) if grupper is None else np.asarray(grupper)
+    brukbar = (n >= min_overlapp) & ~np.isnan(r) & (grupper[:, None] == grupper[None, :])
+    np.fill_diagonal(brukbar, False)
+    styrke = np.where(brukbar, r, -np.inf)
+
+    # Kolonne j i styrke er serie j sine kandidater; sorterer hver kolonne synkende
+    rekkefølge = np.argsort(-styrke, axis=0, kind="stable")[:antall_naboer].T
+    serie = np.arange(verdier.shape[1])[:, None]
+    naboer = np.where(brukbar[rekkefølge, serie], rekkefølge, -1)
+    return naboer, a[rekkefølge, serie], b[rekkefølge, serie]
+
+
+def _fyll_fra_naboer(verdier, grupper, antall_naboer, min_overlapp):
+    naboer, a, b = naboregresjon(verdier, grupper, antall_naboer, min_overlapp)
+    fylt = verdier.copy()
+    # Beste nabo først; dager der den også mangler, fylles fra neste nabo
+    for k in range(naboer.shape[1]):
+        finnes = naboer[:, k] >= 0
+        anslag = a[:, k] + b[:, k] * verdier[:, np.where(finnes, naboer[:, k], 0)]
+        anslag[:, ~finnes] = np.nan
+        fylt = np.where(np.isnan(fylt), anslag, fylt)
+    return fylt
+
+
+def imputer(matrise, metode="lineær", maks_lengde=None, glatting=15, antall_naboer=3, min_overlapp=30):
+    """
+    Fyller hullene i alle seriene i en daglig tabell.
+
+    Metoder:
+    - "lineær": Rett linje mellom nærmeste verdi før og etter hullet (etter radnummer).
+    - "tid": Som "lineær", men etter tiden i indeksen (lik "lineær" når kalenderen er komplett).
+    - "klimatologi": Normalverdien for dagen i året, se klimatologi().
+    - "nabostasjon": Regresjon mot den best korrelerte serien for samme variabel i en annen by
+      (så den nest beste osv. der den også mangler), se naboregresjon().
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag og én kolonne per serie, f.eks. fra
+      VaerDatasett.daglig(). Med kolonnene (by, variable) er naboene samme variabel i andre byer.
+    - metode (str eller list): Metoden, eller flere metoder som brukes etter tur på det som
+      fortsatt mangler, f.eks. ["nabostasjon", "klimatologi"].
+    - maks_lengde (int): Fyll bare hull på høyst så mange dager. Standard er alle hull.
+    - glatting (int): Vinduet for "klimatologi".
+    - antall_naboer (int): Antall naboer som prøves for "nabostasjon".
+    - min_overlapp (int): Minste antall felles dager med en nabo for "nabostasjon".
+
+    Returnerer:
+    - DataFrame: Kopi av matrise med hullene fylt.
+    """
+    metoder = [metode] if isinstance(metode, str) else list(metode)
+    ukjente = [m for m in metoder if m not in METODER]
+    if ukjente:
+        raise ValueError(f"Ukjent metode {ukjente[0]!r}. Velg blant {', '.join(METODER)}.")
+
+    verdier = matrise.to_numpy(dtype=float, copy=True)
+    mangler = np.isnan(verdier)
+    if maks_lengde is not None:
+        kolonne, start, lengde = løpelengder(mangler)
+        kort = lengde <= maks_lengde
+        mangler = løpemaske(kolonne[kort], start[kort], lengde[kort], verdier.shape)
+    if isinstance(matrise.columns, pd.MultiIndex) and "variable" in matrise.columns.names:
+        grupper = pd.factorize(matrise.columns.get_level_values("variable"))[0]
+    else:
+        grupper = None
+
+    fylt = verdier
+    for navn in metoder:
+        if navn == "lineær":
+            anslag = interpoler(verdier)
+        elif navn == "tid":
+            anslag = interpoler(verdier, matrise.index.asi8 if isinstance(matrise.index, pd.DatetimeIndex) else None)
+        elif navn == "klimatologi":
+            normal = klimatologi(matrise, glatting).to_numpy()
+            anslag = normal[matrise.index.dayofyear - 1]
+        else:
+            anslag = _fyll_fra_naboer(verdier, grupper, antall_naboer, min_overlapp)
+        fylt = np.where(mangler & np.isnan(fylt), anslag, fylt)
+    return pd.DataFrame(fylt, index=matrise.index, columns=matrise.columns)
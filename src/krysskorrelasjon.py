@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from scipy import fft
+from datasett import VaerDatasett
+from statistikk_funksjoner import korrelasjon_fra_summer
+
+# Krysskorrelasjon med forsinkelse og rullerende korrelasjon mellom alle par av serier
+# (f.eks. by og variabel). Alle par beregnes samtidig: for hver forsinkelse med maskerte
+# matriseprodukter, eller med FFT når mange forsinkelser skal beregnes. Manglende dager håndteres
+# parvis, slik at hvert par og hver forsinkelse bare bruker datoene der begge seriene har verdi.
+
+
+def _som_matrise(matrise):
+    """Gjør om til en sentrert float-matrise og en maske for verdiene som finnes."""
+    verdier = matrise.to_numpy(dtype=np.float64)
+    maske = ~np.isnan(verdier)
+    # Sentrering gjør summene mindre og beregningen mer nøyaktig; korrelasjonen endres ikke
+    verdier = verdier - np.nanmean(np.where(maske, verdier, np.nan), axis=0)
+    return np.where(maske, verdier, 0.0), maske.astype(np.float64)
+
+
+# Summene for hvert par (i, j) og hver forsinkelse, som matriser med form (forsinkelser, kolonner,
+# kolonner): antall felles dager, sum av i, sum av kvadratet av i og sum av kryssproduktet. Summene
+# for j følger av symmetri, siden sum_t m_i(t) x_j(t + f) = sum_t x_j(t) m_i(t - f).
+
+def _summer_direkte(x, m, forsinkelser):
+    """Summene med ett sett matriseprodukter per forsinkelse."""
+    antall_rader = len(x)
+    resultat = []
+    for forsinkelse in forsinkelser:
+        if forsinkelse >= 0:
+            a, b = slice(0, antall_rader - forsinkelse), slice(forsinkelse, antall_rader)
+        else:
+            a, b = slice(-forsinkelse, antall_rader), slice(0, antall_rader + forsinkelse)
+        xa, ma, xb, mb = x[a], m[a], x[b], m[b]
+        resultat.append((ma.T @ mb, xa.T @ mb, (xa * xa).T @ mb, xa.T @ xb))
+    return [np.stack(del_) for del_ in zip(*resultat)]
+
+
+def _summer_fft(x, m, forsinkelser):
+    """
+    Samme summer som _summer_direkte, men alle forsinkelser på én gang med FFT. Hver kolonne
+    transformeres én gang; deretter beregnes krysskorrelasjonen mot alle kolonner for én kolonne
+    om gangen, slik at minnebruken holder seg på O(kolonner × rader).
+    """
+    antall_rader, antall_kolonner = x.shape
+    lengde = fft.next_fast_len(antall_rader + int(np.max(np.abs(forsinkelser))), real=True)
+    # Én rad per kolonne, slik at transformasjonene går langs sammenhengende minne
+    spekter = {navn: fft.rfft(np.ascontiguousarray(a.T), n=lengde, axis=1, workers=-1) for navn, a in
+               (("x", x), ("m", m), ("xx", x * x))}
+    indekser = np.asarray(forsinkelser) % lengde
+
+    summer = np.empty((4, len(forsinkelser), antall_kolonner, antall_kolonner))
+    kombinasjoner = [("m", "m"), ("x", "m"), ("xx", "m"), ("x", "x")]
+    for i in range(antall_kolonner):
+        for k, (venstre, høyre) in enumerate(kombinasjoner):
+            # sum_t a_i(t) * b_j(t + forsinkelse) for alle j
+            produkt = np.conj(spekter[venstre][i]) * spekter[høyre]
+            summer[k, :, i, :] = fft.irfft(produkt, n=lengde, axis=1, workers=-1)[:, indekser].T
+    # Antall felles observasjoner er heltall; avrunder bort avrundingsfeil fra FFT
+    summer[0] = np.round(summer[0])
+    return list(summer)
+
+
+def krysskorrelasjon(matrise, maks_forsinkelse=7, metode="auto"):
+    """
+    Beregner korrelasjonen mellom kolonne i på dag t og kolonne j på dag t + forsinkelse for
+    alle par og alle forsinkelser fra -maks_forsinkelse til maks_forsinkelse.
+
+    En høy korrelasjon ved positiv forsinkelse betyr at serien 'fra' ligger foran serien 'til',
+    f.eks. at nedbør i Bergen i dag henger sammen med nedbør i Oslo i morgen.
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag (uten hull i datoene) og én kolonne per serie,
+      f.eks. fra VaerDatasett.matrise().
+    - maks_forsinkelse (int): Største forsinkelse i antall rader (dager).
+    - metode (str): "direkte", "fft" eller "auto". Direkte bruker matriseprodukter per forsinkelse
+      og er raskest for få forsinkelser; FFT beregner alle forsinkelser samtidig og lønner seg når
+      det er mange.
+
+    Returnerer:
+    - DataFrame: Én rad per (fra, til, forsinkelse) med kolonnene r og n (antall felles dager).
+      Når kolonnene i matrisen er (by, variable), heter kolonnene fra_by, fra_variable, til_by og
+      til_variable.
+    """
+    if metode not in ("auto", "direkte", "fft"):
+        raise ValueError(f"Ukjent metode: {metode}")
+    forsinkelser = np.arange(-maks_forsinkelse, maks_forsinkelse + 1)
+    x, m = _som_matrise(matrise)
+    if metode == "auto":
+        # FFT koster omtrent like mye uansett antall forsinkelser, mens direkte metode vokser
+        # lineært; målt skjæringspunkt er rundt 8 * log2(rader) forsinkelser
+        metode = "fft" if len(forsinkelser) > 8 * np.log2(max(len(x), 2)) else "direkte"
+
+    beregn = _summer_fft if metode == "fft" else _summer_direkte
+    n, sum_x, kvadratsum_x, kryss = beregn(x, m, forsinkelser)
+    # Forsinkelsene er symmetriske rundt 0, så -f ligger i motsatt ende
+    sum_y = sum_x[::-1].transpose(0, 2, 1)
+    kvadratsum_y = kvadratsum_x[::-1].transpose(0, 2, 1)
+    r = korrelasjon_fra_summer(n, sum_x, sum_y, kvadratsum_x, kvadratsum_y, kryss)
+
+    antall_kolonner = x.shape[1]
+    lag, fra, til = np.meshgrid(np.arange(len(forsinkelser)), np.arange(antall_kolonner),
+                                np.arange(antall_kolonner), indexing="ij")
+    resultat = _merk_kolonner(matrise.columns, fra.ravel(), til.ravel())
+    resultat["forsinkelse"] = forsinkelser[lag.ravel()]
+    resultat["r"] = r.ravel()
+    resultat["n"] = n.ravel().astype(np.int64)
+    return resultat
+
+
+def _merk_kolonner(kolonner, fra, til):
+    """Lager kolonnene som beskriver hvert par (fra_by, fra_variable, ... eller fra, til)."""
+    data = {}
+    for retning, indekser in (("fra", fra), ("til", til)):
+        if isinstance(kolonner, pd.MultiIndex):
+            for nivå, navn in enumerate(kolonner.names):
+                data[f"{retning}_{navn or nivå}"] = kolonner.get_level_values(nivå).to_numpy()[indekser]
+        else:
+            data[retning] = kolonner.to_numpy()[indekser]
+    return pd.DataFrame(data)
+
+
+def beste_forsinkelse(resultat, min_antall=30):
+    """
+    Finner forsinkelsen med sterkest korrelasjon (størst absoluttverdi) for hvert par.
+
+    Parametre:
+    - resultat (DataFrame): Resultatet fra krysskorrelasjon.
+    - min_antall (int): Forsinkelser med færre felles dager enn dette tas ikke med.
+
+    Returnerer:
+    - DataFrame: Én rad per par med forsinkelsen, r og n.
+    """
+    par = [k for k in resultat.columns if k not in ("forsinkelse", "r", "n")]
+    gyldige = resultat[(resultat["n"] >= min_antall) & resultat["r"].notna()]
+    indeks = gyldige["r"].abs().groupby([gyldige[k] for k in par], sort=False).idxmax()
+    return gyldige.loc[indeks.to_numpy()].reset_index(drop=True)
+
+
+def rullerende_korrelasjon(matrise, vindu=90, par=None, forsinkelse=0, min_antall=None):
+    """
+    Beregner korrelasjonen over et rullerende vindu for mange par samtidig, med kumulative
+    summer, slik at hvert vindu koster O(1) uansett vindusstørrelse.
+
+    Parametre:
+    - matrise (DataFrame): Én rad per dag og én kolonne per serie.
+    - vindu (int): Antall dager i vinduet.
+    - par (list): Liste med (fra, til)-kolonner. Standard er alle par med fra før til i matrisen;
+      med mange kolonner bør parene oppgis, siden resultatet får én kolonne per par.
+    - forsinkelse (int): Sammenligner fra på dag t med til på dag t + forsinkelse.
+    - min_antall (int): Minste antall felles dager i vinduet. Standard er halve vinduet.
+
+    Returnerer:
+    - DataFrame: Samme indeks som matrisen og én kolonne per par. Verdien på en dato gjelder
+      vinduet som slutter på den datoen.
+    """
+    kolonner = list(matrise.columns)
+    if par is None:
+        par = [(a, b) for i, a in enumerate(kolonner) for b in kolonner[i + 1:]]
+    min_antall = vindu // 2 if min_antall is None else min_antall
+
+    x, m = _som_matrise(matrise)
+    posisjon = {kolonne: i for i, kolonne in enumerate(kolonner)}
+    i = np.array([posisjon[a] for a, _ in par], dtype=np.intp)
+    j = np.array([posisjon[b] for _, b in par], dtype=np.intp)
+
+    # Flytter til-seriene slik at rad t inneholder til på dag t + forsinkelse
+    y, my = np.zeros_like(x), np.zeros_like(m)
+    if forsinkelse >= 0:
+        y[:len(x) - forsinkelse], my[:len(x) - forsinkelse] = x[forsinkelse:], m[forsinkelse:]
+    else:
+        y[-forsinkelse:], my[-forsinkelse:] = x[:forsinkelse], m[:forsinkelse]
+
+    felles = m[:, i] * my[:, j]
+    a, b = x[:, i] * felles, y[:, j] * felles
+
+    def rullerende_sum(verdier):
+        kumulativ = np.cumsum(np.vstack([np.zeros((1, verdier.shape[1])), verdier]), axis=0)
+        sum_ = kumulativ[1:].copy()
+        sum_[vindu:] -= kumulativ[1:-vindu]
+        return sum_
+
+    n = rullerende_sum(felles)
+    r = korrelasjon_fra_summer(n, rullerende_sum(a), rullerende_sum(b), rullerende_sum(a * a),
+                               rullerende_sum(b * b), rullerende_sum(a * b))
+    r[n < max(min_antall, 2)] = np.nan
+
+    navn = pd.MultiIndex.from_tuples(par, names=["fra", "til"])
+    return pd.DataFrame(r, index=matrise.index, columns=navn)
+
+
+def beregn_krysskorrelasjon(df, byer=None, variabler=None, maks_forsinkelse=7, metode="auto"):
+    """
+    Beregner krysskorrelasjon med forsinkelse mellom alle kombinasjoner av by og variabel.
+    Dataene pivoteres én gang og fylles ut til én rad per dag, slik at forsinkelser er i dager.
+
+    Parametre:
+    - df (DataFrame): Værdata med kolonnene by, referenceTime, variable og value.
+    - byer (list): Byene som skal være med. Standard er alle.
+    - variabler (list): Variablene som skal være med. Standard er alle.
+    - maks_forsinkelse (int): Største forsinkelse i dager.
+    - metode (str): Se krysskorrelasjon.
+
+    Returnerer:
+    - DataFrame: Se krysskorrelasjon.
+    """
+    matrise = VaerDatasett(df).matrise(byer, variabler).asfreq("D")
+    return krysskorrelasjon(matrise, maks_forsinkelse, metode)
@@ -0,0 +1,212 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Kolonnebasert lagring av værdata i Parquet, partisjonert på variabel og år.
+# Tekstkolonner med få unike verdier lagres ordbokkodet, og datoer lagres som ekte datoer,
+# slik at lesing av én by og én variabel for ett år bare leser de bytene som trengs.
+
+TEKSTKOLONNER = ['by', 'sourceId', 'statistikk', 'variable', 'elementId', 'unit', 'codequality']
+
+
+def er_parquet(filsti):
+    """Sjekker om filstien peker på et Parquet-datasett (en mappe eller en .parquet-fil)."""
+    return os.path.isdir(filsti) or str(filsti).endswith('.parquet')
+
+
+def er_partisjonert_datasett(mappe, partisjon='variable'):
+    """
+    Sjekker om mappen bare inneholder partisjonsmapper fra lagre_parquet (f.eks. 'variable=...'),
+    slik at den trygt kan slettes før datasettet skrives på nytt.
+    """
+    innhold = os.listdir(mappe)
+    return bool(innhold) and all(
+        navn.startswith(f'{partisjon}=') and os.path.isdir(os.path.join(mappe, navn)) for navn in innhold)
+
+
+def _til_arrow(df, partisjoner):
+    """
+    Gjør om en DataFrame til en pyarrow.Table klar for lagring: datoer som date32,
+    tekstkolonner som ordbøker og en 'år'-kolonne for partisjonering.
+    """
+    df = df.copy(deep=False)
+    if 'referenceTime' in df.columns:
+        tid = pd.to_datetime(df['referenceTime'], utc=True).dt.tz_localize(None)
+        df['referenceTime'] = tid
+        if 'år' in partisjoner:
+            df['år'] = tid.dt.year.astype('int32')
+
+    for kolonne in TEKSTKOLONNER:
+        if kolonne in df.columns and kolonne not in partisjoner and not pd.api.types.is_numeric_dtype(df[kolonne]):
+            df[kolonne] = df[kolonne].astype('category')
+
+    # Sorterer på by/stasjon og dato slik at min/maks-statistikken i hver radgruppe blir
+    # smal, og filtre på by og dato kan hoppe over hele radgrupper
+    sorter_på = [k for k in ['by', 'sourceId', 'referenceTime'] if k in df.columns]
+    if sorter_på:
+        df = df.sort_values(sorter_på, kind='stable')
+
+    tabell = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Samme ordboktype i alle filer, slik at datasett skrevet i flere biter kan leses samlet
+    for indeks, felt in enumerate(tabell.schema):
+        if pa.types.is_dictionary(felt.type):
+            verditype = felt.type.value_type
+            if pa.types.is_null(verditype) or pa.types.is_large_string(verditype):
+                verditype = pa.string()
+            tabell = tabell.set_column(indeks, felt.name, tabell[felt.name].cast(pa.dictionary(pa.int32(), verditype)))
+
+    # Døgndata lagres som rene datoer; data med klokkeslett beholder tidsstempelet
+    if 'referenceTime' in tabell.column_names and (df['referenceTime'] == df['referenceTime'].dt.normalize()).all():
+        indeks = tabell.column_names.index('referenceTime')
+        tabell = tabell.set_column(indeks, 'referenceTime', tabell['referenceTime'].cast(pa.date32()))
+    return tabell
+
+
+def lagre_parquet(df, mappe, partisjoner=('variable', 'år'), bitnummer=None):
+    """
+    Lagrer en DataFrame som et Parquet-datasett partisjonert på f.eks. variabel og år.
+
+    Parametere:
+    - df (DataFrame): Data som skal lagres. Må inneholde 'referenceTime' når det partisjoneres på 'år'.
+    - mappe (str): Mappen datasettet lagres i. Eksisterende partisjoner med samme verdier overskrives.
+    - partisjoner (tuple): Kolonnene det partisjoneres på. For rådata, som ikke har 'variable',
+      brukes ('elementId', 'år').
+    - bitnummer (int): Brukes når et datasett skrives i flere biter. Filene får da bitnummeret
+      i navnet, og eksisterende filer i partisjonene beholdes.
+
+    Returnerer:
+    - None
+    """
+    partisjoner = list(partisjoner)
+    tabell = _til_arrow(df, partisjoner)
+    skjema = pa.schema([tabell.schema.field(p) for p in partisjoner])
+    ds.write_dataset(
+        tabell, mappe, format='parquet',
+        partitioning=ds.partitioning(skjema, flavor='hive'),
+        existing_data_behavior='delete_matching' if bitnummer is None else 'overwrite_or_ignore',
+        basename_template='del-{i}.parquet' if bitnummer is None else f'del-{bitnummer}-{{i}}.parquet',
+    )
+
+
+def les_i_biter(filsti, bitestørrelse=1_000_000, kolonner=None):
+    """
+    Leser en CSV-fil eller et Parquet-datasett bit for bit, slik at hele filen aldri er i minnet.
+
+    Parametere:
+    - filsti (str): CSV-fil, .parquet-fil eller Parquet-mappe.
+    - bitestørrelse (int): Maks antall rader per bit.
+    - kolonner (list): Kolonnene som skal leses. Standard er alle.
+
+    Returnerer:
+    - Generator med DataFrame-er.
+    """
+    if er_parquet(filsti):
+        datasett = ds.dataset(filsti, format='parquet', partitioning='hive')
+        if kolonner is None:
+            kolonner = [navn for navn in datasett.schema.names if navn != 'år']
+        for batch in datasett.to_batches(columns=kolonner, batch_size=bitestørrelse):
+            if batch.num_rows:
+                yield batch.to_pandas(date_as_object=False)
+    else:
+        yield from pd.read_csv(filsti, usecols=kolonner, chunksize=bitestørrelse)
+
+
+def _lag_filter(by=None, variabel=None, sourceId=None, fra_dato=None, til_dato=None, felter=()):
+    """Bygger et pyarrow-filteruttrykk av de oppgitte betingelsene."""
+    betingelser = []
+    for kolonne, verdi in (('by', by), ('variable', variabel), ('sourceId', sourceId)):
+        if verdi is None or kolonne not in felter:
+            continue
+        verdier = [verdi] if isinstance(verdi, str) else list(verdi)
+        betingelser.append(ds.field(kolonne).isin(verdier))
+
+    if fra_dato is not None:
+        fra = pd.Timestamp(fra_dato)
+        betingelser.append(ds.field('referenceTime') >= pa.scalar(fra.date(), pa.date32()))
+        if 'år' in felter:
+            betingelser.append(ds.field('år') >= fra.year)
+    if til_dato is not None:
+        til = pd.Timestamp(til_dato)
+        # Hele til_dato er med, også tidspunkter etter midnatt (som i les_data for CSV)
+        neste_dag = (til + pd.Timedelta(days=1)).date()
+        betingelser.append(ds.field('referenceTime') < pa.scalar(neste_dag, pa.date32()))
+        if 'år' in felter:
+            betingelser.append(ds.field('år') <= til.year)
+
+    filter_uttrykk = None
+    for betingelse in betingelser:
+        filter_uttrykk = betingelse if filter_uttrykk is None else filter_uttrykk & betingelse
+    return filter_uttrykk
+
+
+def les_parquet(mappe, kolonner=None, by=None, variabel=None, sourceId=None, fra_dato=None, til_dato=None):
+    """
+    Leser et Parquet-datasett lagret med lagre_parquet. Bare de valgte kolonnene leses, og
+    filtrene brukes både til å hoppe over partisjoner (variabel/år) og radgrupper (by/dato).
+
+    Parametere:
+    - mappe (str): Mappen (eller .parquet-filen) datasettet ligger i.
+    - kolonner (list): Kolonnene som skal leses. Standard er alle.
+    - by (str eller list): Behold bare disse byene.
+    - variabel (str eller list): Behold bare disse variablene (f.eks. "air_temperature P1D").
+    - sourceId (str eller list): Behold bare disse stasjonene.
+    - fra_dato, til_dato (str): Datoer på formen 'YYYY-MM-DD' (begge inkludert).
+
+    Returnerer:
+    - DataFrame: Dataene, med 'referenceTime' som datetime64 og tekstkolonner som kategorier.
+    """
+    datasett = ds.dataset(mappe, format='parquet', partitioning='hive')
+    felter = datasett.schema.names
+    filter_uttrykk = _lag_filter(by, variabel, sourceId, fra_dato, til_dato, felter)
+
+    if kolonner is None:
+        kolonner = [navn for navn in felter if navn != 'år']
+    tabell = datasett.to_table(columns=[k for k in kolonner if k in felter], filter=filter_uttrykk)
+    df = tabell.to_pandas(date_as_object=False)
+
+    for kolonne in df.columns:
+        if isinstance(df[kolonne].dtype, pd.CategoricalDtype):
+            df[kolonne] = df[kolonne].cat.remove_unused_categories()
+        elif kolonne in TEKSTKOLONNER and not pd.api.types.is_numeric_dtype(df[kolonne]):
+            df[kolonne] = df[kolonne].astype('category')
+    return df
+
+
+def les_data(filsti, kolonner=None, by=None, variabel=None, sourceId=None, fra_dato=None, til_dato=None):
+    """
+    Leser værdata fra CSV eller Parquet med samme grensesnitt. For Parquet leses bare de
+    valgte kolonnene og radene (se les_parquet); for CSV leses de valgte kolonnene og
+    radene filtreres etterpå.
+
+    Parametere:
+    - Se les_parquet.
+
+    Returnerer:
+    - DataFrame: Dataene etter filtrering.
+    """
+    if er_parquet(filsti):
+        return les_parquet(filsti, kolonner, by, variabel, sourceId, fra_dato, til_dato)
+
+    lesekolonner = None
+    if kolonner is not None:
+        # Kolonner det filtreres på må leses selv om de ikke skal returneres
+        filterkolonner = [k for k, v in (('by', by), ('variable', variabel), ('sourceId', sourceId),
+                                         ('referenceTime', fra_dato or til_dato)) if v is not None]
+        lesekolonner = list(dict.fromkeys(list(kolonner) + filterkolonner))
+    df = pd.read_csv(filsti, usecols=lesekolonner)
+    maske = pd.Series(True, index=df.index)
+    for kolonne, verdi in (('by', by), ('variable', variabel), ('sourceId', sourceId)):
+        if verdi is not None and kolonne in df.columns:
+            verdier = [verdi] if isinstance(verdi, str) else list(verdi)
+            maske &= df[kolonne].isin(verdier)
+    if (fra_dato is not None or til_dato is not None) and 'referenceTime' in df.columns:
+        tid = pd.to_datetime(df['referenceTime'], utc=True).dt.tz_localize(None)
+        if fra_dato is not None:
+            maske &= tid >= pd.Timestamp(fra_dato)
+        if til_dato is not None:
+            maske &= tid < pd.Timestamp(til_dato) + pd.Timedelta(days=1)
+    if not maske.all():
+        df = df[maske].reset_index(drop=True)
+    return df[list(kolonner)] if kolonner is not None else df
@@ -0,0 +1,183 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Løpende statistikk per stasjon og variabel som kan oppdateres med nye rader og slås sammen
+# på tvers av partisjoner. Gjennomsnitt og varians holdes som (antall, gjennomsnitt, M2) og slås
+# sammen med Chan et al. sin formel (Welford for grupper), og median og persentiler anslås fra et
+# histogram med fast oppløsning. Oppdateringer koster dermed O(nye rader), ikke O(historikk).
+
+NØKLER = ["sourceId", "variable"]
+_AGGREGATKOLONNER = ["antall", "gjennomsnitt", "m2", "min", "maks"]
+
+
+class LøpendeStatistikk:
+    """
+    Løpende statistikk (antall, gjennomsnitt, standardavvik, min, maks, median og persentiler)
+    per (sourceId, variable).
+
+    >>> statistikk = LøpendeStatistikk(oppløsning=0.1)
+    >>> statistikk.oppdater(df_januar)
+    >>> statistikk.oppdater(df_februar)
+    >>> statistikk.resultat()
+
+    Median og persentiler er anslag fra et histogram med bredde `oppløsning`, og feilen er
+    høyst en halv bredde. Resten av statistikken er eksakt.
+    """
+
+    def __init__(self, oppløsning=0.1):
+        """
+        Parametre:
+        - oppløsning (float): Bredden på intervallene i histogrammet (samme enhet som verdiene).
+        """
+        self.oppløsning = oppløsning
+        indeks = pd.MultiIndex.from_arrays([[], []], names=NØKLER)
+        self.aggregater = pd.DataFrame({k: pd.Series(dtype=np.float64) for k in _AGGREGATKOLONNER}, index=indeks)
+        self.histogram = pd.Series(dtype=np.int64, index=pd.MultiIndex.from_arrays(
+            [[], [], np.empty(0, dtype=np.int64)], names=NØKLER + ["intervall"]))
+
+    def __len__(self):
+        return len(self.aggregater)
+
+    @staticmethod
+    def _slå_sammen_aggregater(a, b):
+        """Slår sammen to aggregattabeller med Chan et al. sin formel for gjennomsnitt og M2."""
+        indeks = a.index.union(b.index)
+        a = a.reindex(indeks)
+        b = b.reindex(indeks)
+        na = a["antall"].fillna(0)
+        nb = b["antall"].fillna(0)
+        n = na + nb
+        delta = b["gjennomsnitt"].fillna(0) - a["gjennomsnitt"].fillna(0)
+        andel_b = (nb / n.where(n > 0)).fillna(0)
+
+        return pd.DataFrame({
+            "antall": n,
+            "gjennomsnitt": a["gjennomsnitt"].fillna(0) + delta * andel_b,
+            "m2": a["m2"].fillna(0) + b["m2"].fillna(0) + delta ** 2 * na * andel_b,
+            "min": np.fmin(a["min"], b["min"]),
+            "maks": np.fmax(a["maks"], b["maks"]),
+        }, index=indeks)
+
+    def oppdater(self, df):
+        """
+        Oppdaterer statistikken med nye rader.
+
+        Parametre:
+        - df (DataFrame): Nye observasjoner med kolonnene sourceId, variable og value.
+
+        Returnerer:
+        - LøpendeStatistikk: Seg selv, slik at kall kan lenkes.
+        """
+        data = df[NØKLER + ["value"]]
+        data = data[data["value"].notna()]
+        if data.empty:
+            return self
+        # Nøklene gjøres om til vanlig tekst, slik at tabeller fra ulike kilder kan slås sammen
+        data = data.astype({kolonne: str for kolonne in NØKLER})
+
+        gruppert = data.groupby(NØKLER, observed=True, sort=False)["value"]
+        ny = gruppert.agg(antall="count", gjennomsnitt="mean", min="min", maks="max")
+        ny["m2"] = gruppert.var(ddof=0) * ny["antall"]
+        ny = ny[_AGGREGATKOLONNER].astype(np.float64)
+        self.aggregater = self._slå_sammen_aggregater(self.aggregater, ny)
+
+        intervall = np.floor(data["value"].to_numpy(dtype=np.float64) / self.oppløsning).astype(np.int64)
+        telling = (data.assign(intervall=intervall)
+                       .groupby(NØKLER + ["intervall"], observed=True, sort=False).size())
+        self.histogram = self.histogram.add(telling, fill_value=0).astype(np.int64)
+        return self
+
+    def slå_sammen(self, annen):
+        """
+        Slår sammen statistikk fra en annen partisjon (f.eks. et annet år eller en annen prosess).
+
+        Parametre:
+        - annen (LøpendeStatistikk): Statistikk med samme oppløsning.
+
+        Returnerer:
+        - LøpendeStatistikk: Ny statistikk som dekker begge.
+        """
+        if annen.oppløsning != self.oppløsning:
+            raise ValueError("Kan bare slå sammen statistikk med samme oppløsning.")
+        resultat = LøpendeStatistikk(self.oppløsning)
+        resultat.aggregater = self._slå_sammen_aggregater(self.aggregater, annen.aggregater)
+        resultat.histogram = self.histogram.add(annen.histogram, fill_value=0).astype(np.int64)
+        return resultat
+
+    def _kvantiler(self, persentiler):
+        """Anslår kvantiler per nøkkel fra histogrammet (midtpunktet i intervallet)."""
+        histogram = self.histogram.sort_index()
+        nøkler = histogram.index.droplevel("intervall")
+        kumulativ = histogram.groupby(level=NØKLER, observed=True).cumsum().to_numpy()
+        totalt = histogram.groupby(level=NØKLER, observed=True).transform("sum").to_numpy()
+        midtpunkt = (histogram.index.get_level_values("intervall").to_numpy() + 0.5) * self.oppløsning
+
+        kvantiler = {}
+        for q in persentiler:
+            # Første intervall der den kumulative andelen når q
+            treff = kumulativ >= np.maximum(q * totalt, 1)
+            første = pd.Series(np.where(treff, midtpunkt, np.nan), index=nøkler)
+            kvantiler[q] = første.groupby(level=NØKLER, observed=True).first()
+        return kvantiler
+
+    def resultat(self, persentiler=(0.05, 0.95)):
+        """
+        Returnerer statistikken som en tabell med én rad per (sourceId, variable).
+
+        Parametre:
+        - persentiler (tuple): Persentiler som skal anslås i tillegg til medianen.
+
+        Returnerer:
+        - DataFrame: Kolonnene sourceId, variable, antall, gjennomsnitt, median, standardavvik,
+          min, maks og én kolonne per persentil (f.eks. p05 og p95).
+        """
+        aggregater = self.aggregater.sort_index()
+        antall = aggregater["antall"]
+        kvantiler = self._kvantiler((0.5,) + tuple(persentiler))
+
+        resultat = pd.DataFrame({
+            "antall": antall.astype(np.int64),
+            "gjennomsnitt": aggregater["gjennomsnitt"],
+            "median": kvantiler[0.5].reindex(aggregater.index),
+            "standardavvik": np.sqrt(aggregater["m2"] / (antall - 1).where(antall > 1)),
+            "min": aggregater["min"],
+            "maks": aggregater["maks"],
+        }, index=aggregater.index)
+        for q in persentiler:
+            resultat[f"p{round(q * 100):02d}"] = kvantiler[q].reindex(aggregater.index)
+        return resultat.reset_index()
+
+    def lagre(self, mappe):
+        """
+        Lagrer tilstanden som to Parquet-filer og en JSON-fil med oppløsningen, slik at statistikken kan oppdateres videre senere.
+
+        Parametre:
+        - mappe (str): Mappen filene lagres i.
+        """
+        os.makedirs(mappe, exist_ok=True)
+        self.aggregater.reset_index().to_parquet(os.path.join(mappe, "aggregater.parquet"), index=False)
+        self.histogram.rename("antall").reset_index().to_parquet(os.path.join(mappe, "histogram.parquet"),
+                                                                 index=False)
+        pd.Series({"oppløsning": self.oppløsning}).to_json(os.path.join(mappe, "innstillinger.json"))
+
+    @classmethod
+    def les(cls, mappe):
+        """
+        Leser statistikk lagret med lagre().
+
+        Parametre:
+        - mappe (str): Mappen filene ligger i.
+
+        Returnerer:
+        - LøpendeStatistikk
+        """
+        innstillinger = pd.read_json(os.path.join(mappe, "innstillinger.json"), typ="series")
+        statistikk = cls(float(innstillinger["oppløsning"]))
+        aggregater = pd.read_parquet(os.path.join(mappe, "aggregater.parquet"))
+        histogram = pd.read_parquet(os.path.join(mappe, "histogram.parquet"))
+        aggregater = aggregater.astype({kolonne: str for kolonne in NØKLER})
+        histogram = histogram.astype({kolonne: str for kolonne in NØKLER})
+        statistikk.aggregater = aggregater.set_index(NØKLER)[_AGGREGATKOLONNER]
+        statistikk.histogram = histogram.set_index(NØKLER + ["intervall"])["antall"].astype(np.int64)
+        return statistikk
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import pandas as pd
+from datasett import VaerDatasett, filversjon
+
+
+def datahash(data):
+    """
+    Lager en hash av treningsdataene, som er lik så lenge dataene er uendret.
+
+    Parametere:
+    - data: Filsti (str eller Path) til CSV-filen eller Parquet-mappen (hashen bygger på
+      filstørrelse og endringstidspunkt, så filen leses ikke), et VaerDatasett eller en DataFrame.
+
+    Returnerer:
+    - str: SHA-256-hash som heksadesimal streng.
+    """
+    hasher = hashlib.sha256()
+    if isinstance(data, (str, os.PathLike)):
+        data = os.fspath(data)
+        hasher.update(repr((os.path.abspath(data), filversjon(data))).encode('utf-8'))
+    elif isinstance(data, VaerDatasett):
+        hasher.update(data.innholdshash().encode('utf-8'))
+    elif isinstance(data, pd.DataFrame):
+        hasher.update(repr(list(map(str, data.columns))).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    else:
+        raise TypeError(f"Kan ikke lage hash av data av typen {type(data).__name__}.")
+    return hasher.hexdigest()
+
+
+class Modellregister:
+    """
+    Lager for trente modeller og prediksjoner på disk.
+
+    Hver modell lagres (med pickle) under en nøkkel som er en hash av modellnavnet, konfigurasjonen
+    (f.eks. by, målvariabel og egenskaper) og treningsdataene. Så lenge dataene og konfigurasjonen
+    er uendret, leses modellen fra disk i stedet for å trenes på nytt, og innenfor samme prosess
+    hentes den fra minnet. Prediksjoner lagres per modell og tidsrom, slik at samme spørsmål
+    ("prognose for Oslo i morgen") besvares uten å kjøre modellen på nytt.
+
+    For hvert modellnavn og hver konfigurasjon beholdes de `maks_versjoner` nyeste modellene;
+    eldre modeller og prediksjonene deres slettes. Filene leses med pickle og skal bare komme fra dette registeret.
+    """
+
+    def __init__(self, mappe='../data/modeller', maks_versjoner=3):
+        """
+        Parametere:
+        - mappe (str): Mappen modellene lagres i. Opprettes hvis den ikke finnes.
+        - maks_versjoner (int): Antall versjoner som beholdes per modellnavn og konfigurasjon.
+        """
+        self.mappe = mappe
+        self.maks_versjoner = maks_versjoner
+        self.treff = 0
+        self.bom = 0
+        self._lås = threading.Lock()
+        self._modeller = {}
+        self._prediksjoner = {}
+        os.makedirs(os.path.join(mappe, 'prediksjoner'), exist_ok=True)
+
+    @staticmethod
+    def lag_nøkkel(navn, konfig, datahash):
+        """
+        Lager nøkkelen til en modell.
+
+        Parametere:
+        - navn (str): Modellnavnet, f.eks. 'prognose'.
+        - konfig (dict): Konfigurasjonen som påvirker modellen (må kunne skrives som JSON).
+        - datahash (str): Hashen av treningsdataene, fra datahash().
+
+        Returnerer:
+        - str: SHA-256-hash som heksadesimal streng.
+        """
+        innhold = json.dumps({'navn': navn, 'konfig': konfig, 'data': datahash}, sort_keys=True, default=str)
+        return hashlib.sha256(innhold.encode('utf-8')).hexdigest()
+
+    def _filsti(self, nøkkel):
+        return os.path.join(self.mappe, f"{nøkkel}.pkl")
+
+    def _prediksjonsfil(self, modellnøkkel, nøkkel):
+        # Modellnøkkelen står først, slik at prediksjonene kan slettes sammen med modellen
+        return os.path.join(self.mappe, 'prediksjoner', f"{modellnøkkel[:16]}-{nøkkel}.parquet")
+
+    def _indeksfil(self):
+        return os.path.join(self.mappe, 'register.json')
+
+    def _les_indeks(self):
+        try:
+            with open(self._indeksfil(), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _skriv_indeks(self, indeks):
+        midlertidig = f"{self._indeksfil()}.{threading.get_ident()}.tmp"
+        with open(midlertidig, 'w', encoding='utf-8') as f:
+            json.dump(indeks, f, indent=1, sort_keys=True, default=str)
+        os.replace(midlertidig, self._indeksfil())
+
+    def hent(self, nøkkel):
+        """
+        Henter en lagret modell, fra minnet hvis den allerede er lest i denne prosessen.
+
+        Returnerer:
+        - Modellen, eller None hvis den ikke finnes.
+        """
+        with self._lås:
+            if nøkkel in self._modeller:
+                self.treff += 1
+                return self._modeller[nøkkel]
+        try:
+            with open(self._filsti(nøkkel), 'rb') as f:
+                modell = pickle.load(f)
+        except (FileNotFoundError, OSError, pickle.UnpicklingError, EOFError):
+            with self._lås:
+                self.bom += 1
+            return None
+        with self._lås:
+            self.treff += 1
+            self._modeller[nøkkel] = modell
+        return modell
+
+    def lagre(self, nøkkel, modell, navn, konfig=None, datahash=None, treningstid=None):
+        """
+        Lagrer en modell og fører den inn i registeret. Eldre versjoner med samme navn og
+        konfigurasjon slettes når det er flere enn maks_versjoner.
+        """
+        midlertidig = f"{self._filsti(nøkkel)}.{threading.get_ident()}.tmp"
+        try:
+            with open(midlertidig, 'wb') as f:
+                pickle.dump(modell, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(midlertidig, self._filsti(nøkkel))
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Klarte ikke å lagre modellen {navn}. Feil: {e}")
+            return
+
+        # Samme form som konfigurasjonen får når den leses fra registeret
+        konfig = json.loads(json.dumps(konfig, sort_keys=True, default=str))
+        with self._lås:
+            self._modeller[nøkkel] = modell
+            indeks = self._les_indeks()
+            indeks[nøkkel] = {'navn': navn, 'konfig': konfig, 'datahash': datahash,
+                              'opprettet': time.time(), 'treningstid': treningstid}
+            # Versjoner er modeller med samme navn og konfigurasjon, trent på ulike data
+            versjoner = sorted((k for k, v in indeks.items() if v['navn'] == navn and v['konfig'] == konfig),
+                               key=lambda k: indeks[k]['opprettet'], reverse=True)
+            for gammel in versjoner[self.maks_versjoner:]:
+                self._slett_modell(gammel)
+                del indeks[gammel]
+            self._skriv_indeks(indeks)
+
+    def _slett_modell(self, nøkkel):
+        self._modeller.pop(nøkkel, None)
+        filer = [self._filsti(nøkkel)]
+        prediksjoner = os.path.join(self.mappe, 'prediksjoner')
+        filer += [os.path.join(prediksjoner, f) for f in os.listdir(prediksjoner) if f.startswith(nøkkel[:16] + '-')]
+        for filsti in filer:
+            try:
+                os.remove(filsti)
+            except OSError:
+                pass
+        self._prediksjoner = {k: v for k, v in self._prediksjoner.items() if k[0] != nøkkel}
+
+    def hent_eller_tren(self, navn, konfig, data, tren):
+        """
+        Henter modellen for navn, konfigurasjon og data hvis den finnes, og trener og lagrer den ellers.
+
+        Parametere:
+        - navn (str): Modellnavnet.
+        - konfig (dict): Konfigurasjonen som påvirker modellen.
+        - data: Treningsdataene (filsti, VaerDatasett eller DataFrame), se datahash().
+        - tren (callable): Funksjon uten argumenter som trener og returnerer modellen.
+          Kalles bare når modellen ikke finnes.
+
+        Returnerer:
+        - tuple: (modell, nøkkel)
+        """
+        hash_ = datahash(data)
+        nøkkel = self.lag_nøkkel(navn, konfig, hash_)
+        modell = self.hent(nøkkel)
+        if modell is None:
+            start = time.perf_counter()
+            modell = tren()
+            self.lagre(nøkkel, modell, navn, konfig, hash_, time.perf_counter() - start)
+        return modell, nøkkel
+
+    def hent_prediksjon(self, modellnøkkel, fra_dato, til_dato, beregn, **filtre):
+        """
+        Henter lagrede prediksjoner for en modell og et tidsrom, og beregner og lagrer dem ellers.
+
+        Parametere:
+        - modellnøkkel (str): Nøkkelen til modellen, fra hent_eller_tren.
+        - fra_dato, til_dato: Tidsrommet (datoer eller tekst som kan tolkes som dato).
+        - beregn (callable): Funksjon uten argumenter som returnerer prediksjonene som en DataFrame.
+        - filtre: Andre ting som skiller forespørslene, f.eks. by='Oslo'.
+
+        Returnerer:
+        - DataFrame: Prediksjonene.
+        """
+        nøkkel = self.lag_nøkkel('prediksjon', {'fra': str(pd.Timestamp(fra_dato).date()),
+                                                'til': str(pd.Timestamp(til_dato).date()), **filtre}, modellnøkkel)
+        with self._lås:
+            if (modellnøkkel, nøkkel) in self._prediksjoner:
+                self.treff += 1
+                return self._prediksjoner[(modellnøkkel, nøkkel)].copy()
+
+        filsti = self._prediksjonsfil(modellnøkkel, nøkkel)
+        if os.path.exists(filsti):
+            prediksjoner = pd.read_parquet(filsti)
+            with self._lås:
+                self.treff += 1
+        else:
+            prediksjoner = beregn()
+            midlertidig = f"{filsti}.{threading.get_ident()}.tmp"
+            prediksjoner.to_parquet(midlertidig, index=False)
+            os.replace(midlertidig, filsti)
+            with self._lås:
+                self.bom += 1
+        with self._lås:
+            self._prediksjoner[(modellnøkkel, nøkkel)] = prediksjoner
+        return prediksjoner.copy()
+
+    def oversikt(self):
+        """
+        Returnerer:
+        - DataFrame: Én rad per lagret modell med nøkkel, navn, konfig, datahash, opprettet og treningstid.
+        """
+        indeks = self._les_indeks()
+        oversikt = pd.DataFrame([{'nøkkel': k, **v} for k, v in indeks.items()],
+                                columns=['nøkkel', 'navn', 'konfig', 'datahash', 'opprettet', 'treningstid'])
+        oversikt['opprettet'] = pd.to_datetime(oversikt['opprettet'], unit='s')
+        return oversikt.sort_values('opprettet', ignore_index=True)
+
+    def tøm(self):
+        """Sletter alle lagrede modeller og prediksjoner og nullstiller tellerne."""
+        with self._lås:
+            for nøkkel in self._les_indeks():
+                self._slett_modell(nøkkel)
+            self._skriv_indeks({})
+            self._modeller.clear()
+            self._prediksjoner.clear()
+            self.treff = 0
+            self.bom = 0
+
+    def statistikk(self):
+        """
+        Returnerer:
+        - dict: Antall treff og bom (modeller og prediksjoner samlet), treffrate og antall lagrede modeller.
+        """
+        totalt = self.treff + self.bom
+        return {
+            'treff': self.treff,
+            'bom': self.bom,
+            'treffrate': self.treff / totalt if totalt else 0.0,
+            'antall_modeller': len(self._les_indeks()),
+        }
+
+
+_standard_register = None
+
+
+def standard_register():
+    """Returnerer registeret i '../data/modeller', som deles av alle kall i prosessen."""
+    global _standard_register
+    if _standard_register is None:
+        _standard_register = Modellregister()
+    return _standard_register
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+# Visuell nedsampling av lange tidsserier før de sendes til Plotly. En skjerm kan uansett bare
+# vise noen tusen punkter i bredden, så hver serie reduseres til et fast antall punkter som
+# bevarer formen: LTTB (Largest-Triangle-Three-Buckets) velger punktet i hver bøtte som gir størst
+# trekant med naboene, mens min/maks beholder høyeste og laveste verdi i hver bøtte (ingen
+# topper forsvinner). Med zoom regnes punktene ut på nytt fra alle dataene i det synlige utsnittet.
+
+STANDARD_MAKS_PUNKTER = 2000
+
+
+def _som_tall(x):
+    """Gjør om x-verdier (tall eller datoer) til float, slik at avstander kan regnes ut."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indekser(x, y, maks_punkter):
+    """
+    Velger indeksene til punktene som beholdes med LTTB.
+
+    Parametre:
+    - x (array): Stigende x-verdier (tall eller datoer).
+    - y (array): Verdiene. Må ikke inneholde NaN.
+    - maks_punkter (int): Antall punkter som beholdes (minst 3).
+
+    Returnerer:
+    - ndarray: Stigende indekser, alltid med første og siste punkt.
+    """
+    antall = len(y)
+    if antall <= maks_punkter or maks_punkter < 3:
+        return np.arange(antall)
+    x = _som_tall(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Første og siste punkt står alene; resten deles i maks_punkter - 2 like store bøtter
+    grenser = np.linspace(1, antall - 1, maks_punkter - 1).astype(np.int64)
+    # Gjennomsnittet av hver bøtte, og av siste punkt, er tredje hjørne i trekanten for
+    # bøtten foran; de regnes ut for alle bøttene på én gang
+    lengder = np.diff(np.append(grenser, antall))
+    snitt_x = np.add.reduceat(x, grenser) / lengder
+    snitt_y = np.add.reduceat(y, grenser) / lengder
+
+    valgt = np.empty(maks_punkter, dtype=np.int64)
+    valgt[0], valgt[-1] = 0, antall - 1
+    forrige = 0
+    for bøtte in range(maks_punkter - 2):
+        start, slutt = grenser[bøtte], grenser[bøtte + 1]
+        # Trekanten mellom forrige valgte punkt, hvert punkt i bøtten og snittet av neste bøtte
+        dx, dy = x[forrige] - snitt_x[bøtte + 1], snitt_y[bøtte + 1] - y[forrige]
+        areal = np.abs(dx * (y[start:slutt] - y[forrige]) - (x[forrige] - x[start:slutt]) * dy)
+        forrige = start + int(areal.argmax())
+        valgt[bøtte + 1] = forrige
+    return valgt
+
+
+def min_maks_indekser(x, y, maks_punkter):
+    """
+    Velger indeksene til minste og største verdi i hver bøtte (maks_punkter / 2 bøtter).
+
+    Parametre:
+    - x (array): Stigende x-verdier. Brukes ikke, men gir samme grensesnitt som lttb_indekser.
+    - y (array): Verdiene. Må ikke inneholde NaN.
+    - maks_punkter (int): Omtrentlig antall punkter som beholdes.
+
+    Returnerer:
+    - ndarray: Stigende indekser, alltid med første og siste punkt.
+    """
+    antall = len(y)
+    antall_bøtter = max(1, maks_punkter // 2)
+    if antall <= maks_punkter:
+        return np.arange(antall)
+    y = np.asarray(y, dtype=np.float64)
+    bøtte = np.arange(antall) * antall_bøtter // antall
+    # Sortert på bøtte og så verdi: første og siste i hver bøtte er min og maks
+    rekkefølge = np.lexsort((y, bøtte))
+    start = np.searchsorted(bøtte[rekkefølge], np.arange(antall_bøtter))
+    slutt = np.append(start[1:], antall) - 1
+    indekser = np.concatenate(([0, antall - 1], rekkefølge[start], rekkefølge[slutt]))
+    return np.unique(indekser)
+
+
+METODER = {"lttb": lttb_indekser, "min_maks": min_maks_indekser}
+
+
+def nedsample_indekser(x, y, maks_punkter=STANDARD_MAKS_PUNKTER, metode="lttb"):
+    """
+    Som nedsample, men returnerer indeksene til punktene som beholdes. Punkter uten verdi
+    hoppes over.
+
+    Returnerer:
+    - ndarray: Stigende indekser i x og y.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    har_verdi = np.flatnonzero(~np.isnan(y))
+    if maks_punkter is None or len(har_verdi) <= maks_punkter:
+        return har_verdi
+    if len(har_verdi) == len(y):
+        return METODER[metode](x, y, maks_punkter)
+    return har_verdi[METODER[metode](np.asarray(x)[har_verdi], y[har_verdi], maks_punkter)]
+
+
+def nedsample(x, y, maks_punkter=STANDARD_MAKS_PUNKTER, metode="lttb"):
+    """
+    Reduserer en serie til høyst omtrent maks_punkter punkter. Punkter uten verdi hoppes over.
+
+    Parametre:
+    - x (array eller Series): Stigende x-verdier (tall eller datoer).
+    - y (array eller Series): Verdiene.
+    - maks_punkter (int): Antall punkter som beholdes. None beholder alle.
+    - metode (str): "lttb" eller "min_maks".
+
+    Returnerer:
+    - tuple: (x, y) som numpy-tabeller.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    indekser = nedsample_indekser(x, y, maks_punkter, metode)
+    return x[indekser], y[indekser]
+
+
+def serier_per_gruppe(df, x, y, gruppe):
+    """
+    Deler en tabell i langt format i én serie per gruppe (f.eks. by), sortert på x.
+
+    Returnerer:
+    - list: (gruppe, x, y) for hver gruppe, i den rekkefølgen gruppene først dukker opp.
+    """
+    serier = []
+    for navn, del_ in df.groupby(gruppe, observed=True, sort=False):
+        del_ = del_.sort_values(x, kind="stable")
+        serier.append((navn, del_[x].to_numpy(), del_[y].to_numpy(dtype=np.float64)))
+    return serier
+
+
+def nedsample_per_gruppe(df, x, y, gruppe, maks_punkter=STANDARD_MAKS_PUNKTER, metode="lttb"):
+    """
+    Nedsampler en tabell i langt format, én serie per gruppe (f.eks. by).
+
+    Parametre:
+    - df (DataFrame): Dataene.
+    - x, y, gruppe (str): Kolonnene for x, y og gruppe.
+    - maks_punkter (int): Antall punkter per gruppe. None beholder alle.
+    - metode (str): "lttb" eller "min_maks".
+
+    Returnerer:
+    - DataFrame: Kolonnene x, y og gruppe, sortert på x innen hver gruppe og med gruppene i
+      samme rekkefølge som serier_per_gruppe.
+    """
+    deler = []
+    for navn, serie_x, serie_y in serier_per_gruppe(df, x, y, gruppe):
+        ny_x, ny_y = nedsample(serie_x, serie_y, maks_punkter, metode)
+        deler.append(pd.DataFrame({x: ny_x, y: ny_y, gruppe: navn}))
+    if not deler:
+        return df[[x, y, gruppe]].iloc[:0]
+    return pd.concat(deler, ignore_index=True)
+
+
+def zoombar_figur(fig, serier, maks_punkter=STANDARD_MAKS_PUNKTER, metode="lttb"):
+    """
+    Lager en FigureWidget der punktene regnes ut på nytt fra alle dataene når brukeren zoomer,
+    slik at detaljene kommer frem i utsnittet uten at alle punktene sendes til nettleseren.
+    Krever anywidget (Plotly 6) eller ipywidgets (eldre Plotly), og fungerer i Jupyter.
+
+    Parametre:
+    - fig (go.Figure): Figuren med nedsamplede spor.
+    - serier (list): Alle dataene som (x, y) for hvert spor, i samme rekkefølge som fig.data.
+    - maks_punkter (int): Antall punkter per spor i utsnittet.
+    - metode (str): "lttb" eller "min_maks".
+
+    Returnerer:
+    - go.FigureWidget
+    """
+    import plotly.graph_objects as go
+
+    widget = go.FigureWidget(fig)
+    fulle = [(np.asarray(x), np.asarray(y, dtype=np.float64)) for x, y in serier]
+
+    def grense(verdi, x):
+        if np.issubdtype(x.dtype, np.datetime64):
+            return pd.Timestamp(verdi).to_datetime64().astype(x.dtype)
+        return float(verdi)
+
+    def oppdater(layout, x_område):
+        with widget.batch_update():
+            for spor, (x, y) in zip(widget.data, fulle):
+                utsnitt = slice(None)
+                if x_område is not None:
+                    # Tar med ett punkt på hver side, så linjen går helt ut til kanten
+                    start = max(np.searchsorted(x, grense(x_område[0], x)) - 1, 0)
+                    slutt = np.searchsorted(x, grense(x_område[1], x), side="right") + 1
+                    utsnitt = slice(start, slutt)
+                spor.x, spor.y = nedsample(x[utsnitt], y[utsnitt], maks_punkter, metode)
+
+    widget.layout.on_change(oppdater, "xaxis.range")
+    return widget
@@ -0,0 +1,351 @@
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from datasett import STANDARD_NAVN
+from modellregister import standard_register
+from prediktiv_analyse import tren_modeller
+from prognose import prognose_neste_dag
+
+# Lokal prediksjonstjeneste over de trente modellene. Modellene lastes én gang ved oppstart (fra
+# modellregisteret, eller trenes lokalt første gang), og alt kjører uten nettverk. Tjenesten
+# tar imot én eller mange forespørsler om gangen:
+#
+#   {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {"nedbør": 2.5}}
+#       Lineær regresjon fra tren_modeller (samme dag, som i prediktiv_analyse.py).
+#   {"by": "Oslo", "maalvariabel": "temperatur", "dato": "2024-05-02"}
+#       Prognose for neste dag fra prognose.py (dato kan utelates).
+#
+# En bunke med forespørsler regnes ut med ett vektorisert kall per modelltype, og tjenesten
+# teller p50/p99-latens og prediksjoner per sekund. Kjøres fra src/ med
+#
+#   python prediksjonstjeneste.py server [port] [datafil]
+#   python prediksjonstjeneste.py batch forespørsler.jsonl [svar.jsonl] [datafil]
+
+FROST_NAVN = {navn: variabel for variabel, navn in STANDARD_NAVN.items()}
+
+
+class Latensmåler:
+    """Teller kall og prediksjoner og holder latensen for de siste kallene."""
+
+    def __init__(self, maks_antall=10_000):
+        self._latenser = deque(maxlen=maks_antall)
+        self._lås = threading.Lock()
+        self.start = time.time()
+        self.antall_kall = 0
+        self.antall_prediksjoner = 0
+        self.sekunder_i_arbeid = 0.0
+
+    def registrer(self, sekunder, antall_prediksjoner):
+        with self._lås:
+            self._latenser.append(sekunder)
+            self.antall_kall += 1
+            self.antall_prediksjoner += antall_prediksjoner
+            self.sekunder_i_arbeid += sekunder
+
+    def statistikk(self):
+        """
+        Returnerer:
+        - dict: Antall kall og prediksjoner, p50, p99 og maks latens per kall (millisekunder),
+          prediksjoner per sekund i arbeid og prediksjoner per sekund siden oppstart.
+        """
+        with self._lås:
+            latenser = np.array(self._latenser) * 1000
+            i_arbeid = self.sekunder_i_arbeid
+            antall = self.antall_prediksjoner
+            kall = self.antall_kall
+        oppetid = time.time() - self.start
+        return {
+            'antall_kall': kall,
+            'antall_prediksjoner': antall,
+            'p50_ms': float(np.percentile(latenser, 50)) if len(latenser) else None,
+            'p99_ms': float(np.percentile(latenser, 99)) if len(latenser) else None,
+            'maks_ms': float(latenser.max()) if len(latenser) else None,
+            'prediksjoner_per_sekund': antall / i_arbeid if i_arbeid else 0.0,
+            'prediksjoner_per_sekund_siden_start': antall / oppetid if oppetid else 0.0,
+            'oppetid_sekunder': oppetid,
+        }
+
+
+class Prediksjonstjeneste:
+    """
+    Svarer på forespørsler om prediksjoner fra modeller som er lastet inn ved oppstart.
+
+    >>> tjeneste = Prediksjonstjeneste('../data/BehandletVaerData.csv')
+    >>> tjeneste.prediker([{"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {"nedbør": 2.5}}])
+    """
+
+    def __init__(self, data='../data/BehandletVaerData.csv', maalvariabler=("temperatur", "nedbør"), register=None):
+        """
+        Parametre:
+        - data: Filsti, VaerDatasett eller værdata i langt format. Brukes bare til å trene
+          modellene som ikke allerede ligger i modellregisteret.
+        - maalvariabler (tuple): Målvariablene (norske navn) det lages modeller for.
+        - register (Modellregister): Standard er registeret i '../data/modeller'.
+        """
+        start = time.perf_counter()
+        register = register or standard_register()
+        self.målere = Latensmåler()
+
+        # Lineære modeller for alle byer og målvariabler, som én tabell med koeffisienter
+        konfig = {'maalvariabler': list(maalvariabler)}
+        modeller, _ = register.hent_eller_tren('lineære_modeller', konfig, data,
+                                               lambda: tren_modeller(data, maalvariabler=maalvariabler))
+        self.egenskaper = [k[len('koef_'):] for k in modeller.columns if k.startswith('koef_')]
+        self._rad = {(by, mål): i for i, (by, mål) in enumerate(zip(modeller['by'], modeller['maalvariabel']))}
+        self._skjæringspunkt = modeller['skjæringspunkt'].to_numpy(dtype=np.float64)
+        # Egenskaper som ikke inngår i en modell, har koeffisient NaN
+        self._koeffisienter = modeller[[f'koef_{e}' for e in self.egenskaper]].to_numpy(dtype=np.float64)
+
+        # Prognosene for neste dag regnes ut én gang, siden de bare endres når dataene endres
+        self._prognoser = {}
+        for mål in maalvariabler:
+            prognoser = prognose_neste_dag(data, maalvariabel=FROST_NAVN.get(mål, mål), register=register)
+            for by, dato, verdi in zip(prognoser['by'], prognoser['dato'], prognoser['prognose']):
+                self._prognoser[(by, mål)] = (dato, verdi)
+
+        self.byer = sorted({by for by, _ in self._rad} | {by for by, _ in self._prognoser})
+        self.oppstartstid = time.perf_counter() - start
+        print(f"Lastet {len(self._rad)} regresjonsmodeller og {len(self._prognoser)} prognoser "
+              f"på {self.oppstartstid:.2f} s")
+
+    @staticmethod
+    def _sjekk_tekstfelt(forespørsel):
+        """Gir ValueError hvis 'by', 'maalvariabel' eller 'dato' er oppgitt, men ikke som tekst."""
+        for nøkkel in ('by', 'maalvariabel', 'dato'):
+            if not isinstance(forespørsel.get(nøkkel, ''), str):
+                raise ValueError(f"'{nøkkel}' må være tekst.")
+
+    def _egenskapsrad(self, forespørsel):
+        """
+        Leser egenskapene i én regresjonsforespørsel i samme rekkefølge som self.egenskaper, med
+        NaN for egenskaper som ikke er oppgitt. Gir ValueError hvis forespørselen er ugyldig.
+        """
+        self._sjekk_tekstfelt(forespørsel)
+        egenskaper = forespørsel['egenskaper']
+        if not isinstance(egenskaper, dict):
+            raise ValueError("'egenskaper' må være et JSON-objekt med tall.")
+        rad = []
+        for egenskap in self.egenskaper:
+            verdi = egenskaper.get(egenskap)
+            if verdi is None:
+                rad.append(np.nan)
+            elif isinstance(verdi, bool) or not isinstance(verdi, (int, float)):
+                raise ValueError(f"Egenskapen {egenskap!r} må være et tall, ikke {verdi!r}.")
+            else:
+                rad.append(float(verdi))
+        return rad
+
+    def _prediker_regresjon(self, forespørsler, X):
+        """Regner ut alle regresjonsforespørslene med én matriseoperasjon, med egenskapene i X."""
+        rader = np.array([self._rad.get((f.get('by'), f.get('maalvariabel', 'temperatur')), -1)
+                          for f in forespørsler], dtype=np.int64)
+        X = np.asarray(X, dtype=np.float64).reshape(len(forespørsler), len(self.egenskaper))
+
+        koeffisienter = self._koeffisienter[np.maximum(rader, 0)]
+        brukes = ~np.isnan(koeffisienter)
+        mangler = (brukes & np.isnan(X)).any(axis=1)
+        prediksjoner = self._skjæringspunkt[np.maximum(rader, 0)] + np.where(brukes, koeffisienter * X, 0.0).sum(axis=1)
+
+        svar = []
+        for f, rad, verdi, mangler_egenskap, bruk in zip(forespørsler, rader, prediksjoner, mangler, brukes):
+            if rad < 0:
+                svar.append({'feil': f"Ingen modell for by={f.get('by')!r} og maalvariabel={f.get('maalvariabel')!r}."})
+            elif mangler_egenskap:
+                behøves = [e for e, b in zip(self.egenskaper, bruk) if b]
+                svar.append({'feil': f"Egenskapene {behøves} må oppgis."})
+            else:
+                svar.append({'by': f['by'], 'maalvariabel': f.get('maalvariabel', 'temperatur'),
+                             'prediksjon': float(verdi)})
+        return svar
+
+    def _prediker_prognose(self, forespørsel):
+        self._sjekk_tekstfelt(forespørsel)
+        mål = forespørsel.get('maalvariabel', 'temperatur')
+        lagret = self._prognoser.get((forespørsel.get('by'), mål))
+        if lagret is None:
+            return {'feil': f"Ingen prognose for by={forespørsel.get('by')!r} og maalvariabel={mål!r}."}
+        dato, verdi = lagret
+        ønsket = forespørsel.get('dato')
+        if ønsket is not None and pd.Timestamp(ønsket) != dato:
+            return {'feil': f"Prognoser finnes bare for {dato.date()} (dagen etter siste dag i dataene)."}
+        return {'by': forespørsel['by'], 'maalvariabel': mål, 'dato': str(dato.date()),
+                'prediksjon': None if np.isnan(verdi) else float(verdi)}
+
+    def prediker(self, forespørsler):
+        """
+        Svarer på én eller flere forespørsler.
+
+        Parametre:
+        - forespørsler (dict eller list): Én forespørsel eller en liste med forespørsler.
+          Forespørsler med 'egenskaper' går til regresjonsmodellene, de andre til prognosene.
+
+        Returnerer:
+        - dict eller list: Ett svar per forespørsel, i samme rekkefølge, med 'prediksjon' eller 'feil'.
+        """
+        start = time.perf_counter()
+        enkel = isinstance(forespørsler, dict)
+        liste = [forespørsler] if enkel else list(forespørsler)
+
+        svar = [None] * len(liste)
+        regresjon, X = [], []
+        for i, f in enumerate(liste):
+            if not isinstance(f, dict):
+                svar[i] = {'feil': "Hver forespørsel må være et JSON-objekt."}
+            elif 'egenskaper' in f:
+                # Hver forespørsel sjekkes for seg, slik at én ugyldig ikke stopper resten av bunken
+                try:
+                    X.append(self._egenskapsrad(f))
+                    regresjon.append(i)
+                except (TypeError, ValueError) as e:
+                    svar[i] = {'feil': f"Ugyldig forespørsel: {e}"}
+            else:
+                try:
+                    svar[i] = self._prediker_prognose(f)
+                except (TypeError, ValueError) as e:
+                    svar[i] = {'feil': f"Ugyldig forespørsel: {e}"}
+        if regresjon:
+            for i, s in zip(regresjon, self._prediker_regresjon([liste[i] for i in regresjon], X)):
+                svar[i] = s
+
+        self.målere.registrer(time.perf_counter() - start, len(liste))
+        return svar[0] if enkel else svar
+
+    def statistikk(self):
+        """Returnerer latens- og gjennomstrømningstellerne, se Latensmåler.statistikk."""
+        return {**self.målere.statistikk(), 'oppstart_sekunder': self.oppstartstid}
+
+
+def lag_server(tjeneste, vert='127.0.0.1', port=8000):
+    """
+    Lager en HTTP-server for tjenesten (starter den ikke). Endepunkter:
+    - POST /prediker med én forespørsel eller en liste som JSON
+    - GET /statistikk med latens og gjennomstrømning
+    - GET /helse
+
+    Parametre:
+    - tjeneste (Prediksjonstjeneste): Tjenesten med modellene.
+    - vert (str): Adressen serveren lytter på. Standard er bare denne maskinen.
+    - port (int): Porten. 0 velger en ledig port.
+
+    Returnerer:
+    - ThreadingHTTPServer: Kall serve_forever() for å starte og shutdown() for å stoppe.
+    """
+
+    class Håndterer(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Hodet og innholdet skrives hver for seg; uten TCP_NODELAY venter svaret på forsinket ACK
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _svar(self, status, innhold):
+            data = json.dumps(innhold, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/helse':
+                self._svar(200, {'status': 'ok', 'byer': len(tjeneste.byer)})
+            elif self.path == '/statistikk':
+                self._svar(200, tjeneste.statistikk())
+            else:
+                self._svar(404, {'feil': f"Ukjent sti: {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/prediker':
+                self._svar(404, {'feil': f"Ukjent sti: {self.path}"})
+                return
+            try:
+                lengde = int(self.headers['Content-Length'])
+                if lengde < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                self._svar(400, {'feil': "Content-Length må være oppgitt som et ikke-negativt heltall."})
+                return
+            try:
+                forespørsler = json.loads(self.rfile.read(lengde) or b'null')
+            except ValueError as e:
+                self._svar(400, {'feil': f"Ugyldig JSON: {e}"})
+                return
+            if not isinstance(forespørsler, (dict, list)):
+                self._svar(400, {'feil': "Forventet et JSON-objekt eller en liste."})
+                return
+            self._svar(200, tjeneste.prediker(forespørsler))
+
+        def log_message(self, format, *args):
+            # Logger ikke hver forespørsel; tellerne ligger i /statistikk
+            pass
+
+    return ThreadingHTTPServer((vert, port), Håndterer)
+
+
+def kjør_batch(tjeneste, inn, ut=None, bitestørrelse=10_000):
+    """
+    Svarer på forespørsler fra en fil med én JSON-forespørsel per linje, i bunker. En linje
+    som ikke er gyldig JSON, får en feil som svar på sin plass, og resten svares på som vanlig.
+
+    Parametre:
+    - tjeneste (Prediksjonstjeneste): Tjenesten med modellene.
+    - inn (str): Filsti til forespørslene (JSON Lines).
+    - ut (str): Filsti for svarene (JSON Lines). Standard er å skrive til skjermen.
+    - bitestørrelse (int): Antall forespørsler per bunke.
+
+    Returnerer:
+    - dict: Statistikken fra tjenesten.
+    """
+    def skriv(bunke, feil):
+        # Svarene for de gyldige linjene flettes inn mellom feilene, i samme rekkefølge som i filen
+        svar = iter(tjeneste.prediker([f for i, f in enumerate(bunke) if i not in feil]))
+        utfil.writelines(json.dumps(feil[i] if i in feil else next(svar), ensure_ascii=False) + '\n'
+                         for i in range(len(bunke)))
+
+    utfil = open(ut, 'w', encoding='utf-8') if ut else sys.stdout
+    try:
+        with open(inn, encoding='utf-8') as f:
+            bunke, feil = [], {}
+            for nummer, linje in enumerate(f, start=1):
+                if not linje.strip():
+                    continue
+                try:
+                    bunke.append(json.loads(linje))
+                except ValueError as e:
+                    feil[len(bunke)] = {'feil': f"Ugyldig JSON på linje {nummer}: {e}"}
+                    bunke.append(None)
+                if len(bunke) >= bitestørrelse:
+                    skriv(bunke, feil)
+                    bunke, feil = [], {}
+            if bunke:
+                skriv(bunke, feil)
+    finally:
+        if ut:
+            utfil.close()
+    return tjeneste.statistikk()
+
+
+if __name__ == '__main__':
+    modus = sys.argv[1] if len(sys.argv) > 1 else 'server'
+    if modus == 'server':
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+        server = lag_server(Prediksjonstjeneste(sys.argv[3] if len(sys.argv) > 3 else '../data/BehandletVaerData.csv'),
+                            port=port)
+        print(f"Prediksjonstjenesten lytter på http://127.0.0.1:{server.server_address[1]}/prediker")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif modus == 'batch':
+        tjeneste = Prediksjonstjeneste(sys.argv[4] if len(sys.argv) > 4 else '../data/BehandletVaerData.csv')
+        statistikk = kjør_batch(tjeneste, sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        print(json.dumps(statistikk, indent=1), file=sys.stderr)
+    else:
+        print("Bruk: python prediksjonstjeneste.py server [port] [datafil] | batch forespørsler.jsonl [svar.jsonl] [datafil]")
@@ -1,50 +1,48 @@
+import time
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score, mean_absolute_percentage_error
-from sklearn.model_selection import train_test_split
+from datasett import STANDARD_NAVN, VaerDatasett, hent_datasett
+from modellregister import standard_register
+from visning import benevning, ferdig_figur
 
 # Har benyttet oss av docStrings for å kunne forklare hva de ulike funksjonene/metodene gjør. 
+# sklearn, matplotlib og seaborn importeres først i funksjonene som trener modeller eller lager
+# figurer, slik at det går raskt å importere modulen bare for å hente og strukturere data.
 
-def hent_og_strukturer_data(filsti, by=None):
+def hent_og_strukturer_data(filsti, by=None, imputer=None, maks_lengde=None):
     """
     Leser værdata fra fil og strukturerer det for analyse.
+    Filen leses og pivoteres bare første gang (se datasett.py); senere kall for andre byer
+    hentes fra datasettet i minnet.
     
     Parametere:
-        filsti: Filsti til CSV-filen.
+        filsti: Filsti til CSV-filen eller Parquet-mappen, eller et VaerDatasett.
         by: Hvis by er oppgitt filtreres data kun for denne byen.
+        imputer: Metode (eller liste av metoder) for å fylle manglende dager før rader med
+            manglende verdier fjernes, f.eks. "lineær" eller ["nabostasjon", "klimatologi"].
+            Se imputering.imputer(). Standard er å bare fjerne radene.
+        maks_lengde: Fyll bare hull på høyst så mange dager (brukes med imputer).
     
     Returnerer en DataFrame med kolonnene dato, temperatur, nedbør.
     """
-    df = pd.read_csv(filsti)
-
-    # Beholder bare relevante variabler
-    df = df[df["variable"].isin(["air_temperature P1D", "precipitation_amount P1D"])]
-
-    # Filtrer på by hvis ønskelig
-    if by:
-        df = df[df["by"] == by]
-
-    # Pivotering for å få temperatur og nedbør som kolonner
-    df_pivot = df.pivot_table(index="referenceTime",
-                               columns="variable",
-                               values="value",
-                               aggfunc="mean").reset_index()
-
-    df_pivot = df_pivot.rename(columns={
-        "referenceTime": "dato",
-        "air_temperature P1D": "temperatur",
-        "precipitation_amount P1D": "nedbør"
-    })
-
-    df_pivot["dato"] = pd.to_datetime(df_pivot["dato"])
-
-    # Fjerner rader med manglende verdier
-    df_pivot = df_pivot.dropna(subset=["temperatur", "nedbør"])
-
-    return df_pivot
+    datasett = filsti if isinstance(filsti, VaerDatasett) else hent_datasett(filsti)
+    variabler = ("air_temperature P1D", "precipitation_amount P1D")
+
+    if imputer is None:
+        # Beholder bare temperatur og nedbør, og fjerner rader med manglende verdier
+        return datasett.strukturer(by=by, variabler=variabler)
+
+    from imputering import imputer as fyll
+    # Alle byene fylles samtidig, slik at de andre byene kan brukes som nabostasjoner
+    fylt = fyll(datasett.daglig(variabler=sorted(variabler)), imputer, maks_lengde=maks_lengde)
+    if by is not None:
+        fylt = fylt[by] if by in fylt.columns.get_level_values("by") else fylt.iloc[:0, :0]
+    else:
+        fylt = fylt.T.groupby(level="variable").mean().T
+    df = fylt.reindex(columns=sorted(variabler)).rename(columns=STANDARD_NAVN)
+    df.columns.name = None
+    df = df.rename_axis("dato").reset_index()
+    return df.dropna(subset=[STANDARD_NAVN[v] for v in variabler]).reset_index(drop=True)
 
 def legg_til_manglende_verdier(df, andel_missing=0.1, seed=42):
     """
@@ -62,11 +60,14 @@ def legg_til_manglende_verdier(df, andel_missing=0.1, seed=42):
     
     return df_kopi
 
-def vis_manglende_verdier(df_med_mangler):
+def vis_manglende_verdier(df_med_mangler, vis=True):
     """
     Lager en linjegraf som viser hvordan manglende verdier påvirker temperatur- og nedbørstrender.
+    Med vis=False vises ikke figuren; den returneres uansett.
     """
-    plt.figure(figsize=(12, 6))
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 6))
 
     plt.plot(df_med_mangler["dato"], df_med_mangler["temperatur"], label="Temperatur (med manglende verdier)", color="orange")
     plt.plot(df_med_mangler["dato"], df_med_mangler["nedbør"], label="Nedbør (med manglende verdier)", color="blue")
@@ -76,8 +77,7 @@ def vis_manglende_verdier(df_med_mangler):
     plt.ylabel("Verdi")
     plt.legend()
     plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    return ferdig_figur(fig, vis)
 
 def tren_modell(data, maalvariabel):
     """
@@ -89,6 +89,9 @@ def tren_modell(data, maalvariabel):
     
     Returnerer: modell, X_test, y_test, y_pred, r2, mape
     """
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import r2_score, mean_absolute_percentage_error
+    from sklearn.model_selection import train_test_split
 
     X = data.drop(columns=[maalvariabel, 'dato'])  
     y = data[maalvariabel]
@@ -106,52 +109,179 @@ def tren_modell(data, maalvariabel):
 
     return modell, X_test, y_test, y_pred, r2, mape
 
-def vis_regresjon_resultat_scatter(X_test, y_test, y_pred, df, variabelnavn):
+def hent_eller_tren_modell(filsti, by, maalvariabel, register=None):
     """
-    Viser scatterplot av faktisk vs predikert verdi over tid med ekte datoer på x-aksen.
+    Som tren_modell for én by, men modellen lagres i modellregisteret og trenes bare på nytt når
+    dataene er endret. Filen leses ikke når modellen allerede finnes.
+
+    Parametere:
+        filsti: Filsti til CSV-filen eller Parquet-mappen, eller et VaerDatasett.
+        by: Byen modellen gjelder (None for gjennomsnittet av alle byer).
+        maalvariabel: Strengen 'temperatur' eller 'nedbør'
+        register: Modellregister. Standard er registeret i '../data/modeller'.
+
+    Returnerer: modell, X_test, y_test, y_pred, r2, mape (som tren_modell)
+    """
+    register = register or standard_register()
+    konfig = {'by': by, 'maalvariabel': maalvariabel, 'test_andel': 0.2, 'seed': 42}
+    resultat, _ = register.hent_eller_tren(
+        'lineær_regresjon', konfig, filsti,
+        lambda: tren_modell(hent_og_strukturer_data(filsti, by=by), maalvariabel))
+    return resultat
+
+def _del_i_trening_og_test(antall, test_andel, seed):
+    """
+    Returnerer en maske for testradene blant de første antall radene, med samme tilfeldige
+    oppdeling som train_test_split(test_size=test_andel, random_state=seed).
+    """
+    test = np.zeros(antall, dtype=bool)
+    test[np.random.RandomState(seed).permutation(antall)[:int(np.ceil(test_andel * antall))]] = True
+    return test
+
+def tren_modeller(filsti, byer=None, maalvariabler=("temperatur", "nedbør"),
+                  variabler=("air_temperature P1D", "precipitation_amount P1D"), test_andel=0.2, seed=42,
+                  min_antall=10):
+    """
+    Trener en lineær regresjonsmodell for hver kombinasjon av by og målvariabel på én gang.
+    Som i tren_modell brukes de andre variablene som forklaringsvariabler, og hver by deles
+    tilfeldig i trening og test på samme måte som train_test_split(random_state=seed), slik at
+    resultatene er de samme som ved å kalle tren_modell for hver by.
+
+    Dataene for alle byene hentes ut som én tabell (by × dato × variabel), og alle
+    minste kvadraters problemer løses samtidig med normallikningene, der hver modell bare
+    ser sine egne treningsrader.
+
+    Parametere:
+        filsti: Filsti til CSV-filen eller Parquet-mappen, eller et VaerDatasett.
+        byer: Byene det skal trenes modeller for. Standard er alle.
+        maalvariabler: Målvariablene (norske navn, f.eks. 'temperatur' og 'nedbør').
+        variabler: Variablene fra Frost som brukes; målvariablene må være blant disse.
+        test_andel: Andelen av radene i hver by som brukes til testing.
+        seed: Frø for den tilfeldige oppdelingen.
+        min_antall: Byer med færre datoer der alle variablene har verdi, hoppes over.
+
+    Returnerer en DataFrame med én rad per modell og kolonnene by, maalvariabel, antall_trening,
+    antall_test, skjæringspunkt, én koeffisient per forklaringsvariabel (koef_<navn>), r2 og mape.
+    Antall modeller per sekund skrives ut og ligger i resultat.attrs['modeller_per_sekund'].
+    """
+    start = time.perf_counter()
+    datasett = filsti if isinstance(filsti, VaerDatasett) else hent_datasett(filsti)
+    byer = datasett.byer() if byer is None else list(byer)
+    # Samme rekkefølge på kolonnene som i hent_og_strukturer_data
+    frost_navn = sorted(variabler)
+    navn = [STANDARD_NAVN.get(v, v) for v in frost_navn]
+
+    # Én tabell med form (by, dato, variabel)
+    matrise = datasett.matrise(byer, frost_navn)
+    kolonner = pd.MultiIndex.from_product([byer, frost_navn], names=["by", "variable"])
+    verdier = (matrise.reindex(columns=kolonner).to_numpy(dtype=np.float64)
+                      .reshape(len(matrise), len(byer), len(frost_navn)).transpose(1, 0, 2))
+
+    # Flytter datoene der alle variablene har verdi først (i datorekkefølge) for hver by
+    gyldig = ~np.isnan(verdier).any(axis=2)
+    antall = gyldig.sum(axis=1)
+    rekkefølge = np.argsort(~gyldig, axis=1, kind="stable")[:, :antall.max(initial=0)]
+    verdier = np.take_along_axis(verdier, rekkefølge[:, :, None], axis=1)
+    med = antall >= min_antall
+    byer, verdier, antall = [by for by, m in zip(byer, med) if m], verdier[med], antall[med]
+
+    # Trening og test for hver by; radene etter de gyldige er med i ingen av dem
+    rad = np.arange(verdier.shape[1])
+    test = np.zeros(verdier.shape[:2], dtype=bool)
+    for n in np.unique(antall):
+        # Byer med like mange rader får samme oppdeling, som med train_test_split
+        test[antall == n, :n] = _del_i_trening_og_test(n, test_andel, seed)
+    trening = (rad < antall[:, None]) & ~test
+    verdier = np.where((rad < antall[:, None])[:, :, None], verdier, 0.0)
+
+    deler = []
+    for maalvariabel in maalvariabler:
+        mål = navn.index(maalvariabel)
+        forklarende = [k for k in range(len(navn)) if k != mål]
+        X, y = verdier[:, :, forklarende], verdier[:, :, mål]
+
+        # Sentrerer med gjennomsnittet av treningsradene, slik at skjæringspunktet faller ut
+        vekt = trening.astype(np.float64)
+        n_trening = vekt.sum(axis=1)
+        x_snitt = np.einsum("bn,bnk->bk", vekt, X) / n_trening[:, None]
+        y_snitt = (vekt * y).sum(axis=1) / n_trening
+        Xs = (X - x_snitt[:, None, :]) * vekt[:, :, None]
+        ys = (y - y_snitt[:, None]) * vekt
+        XtX = np.einsum("bnk,bnl->bkl", Xs, Xs)
+        Xty = np.einsum("bnk,bn->bk", Xs, ys)
+        # Pseudoinvers gir samme minste-norm-løsning som LinearRegression når kolonnene er avhengige
+        koeffisienter = (np.linalg.pinv(XtX) @ Xty[:, :, None])[:, :, 0]
+        skjæringspunkt = y_snitt - (x_snitt * koeffisienter).sum(axis=1)
+
+        # R^2 og MAPE på testradene, som r2_score og mean_absolute_percentage_error
+        y_pred = skjæringspunkt[:, None] + np.einsum("bnk,bk->bn", X, koeffisienter)
+        n_test = test.sum(axis=1)
+        y_test_snitt = np.where(test, y, 0.0).sum(axis=1) / n_test
+        ss_res = np.where(test, (y - y_pred) ** 2, 0.0).sum(axis=1)
+        ss_tot = np.where(test, (y - y_test_snitt[:, None]) ** 2, 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r2 = 1 - ss_res / ss_tot
+            feil = np.abs(y - y_pred) / np.maximum(np.abs(y), np.finfo(np.float64).eps)
+        mape = np.where(test, feil, 0.0).sum(axis=1) / n_test
+
+        del_ = pd.DataFrame({
+            "by": byer,
+            "maalvariabel": maalvariabel,
+            "antall_trening": n_trening.astype(np.int64),
+            "antall_test": n_test,
+            "skjæringspunkt": skjæringspunkt,
+        })
+        for k, koeffisient in zip(forklarende, koeffisienter.T):
+            del_[f"koef_{navn[k]}"] = koeffisient
+        del_["r2"] = r2
+        del_["mape"] = mape
+        deler.append(del_)
+
+    resultat = pd.concat(deler, ignore_index=True)
+    resultat = resultat[[k for k in resultat.columns if k not in ("r2", "mape")] + ["r2", "mape"]]
+    tid = time.perf_counter() - start
+    resultat.attrs["modeller_per_sekund"] = len(resultat) / tid if tid > 0 else float("inf")
+    print(f"Trente {len(resultat)} modeller på {tid:.2f} s ({resultat.attrs['modeller_per_sekund']:.0f} modeller/s)")
+    return resultat
+
+def resultattabell(X_test, y_test, y_pred, df):
+    """
+    Samler faktiske og predikerte verdier med datoene fra det opprinnelige datasettet.
 
     Parametre:
-        X_test: array-like, testverdier brukt til prediksjon
+        X_test: DataFrame, testverdier brukt til prediksjon (indeksen peker på rader i df)
         y_test: array-like, faktiske verdier
         y_pred: array-like, predikerte verdier
         df: pandas DataFrame, opprinnelig datasett med 'dato'-kolonne
-        variabelnavn: str, navn på variabelen som predikeres (f.eks. "temperatur")
-    """
 
-    datoer_test = df.iloc[X_test.index]['dato']
-
-    # lager dataframe for plotting
-    df_resultat = pd.DataFrame({
-        'dato': datoer_test,
+    Returnerer: DataFrame med kolonnene dato, faktisk og predikert.
+    """
+    return pd.DataFrame({
+        'dato': df.iloc[X_test.index]['dato'],
         'faktisk': y_test,
         'predikert': y_pred
     })
-    # if-setninger for å tilpasse titel på y-aksen
-    if variabelnavn == "temperatur":
-        y_benevning = "Temperatur (°C)"
-    elif variabelnavn == "nedbør":
-        y_benevning = "mm nedbør"
-    elif variabelnavn == "vindstyrke":
-        y_benevning = "m/s"
-    else:
-        y_benevning = "verdi"
 
-    # Plotter
-    plt.figure(figsize=(12, 6))
-    plt.scatter(df_resultat['dato'], df_resultat['faktisk'], label='Faktisk', alpha=0.6)
-    plt.scatter(df_resultat['dato'], df_resultat['predikert'], label='Predikert', alpha=0.6)
-    plt.title(f'Faktisk vs Predikert {variabelnavn.capitalize()} (Scatterplot)')
+def _regresjonsfigur(df_resultat, variabelnavn, diagramtype, tegn, vis):
+    """
+    Felles oppsett for figurene med faktisk vs predikert verdi: lager figuren, lar tegn(plt, df_resultat)
+    tegne dataene, og setter tittel, akser og rutenett.
+    """
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 6))
+    tegn(plt, df_resultat)
+    plt.title(f'Faktisk vs Predikert {variabelnavn.capitalize()} ({diagramtype})')
     plt.xlabel('Dato')
-    plt.ylabel(f'{y_benevning}')
-    plt.legend()
+    # Tilpasser tittel på y-aksen til variabelen
+    plt.ylabel(benevning(variabelnavn))
     plt.xticks(rotation=45)
-    plt.tight_layout()
     plt.grid(True)
-    plt.show()
+    return ferdig_figur(fig, vis)
 
-def vis_regresjon_resultat_søyle(X_test, y_test, y_pred, df, variabelnavn):
+def vis_regresjon_resultat_scatter(X_test, y_test, y_pred, df, variabelnavn, vis=True):
     """
-    Viser søylediagram av faktisk vs predikert verdi over tid med datoer på x-aksen.
+    Viser scatterplot av faktisk vs predikert verdi over tid med ekte datoer på x-aksen.
 
     Parametre:
         X_test: array-like, testverdier brukt til prediksjon
@@ -159,43 +289,41 @@ def vis_regresjon_resultat_søyle(X_test, y_test, y_pred, df, variabelnavn):
         y_pred: array-like, predikerte verdier
         df: pandas DataFrame, opprinnelig datasett med 'dato'-kolonne
         variabelnavn: str, navn på variabelen som predikeres (f.eks. "temperatur")
-    """
-    datoer_test = df.iloc[X_test.index]['dato']
+        vis: bool, vis figuren. Sett til False for å bare lage den (f.eks. for å lagre til fil).
 
-    df_resultat = pd.DataFrame({
-        'dato': datoer_test,
-        'faktisk': y_test,
-        'predikert': y_pred
-    })
+    Returnerer: Matplotlib-figuren.
+    """
+    def tegn(plt, df_resultat):
+        plt.scatter(df_resultat['dato'], df_resultat['faktisk'], label='Faktisk', alpha=0.6)
+        plt.scatter(df_resultat['dato'], df_resultat['predikert'], label='Predikert', alpha=0.6)
+        plt.legend()
 
-    x = df_resultat['dato']
-    width = 0.4
+    return _regresjonsfigur(resultattabell(X_test, y_test, y_pred, df), variabelnavn, 'Scatterplot', tegn, vis)
 
-    # if-setninger for å tilpasse tittel på y-aksen
-    if variabelnavn == "temperatur":
-        y_benevning = "Temperatur (°C)"
-    elif variabelnavn == "nedbør":
-        y_benevning = "mm nedbør"
-    elif variabelnavn == "vindstyrke":
-        y_benevning = "m/s"
-    else:
-        y_benevning = "verdi"
+def vis_regresjon_resultat_søyle(X_test, y_test, y_pred, df, variabelnavn, vis=True):
+    """
+    Viser søylediagram av faktisk vs predikert verdi over tid med datoer på x-aksen.
 
-    plt.figure(figsize=(12, 6))
-    plt.bar(x - pd.Timedelta(days=0.2), df_resultat['faktisk'], width=width, label='Faktisk', align='center')
-    plt.bar(x + pd.Timedelta(days=0.2), df_resultat['predikert'], width=width, label='Predikert', align='center')
-    plt.title(f'Faktisk vs Predikert {variabelnavn.capitalize()} (Søylediagram)')
-    plt.xlabel('Dato')
-    plt.ylabel(f'{y_benevning}')
+    Parametre:
+        X_test: array-like, testverdier brukt til prediksjon
+        y_test: array-like, faktiske verdier
+        y_pred: array-like, predikerte verdier
+        df: pandas DataFrame, opprinnelig datasett med 'dato'-kolonne
+        variabelnavn: str, navn på variabelen som predikeres (f.eks. "temperatur")
+        vis: bool, vis figuren. Sett til False for å bare lage den (f.eks. for å lagre til fil).
 
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    Returnerer: Matplotlib-figuren.
+    """
+    def tegn(plt, df_resultat):
+        x = df_resultat['dato']
+        width = 0.4
+        plt.bar(x - pd.Timedelta(days=0.2), df_resultat['faktisk'], width=width, label='Faktisk', align='center')
+        plt.bar(x + pd.Timedelta(days=0.2), df_resultat['predikert'], width=width, label='Predikert', align='center')
+        plt.legend()
 
-    plt.grid(True)
-    plt.show()
+    return _regresjonsfigur(resultattabell(X_test, y_test, y_pred, df), variabelnavn, 'Søylediagram', tegn, vis)
 
-def vis_regresjon_resultat_linje(X_test, y_test, y_pred, df, variabelnavn):
+def vis_regresjon_resultat_linje(X_test, y_test, y_pred, df, variabelnavn, vis=True):
     """
     Viser linjediagram av faktiske verdier vs predikerte verdi over tid med datoer på x-aksen.
 
@@ -205,38 +333,20 @@ def vis_regresjon_resultat_linje(X_test, y_test, y_pred, df, variabelnavn):
         y_pred: array-like, predikerte verdier
         df: pandas DataFrame, opprinnelig datasett med 'dato'-kolonne
         variabelnavn: str, navn på variabelen som predikeres (f.eks. "temperatur")
-    """
-    datoer_test = df.iloc[X_test.index]['dato']
-
-    df_resultat = pd.DataFrame({
-        'dato': datoer_test,
-        'Faktisk': y_test,
-        'Predikert': y_pred
-    })
+        vis: bool, vis figuren. Sett til False for å bare lage den (f.eks. for å lagre til fil).
 
-    # if-setninger for å tilpasse tittel på y-aksen
-    if variabelnavn == "temperatur":
-        y_benevning = "Temperatur (°C)"
-    elif variabelnavn == "nedbør":
-        y_benevning = "mm nedbør"
-    elif variabelnavn == "vindstyrke":
-        y_benevning = "m/s"
-    else:
-        y_benevning = "verdi"
+    Returnerer: Matplotlib-figuren.
+    """
+    def tegn(plt, df_resultat):
+        import seaborn as sns
 
-    # Gjør dataframe "long format" for seaborn. 
-    df_melted = df_resultat.melt(id_vars='dato', value_vars=['Faktisk', 'Predikert'],
-                                 var_name='Type', value_name=variabelnavn.capitalize())
+        # Gjør dataframe "long format" for seaborn.
+        df_melted = (df_resultat.rename(columns={'faktisk': 'Faktisk', 'predikert': 'Predikert'})
+                                .melt(id_vars='dato', value_vars=['Faktisk', 'Predikert'],
+                                      var_name='Type', value_name=variabelnavn.capitalize()))
+        sns.lineplot(data=df_melted, x='dato', y=variabelnavn.capitalize(), hue='Type', marker='o')
 
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(data=df_melted, x='dato', y=variabelnavn.capitalize(), hue='Type', marker='o')
-    plt.title(f'Faktisk vs Predikert {variabelnavn.capitalize()} (Linjediagram)')
-    plt.xlabel('Dato')
-    plt.ylabel(f'{y_benevning}')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.grid(True)
-    plt.show()
+    return _regresjonsfigur(resultattabell(X_test, y_test, y_pred, df), variabelnavn, 'Linjediagram', tegn, vis)
 
 def filtrer_byer(filsti):
     """
@@ -244,10 +354,10 @@ def filtrer_byer(filsti):
     Kan brukes til å se hvilke byer man kan velge blant i analysen.
     
     Parametere:
-        filsti: Filsti til CSV-filen.
+        filsti: Filsti til CSV-filen eller Parquet-mappen, eller et VaerDatasett.
     
     Returnerer:
         Liste med unike bynavn.
     """
-    df = pd.read_csv(filsti)
-    return df["by"].dropna().unique().tolist()
\ No newline at end of file
+    datasett = filsti if isinstance(filsti, VaerDatasett) else hent_datasett(filsti)
+    return datasett.byer()
\ No newline at end of file
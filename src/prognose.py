@@ -0,0 +1,379 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datasett import STANDARD_NAVN, VaerDatasett, hent_datasett
+from modellregister import standard_register
+
+# Prognose for neste dag per stasjon. I motsetning til tren_modell i prediktiv_analyse.py, som
+# forklarer en variabel med andre variabler samme dag og deler dataene tilfeldig, bruker
+# prognosene bare verdier fra dagene før (forsinkede verdier, rullerende gjennomsnitt og
+# årstid), og evalueres med walk-forward: modellen trenes på alt før en dato og testes på dagene
+# etter. Egenskapene lages for alle stasjoner samtidig, og modellen lagres som summene i
+# normallikningene (Z'Z og Z'y), slik at nye dager kan legges til uten å trene på nytt.
+
+STANDARD_VARIABLER = ("air_temperature P1D", "precipitation_amount P1D")
+STANDARD_FORSINKELSER = (1, 2, 3, 7)
+STANDARD_VINDUER = (7, 30)
+# Antall stasjoner som behandles om gangen, slik at egenskapstabellen holder seg liten i minnet
+BITESTØRRELSE = 64
+
+
+def daglig_tabell(data, byer=None, variabler=STANDARD_VARIABLER):
+    """
+    Henter værdata som én tabell med én rad per dag (uten hull) og én kolonne per (by, variabel).
+
+    Parametre:
+    - data: VaerDatasett, filsti til CSV-filen eller Parquet-mappen, eller værdata i langt format.
+    - byer (list): Byene som skal være med. Standard er alle.
+    - variabler (tuple): Variablene som skal være med.
+
+    Returnerer:
+    - DataFrame: Indeks 'dato' og kolonner med MultiIndex (by, variable), med alle kombinasjoner
+      av byene og variablene.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        data = hent_datasett(os.fspath(data))
+    elif not isinstance(data, VaerDatasett):
+        data = VaerDatasett(data)
+    return data.daglig(byer, variabler)
+
+
+def _som_tabell(matrise, antall_variabler):
+    """Gjør om den daglige tabellen til en numpy-tabell med form (by, dag, variabel)."""
+    verdier = matrise.to_numpy(dtype=np.float64)
+    return verdier.reshape(len(matrise), -1, antall_variabler).transpose(1, 0, 2)
+
+
+def egenskapsnavn(variabler=STANDARD_VARIABLER, forsinkelser=STANDARD_FORSINKELSER, vinduer=STANDARD_VINDUER):
+    """Returnerer navnene på egenskapene i samme rekkefølge som lag_egenskaper."""
+    korte = [STANDARD_NAVN.get(v, v) for v in variabler]
+    navn = [f"{v}_forsinket_{f}" for f in forsinkelser for v in korte]
+    navn += [f"{v}_snitt_{w}" for w in vinduer for v in korte]
+    return navn + ["dag_sin", "dag_cos"]
+
+
+def lag_egenskaper(verdier, datoer, forsinkelser=STANDARD_FORSINKELSER, vinduer=STANDARD_VINDUER):
+    """
+    Lager egenskapene for å forutsi dag t for alle stasjoner samtidig. Alle egenskapene bruker bare
+    dagene før t, bortsett fra årstiden, som er kjent på forhånd.
+
+    - verdien av hver variabel for f dager siden, for hver forsinkelse f. Mangler verdien,
+      brukes gjennomsnittet for det korteste vinduet i stedet, slik at én manglende dag ikke
+      fjerner dagen fra treningen eller gir manglende prognose
+    - gjennomsnittet av hver variabel de siste w dagene (t - w til t - 1), for hvert vindu w,
+      når minst halvparten av dagene har verdi
+    - sinus og cosinus av dagnummeret i året
+
+    Parametre:
+    - verdier (ndarray): Form (stasjon, dag, variabel), med én rad per dag uten hull.
+    - datoer (DatetimeIndex): Datoene til dagene.
+    - forsinkelser (tuple): Forsinkelsene i dager (minst 1).
+    - vinduer (tuple): Lengdene på de rullerende vinduene i dager.
+
+    Returnerer:
+    - ndarray: Form (stasjon, dag, egenskap), med NaN der en egenskap mangler. Navnene gis av
+      egenskapsnavn.
+    """
+    antall_stasjoner, antall_dager, antall_variabler = verdier.shape
+    deler = []
+    for forsinkelse in forsinkelser:
+        forskjøvet = np.full_like(verdier, np.nan)
+        forskjøvet[:, forsinkelse:] = verdier[:, :antall_dager - forsinkelse]
+        deler.append(forskjøvet)
+
+    # Kumulative summer, der indeks t er summen av dagene før t; hvert vindu koster da O(1)
+    har_verdi = ~np.isnan(verdier)
+    null = np.zeros((antall_stasjoner, 1, antall_variabler))
+    summer = np.concatenate([null, np.cumsum(np.where(har_verdi, verdier, 0.0), axis=1)], axis=1)
+    antall = np.concatenate([null, np.cumsum(har_verdi, axis=1)], axis=1)
+    dag = np.arange(antall_dager)
+    for vindu in vinduer:
+        start = np.maximum(dag - vindu, 0)
+        sum_ = summer[:, dag] - summer[:, start]
+        n = antall[:, dag] - antall[:, start]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deler.append(np.where(n >= max(1, vindu // 2), sum_ / n, np.nan))
+
+    if vinduer:
+        korteste = deler[len(forsinkelser) + int(np.argmin(vinduer))]
+        for forskjøvet in deler[:len(forsinkelser)]:
+            mangler = np.isnan(forskjøvet)
+            forskjøvet[mangler] = korteste[mangler]
+
+    vinkel = 2 * np.pi * np.asarray(datoer.dayofyear, dtype=np.float64) / 365.25
+    årstid = np.broadcast_to(np.stack([np.sin(vinkel), np.cos(vinkel)], axis=1),
+                             (antall_stasjoner, antall_dager, 2))
+    return np.concatenate(deler + [årstid], axis=2)
+
+
+def _designmatrise(X, y, rader=None):
+    """
+    Legger til en kolonne med 1 for skjæringspunktet og nuller ut radene som ikke skal brukes
+    (manglende egenskaper eller målverdi, eller utenfor rader).
+
+    Returnerer:
+    - tuple: (Z, y, gyldig) der Z har form (stasjon, dag, 1 + egenskaper).
+    """
+    gyldig = ~np.isnan(X).any(axis=2) & ~np.isnan(y)
+    if rader is not None:
+        gyldig &= rader
+    Z = np.concatenate([np.ones(X.shape[:2] + (1,)), X], axis=2)
+    Z = np.where(gyldig[:, :, None], Z, 0.0)
+    return Z, np.where(gyldig, y, 0.0), gyldig
+
+
+def _summer(X, y, rader=None):
+    """Summene i normallikningene (Z'Z, Z'y og antall rader) for hver stasjon."""
+    Z, y, gyldig = _designmatrise(X, y, rader)
+    ZtZ = Z.transpose(0, 2, 1) @ Z
+    Zty = (Z.transpose(0, 2, 1) @ y[:, :, None])[:, :, 0]
+    return ZtZ, Zty, gyldig.sum(axis=1)
+
+
+def _løs(ZtZ, Zty):
+    """Løser normallikningene for alle stasjonene (minste-norm-løsning når de er singulære)."""
+    return (np.linalg.pinv(ZtZ) @ Zty[:, :, None])[:, :, 0]
+
+
+def _prediker(X, koeffisienter):
+    return koeffisienter[:, None, 0] + np.einsum("bdk,bk->bd", X, koeffisienter[:, 1:])
+
+
+class Prognosemodell:
+    """
+    Lineær prognosemodell for neste dag, én per stasjon, som kan oppdateres med nye dager.
+
+    >>> modell = Prognosemodell("air_temperature P1D").tren(datasett)
+    >>> modell.oppdater(nye_rader)        # bare de nye dagene regnes med
+    >>> modell.prediker()                 # prognose for dagen etter siste dag
+
+    Modellen lagrer summene i normallikningene per stasjon og de siste dagene som trengs for å
+    lage egenskapene, så en oppdatering koster O(nye dager) uansett hvor lang historikken er.
+    """
+
+    def __init__(self, maalvariabel="air_temperature P1D", variabler=STANDARD_VARIABLER,
+                 forsinkelser=STANDARD_FORSINKELSER, vinduer=STANDARD_VINDUER):
+        """
+        Parametre:
+        - maalvariabel (str): Variabelen som skal forutsies (navnet fra Frost).
+        - variabler (tuple): Variablene egenskapene lages fra. Målvariabelen tas med hvis den mangler.
+        - forsinkelser (tuple): Forsinkelsene i dager (minst 1).
+        - vinduer (tuple): Lengdene på de rullerende gjennomsnittene i dager.
+        """
+        if min(forsinkelser) < 1:
+            raise ValueError("Forsinkelsene må være minst 1 dag.")
+        self.maalvariabel = maalvariabel
+        self.variabler = tuple(variabler) if maalvariabel in variabler else (maalvariabel,) + tuple(variabler)
+        self.forsinkelser = tuple(forsinkelser)
+        self.vinduer = tuple(vinduer)
+        self.egenskaper = egenskapsnavn(self.variabler, self.forsinkelser, self.vinduer)
+        self.byer = None
+        self.historikk = None
+        self.ZtZ = self.Zty = self.antall = None
+        self._koeffisienter = None
+
+    @property
+    def historikklengde(self):
+        """Antall dager bakover egenskapene trenger."""
+        return max(self.forsinkelser + self.vinduer)
+
+    def tren(self, data, byer=None):
+        """
+        Trener modellen fra bunnen av.
+
+        Parametre:
+        - data: VaerDatasett, filsti eller værdata i langt format (se daglig_tabell).
+        - byer (list): Stasjonene (byene) det skal lages modeller for. Standard er alle.
+
+        Returnerer:
+        - Prognosemodell: Seg selv.
+        """
+        self.byer = None
+        self.historikk = None
+        return self.oppdater(data, byer)
+
+    def oppdater(self, data, byer=None):
+        """
+        Legger til nye dager i modellen. Bare dager etter siste dag modellen har sett, regnes med;
+        de siste dagene fra før brukes til egenskapene (forsinkelser og vinduer) for de nye dagene.
+
+        Parametre:
+        - data: VaerDatasett, filsti eller værdata i langt format med de nye dagene.
+        - byer (list): Brukes bare første gang. Senere brukes stasjonene modellen ble trent for.
+
+        Returnerer:
+        - Prognosemodell: Seg selv.
+        """
+        matrise = daglig_tabell(data, self.byer if self.byer is not None else byer, self.variabler)
+        if self.byer is None:
+            self.byer = list(matrise.columns.get_level_values("by").unique())
+            størrelse = len(self.egenskaper) + 1
+            self.ZtZ = np.zeros((len(self.byer), størrelse, størrelse))
+            self.Zty = np.zeros((len(self.byer), størrelse))
+            self.antall = np.zeros(len(self.byer), dtype=np.int64)
+
+        if self.historikk is not None:
+            siste = self.historikk.index[-1]
+            matrise = matrise[matrise.index > siste]
+            if matrise.empty:
+                return self
+            matrise = pd.concat([self.historikk, matrise]).asfreq("D")
+            nye = np.asarray(matrise.index > siste)
+        elif matrise.empty:
+            return self
+        else:
+            nye = np.ones(len(matrise), dtype=bool)
+
+        verdier = _som_tabell(matrise, len(self.variabler))
+        mål = self.variabler.index(self.maalvariabel)
+        for start in range(0, len(self.byer), BITESTØRRELSE):
+            bit = slice(start, start + BITESTØRRELSE)
+            X = lag_egenskaper(verdier[bit], matrise.index, self.forsinkelser, self.vinduer)
+            ZtZ, Zty, antall = _summer(X, verdier[bit, :, mål], nye[None, :])
+            self.ZtZ[bit] += ZtZ
+            self.Zty[bit] += Zty
+            self.antall[bit] += antall
+
+        self.historikk = matrise.iloc[-self.historikklengde:]
+        self._koeffisienter = None
+        return self
+
+    def koeffisienter(self):
+        """
+        Returnerer koeffisientene som en tabell med én rad per stasjon og kolonnene antall,
+        skjæringspunkt og én kolonne per egenskap.
+        """
+        if self._koeffisienter is None:
+            self._koeffisienter = _løs(self.ZtZ, self.Zty)
+        tabell = pd.DataFrame(self._koeffisienter, index=pd.Index(self.byer, name="by"),
+                              columns=["skjæringspunkt"] + self.egenskaper)
+        tabell.insert(0, "antall", self.antall)
+        return tabell
+
+    def prediker(self):
+        """
+        Gir prognosen for dagen etter siste dag modellen har sett, for alle stasjonene.
+
+        Returnerer:
+        - DataFrame: Kolonnene by, dato og prognose (NaN der egenskapene mangler).
+        """
+        if self.historikk is None:
+            raise ValueError("Modellen må trenes før den kan gi prognoser.")
+        neste = self.historikk.index[-1] + pd.Timedelta(days=1)
+        matrise = self.historikk.reindex(self.historikk.index.append(pd.DatetimeIndex([neste])))
+        verdier = _som_tabell(matrise, len(self.variabler))
+        X = lag_egenskaper(verdier, matrise.index, self.forsinkelser, self.vinduer)[:, -1:]
+        self.koeffisienter()
+        prognose = _prediker(X, self._koeffisienter)[:, 0]
+        return pd.DataFrame({"by": self.byer, "dato": neste, "prognose": prognose})
+
+
+def prognose_neste_dag(data, by=None, maalvariabel="air_temperature P1D", variabler=STANDARD_VARIABLER,
+                       forsinkelser=STANDARD_FORSINKELSER, vinduer=STANDARD_VINDUER, register=None):
+    """
+    Gir prognosen for dagen etter siste dag i dataene. Modellen hentes fra modellregisteret og
+    trenes bare når dataene eller innstillingene er endret, og prognosene lagres, så gjentatte
+    spørsmål besvares uten å lese dataene eller kjøre modellen.
+
+    Parametre:
+    - data: Filsti, VaerDatasett eller værdata i langt format (se daglig_tabell).
+    - by (str eller list): Byen eller byene prognosen gjelder. Standard er alle.
+    - maalvariabel, variabler, forsinkelser, vinduer: Se Prognosemodell.
+    - register (Modellregister): Standard er registeret i '../data/modeller'.
+
+    Returnerer:
+    - DataFrame: Kolonnene by, dato og prognose.
+    """
+    register = register or standard_register()
+    konfig = {"maalvariabel": maalvariabel, "variabler": list(variabler), "forsinkelser": list(forsinkelser),
+              "vinduer": list(vinduer)}
+    modell, nøkkel = register.hent_eller_tren(
+        "prognose", konfig, data, lambda: Prognosemodell(maalvariabel, variabler, forsinkelser, vinduer).tren(data))
+    neste = modell.historikk.index[-1] + pd.Timedelta(days=1)
+    prognoser = register.hent_prediksjon(nøkkel, neste, neste, modell.prediker)
+    if by is not None:
+        prognoser = prognoser[prognoser["by"].isin([by] if isinstance(by, str) else list(by))]
+    return prognoser.reset_index(drop=True)
+
+
+def walk_forward(data, maalvariabel="air_temperature P1D", variabler=STANDARD_VARIABLER, byer=None,
+                 antall_fold=5, min_trening=365, forsinkelser=STANDARD_FORSINKELSER, vinduer=STANDARD_VINDUER):
+    """
+    Evaluerer prognosemodellen med walk-forward og voksende treningsvindu: dagene etter de første
+    min_trening dagene deles i antall_fold like lange perioder, og for hver periode trenes modellen
+    på alle dagene før perioden og testes på dagene i perioden. Summene i normallikningene regnes ut
+    én gang per periode og legges sammen, så hvert fold koster bare de nye dagene.
+
+    Parametre:
+    - data: VaerDatasett, filsti eller værdata i langt format (se daglig_tabell).
+    - maalvariabel (str): Variabelen som skal forutsies.
+    - variabler (tuple): Variablene egenskapene lages fra.
+    - byer (list): Stasjonene som skal være med. Standard er alle.
+    - antall_fold (int): Antall testperioder.
+    - min_trening (int): Antall dager i første treningsperiode.
+    - forsinkelser, vinduer (tuple): Se Prognosemodell.
+
+    Returnerer:
+    - DataFrame: Én rad per (by, fold) med fra_dato, til_dato, antall, mae, rmse og mae_persistens
+      (feilen hvis prognosen bare er gårsdagens verdi, til sammenligning).
+    """
+    modell = Prognosemodell(maalvariabel, variabler, forsinkelser, vinduer)
+    matrise = daglig_tabell(data, byer, modell.variabler)
+    antall_dager = len(matrise)
+    if antall_dager <= min_trening + antall_fold:
+        raise ValueError(f"For få dager ({antall_dager}) for {antall_fold} fold etter {min_trening} treningsdager.")
+    byer = list(matrise.columns.get_level_values("by").unique())
+    grenser = np.linspace(min_trening, antall_dager, antall_fold + 1).astype(np.int64)
+    verdier = _som_tabell(matrise, len(modell.variabler))
+    mål = modell.variabler.index(maalvariabel)
+
+    resultater = []
+    for start in range(0, len(byer), BITESTØRRELSE):
+        bit = slice(start, start + BITESTØRRELSE)
+        X = lag_egenskaper(verdier[bit], matrise.index, modell.forsinkelser, modell.vinduer)
+        y = verdier[bit, :, mål]
+        gårsdagen = np.full_like(y, np.nan)
+        gårsdagen[:, 1:] = y[:, :-1]
+
+        ZtZ, Zty, _ = _summer(X[:, :grenser[0]], y[:, :grenser[0]])
+        for fold in range(antall_fold):
+            # Bare dagene i perioden behandles; summene for dagene før ligger allerede i ZtZ og Zty
+            periode = slice(grenser[fold], grenser[fold + 1])
+            X_periode, y_periode = X[:, periode], y[:, periode]
+            koeffisienter = _løs(ZtZ, Zty)
+            _, _, gyldig = _designmatrise(X_periode, y_periode)
+            feil = np.where(gyldig, _prediker(X_periode, koeffisienter) - y_periode, 0.0)
+            med_gårsdagen = gyldig & ~np.isnan(gårsdagen[:, periode])
+            feil_persistens = np.where(med_gårsdagen, gårsdagen[:, periode] - y_periode, 0.0)
+            antall = gyldig.sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                resultater.append(pd.DataFrame({
+                    "by": byer[bit],
+                    "fold": fold,
+                    "fra_dato": matrise.index[grenser[fold]],
+                    "til_dato": matrise.index[grenser[fold + 1] - 1],
+                    "antall": antall,
+                    "mae": np.abs(feil).sum(axis=1) / antall,
+                    "rmse": np.sqrt((feil ** 2).sum(axis=1) / antall),
+                    "mae_persistens": np.abs(feil_persistens).sum(axis=1) / med_gårsdagen.sum(axis=1),
+                }))
+            # Perioden blir en del av treningsdataene for neste fold
+            nye_ZtZ, nye_Zty, _ = _summer(X_periode, y_periode)
+            ZtZ, Zty = ZtZ + nye_ZtZ, Zty + nye_Zty
+
+    resultat = pd.concat(resultater, ignore_index=True)
+    rekkefølge = np.lexsort((resultat["fold"], pd.Categorical(resultat["by"], categories=byer).codes))
+    return resultat.iloc[rekkefølge].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # Kjøres fra src/ med: python prognose.py [datafil]
+    filsti = sys.argv[1] if len(sys.argv) > 1 else '../data/BehandletVaerData.csv'
+    start = time.perf_counter()
+    evaluering = walk_forward(filsti)
+    print(evaluering.groupby("fold")[["mae", "rmse", "mae_persistens"]].mean())
+    modell = Prognosemodell().tren(filsti)
+    print(modell.prediker())
+    print(f"\nFerdig på {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+
+
+class ResponsCache:
+    """
+    Cache på disk for svar fra Frost API.
+
+    Hvert svar lagres som en gzip-komprimert JSON-fil, der filnavnet er en hash av endepunkt og
+    normaliserte parametere. Svar for tidsrom som ligger helt i fortiden lagres uten utløpstid,
+    mens svar for tidsrom som når frem til i dag utløper etter `ttl_sekunder`. Når cachen blir
+    større enn `maks_størrelse_mb`, slettes de filene som er brukt minst nylig (LRU).
+    """
+
+    def __init__(self, mappe='../data/cache', maks_størrelse_mb=500, ttl_sekunder=3600):
+        """
+        Parametere:
+        - mappe (str): Mappen svarene lagres i. Opprettes hvis den ikke finnes.
+        - maks_størrelse_mb (float): Øvre grense for samlet størrelse på cachen i megabyte.
+        - ttl_sekunder (float): Levetid for svar som omfatter dagens dato (eller ikke har 'referencetime').
+        """
+        self.mappe = mappe
+        self.maks_bytes = int(maks_størrelse_mb * 1024 * 1024)
+        self.ttl_sekunder = ttl_sekunder
+        self.treff = 0
+        self.bom = 0
+        self._lås = threading.Lock()
+        # Teller for bruksrekkefølge i denne prosessen, som skiller filer med samme endringstidspunkt
+        self._bruk = {}
+        self._teller = 0
+        os.makedirs(mappe, exist_ok=True)
+        self._størrelse = sum(f.stat().st_size for f in self._filer())
+
+    @staticmethod
+    def lag_nøkkel(endpoint, params):
+        """
+        Lager en nøkkel som er lik for like forespørsler, uavhengig av rekkefølgen på parameterne
+        og mellomrom rundt verdiene.
+
+        Parametere:
+        - endpoint (str): API-endepunkt (URL).
+        - params (dict): Parametere til API-kallet (kan være None).
+
+        Returnerer:
+        - str: SHA-256-hash som heksadesimal streng.
+        """
+        normalisert = {str(k).strip(): str(v).strip() for k, v in (params or {}).items()}
+        innhold = json.dumps({'endpoint': endpoint.strip(), 'params': normalisert}, sort_keys=True)
+        return hashlib.sha256(innhold.encode('utf-8')).hexdigest()
+
+    def _levetid(self, endpoint, params):
+        """
+        Returnerer levetiden i sekunder for et svar, eller None hvis svaret aldri utløper.
+        Tidsrom som slutter før i dag er historiske og endres ikke. For sidene etter den første
+        (nextLink) er params None, og tidsrommet står i spørringen i URL-en.
+        """
+        referencetime = (params or {}).get('referencetime', '')
+        if not referencetime:
+            referencetime = parse_qs(urlparse(endpoint).query).get('referencetime', [''])[0]
+        if '/' in referencetime:
+            try:
+                slutt = date.fromisoformat(referencetime.split('/')[1][:10])
+                if slutt < date.today():
+                    return None
+            except ValueError:
+                pass
+        return self.ttl_sekunder
+
+    def _filsti(self, nøkkel):
+        return os.path.join(self.mappe, f"{nøkkel}.json.gz")
+
+    def _filer(self):
+        return [f for f in os.scandir(self.mappe) if f.name.endswith('.json.gz')]
+
+    def hent(self, endpoint, params):
+        """
+        Henter et lagret svar.
+
+        Returnerer:
+        - dict: Det lagrede svaret, eller None ved bom (mangler eller er utløpt).
+        """
+        filsti = self._filsti(self.lag_nøkkel(endpoint, params))
+        try:
+            with gzip.open(filsti, 'rt', encoding='utf-8') as f:
+                lagret = json.load(f)
+            utløper, data = lagret['utløper'], lagret['data']
+        except FileNotFoundError:
+            with self._lås:
+                self.bom += 1
+            return None
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            # En ødelagt fil ville ellers blitt liggende og gitt bom hver gang
+            self._slett(filsti)
+            with self._lås:
+                self.bom += 1
+            return None
+
+        if utløper is not None and utløper < time.time():
+            self._slett(filsti)
+            with self._lås:
+                self.bom += 1
+            return None
+
+        # Oppdaterer endringstidspunktet, som brukes til å finne minst nylig brukte fil. Filen kan
+        # være slettet av _rydd i en annen tråd i mellomtiden, men svaret er allerede lest.
+        try:
+            os.utime(filsti)
+        except OSError:
+            pass
+        with self._lås:
+            self.treff += 1
+            self._merk_brukt(filsti)
+        return data
+
+    def lagre(self, endpoint, params, data):
+        """
+        Lagrer et svar i cachen, og sletter minst nylig brukte svar hvis cachen blir for stor.
+        """
+        filsti = self._filsti(self.lag_nøkkel(endpoint, params))
+        levetid = self._levetid(endpoint, params)
+        innhold = {'utløper': None if levetid is None else time.time() + levetid, 'data': data}
+
+        # Skriver til en midlertidig fil først, slik at en halvskrevet fil aldri kan leses
+        midlertidig = f"{filsti}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(midlertidig, 'wt', encoding='utf-8') as f:
+                json.dump(innhold, f)
+            gammel_størrelse = os.path.getsize(filsti) if os.path.exists(filsti) else 0
+            os.replace(midlertidig, filsti)
+        except OSError as e:
+            print(f"Klarte ikke å lagre svar i cachen. Feil: {e}")
+            return
+
+        with self._lås:
+            self._merk_brukt(filsti)
+            self._størrelse += os.path.getsize(filsti) - gammel_størrelse
+            for_stor = self._størrelse > self.maks_bytes
+        if for_stor:
+            self._rydd()
+
+    def _merk_brukt(self, filsti):
+        self._teller += 1
+        self._bruk[os.path.basename(filsti)] = self._teller
+
+    def _slett(self, filsti):
+        try:
+            størrelse = os.path.getsize(filsti)
+            os.remove(filsti)
+        except OSError:
+            return
+        with self._lås:
+            self._størrelse -= størrelse
+
+    def _rydd(self):
+        """Sletter minst nylig brukte svar til cachen er under maksgrensen."""
+        filer = sorted(self._filer(), key=lambda f: (f.stat().st_mtime_ns, self._bruk.get(f.name, 0)))
+        for fil in filer:
+            if self._størrelse <= self.maks_bytes:
+                break
+            self._slett(fil.path)
+
+    def tøm(self):
+        """Sletter alle lagrede svar og nullstiller tellerne."""
+        for fil in self._filer():
+            self._slett(fil.path)
+        self.treff = 0
+        self.bom = 0
+
+    def statistikk(self):
+        """
+        Returnerer:
+        - dict: Antall treff og bom, treffrate, antall lagrede svar og samlet størrelse i byte.
+        """
+        totalt = self.treff + self.bom
+        return {
+            'treff': self.treff,
+            'bom': self.bom,
+            'treffrate': self.treff / totalt if totalt else 0.0,
+            'antall_svar': len(self._filer()),
+            'størrelse_bytes': self._størrelse,
+        }
@@ -1,39 +1,161 @@
 
+import os
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
+from lagring import les_data
+from datasett import VaerDatasett, filversjon
+from tidsaggregater import beregn_aggregater, les_aggregater
+from nedsampling import STANDARD_MAKS_PUNKTER, nedsample_indekser, nedsample_per_gruppe, serier_per_gruppe, zoombar_figur
+from visning import benevning, ferdig_figur
 
-def last_inn_data(filbane):
+# Beregningene bruker bare pandas, numpy og scipy; matplotlib, seaborn og plotly importeres
+# inne i plottefunksjonene, slik at modulen importeres raskt når det bare skal regnes.
+
+def last_inn_data(filbane, **filtre):
+    """
+    Leser inn værdata fra en CSV-fil eller et Parquet-datasett og retuernerer en DataFrame.
+
+    Args:
+    filbane (str): Filsti til CSV-filen eller Parquet-mappen.
+    filtre: Valgfrie filtre som sendes til lagring.les_data, f.eks. kolonner=["by", "value"],
+        by="Oslo", variabel="air_temperature P1D", fra_dato="2022-01-01". For Parquet leses da
+        bare de kolonnene og radgruppene som trengs.
+    """
+    return les_data(filbane, **filtre)
+
+# Sesong for hver måned (desember regnes til vinteren)
+SESONGER = {12: "DJF", 1: "DJF", 2: "DJF", 3: "MAM", 4: "MAM", 5: "MAM",
+            6: "JJA", 7: "JJA", 8: "JJA", 9: "SON", 10: "SON", 11: "SON"}
+
+# De sist brukte resultatene fra beregn_all_statistikk (LRU), med plass til MAKS_STATISTIKK_CACHE
+MAKS_STATISTIKK_CACHE = 8
+_statistikk_cache = OrderedDict()
+
+
+def _datasett_versjon(df, versjon=None):
     """
-    Leser inn værdata fra en CSV-fil og retuernerer en DataFrame.
+    Returnerer nøkkelen datasettet mellomlagres under, uten å gå gjennom dataene. For en fil brukes
+    filversjonen (størrelse og endringstidspunkt), og for en DataFrame versjonen den som kaller
+    oppgir. Uten versjon returneres None, og en DataFrame mellomlagres ikke, siden det å hashe hele
+    tabellen ved hvert kall tar lengre tid enn å regne ut statistikken på nytt.
     """
-    return pd.read_csv(filbane)
+    if isinstance(df, str):
+        return ("fil", os.path.abspath(df), filversjon(df))
+    if versjon is not None:
+        return ("versjon", versjon)
+    return None
 
-def beregn_statistikk(df, variabelnavn, visningsnavn):
+
+def beregn_all_statistikk(df, periode=None, persentiler=(0.05, 0.25, 0.75, 0.95), versjon=None):
+    """
+    Beregner statistikk for alle kombinasjoner av by og variabel (og eventuelt periode) i én
+    gjennomgang av dataene. Verdiene sorteres én gang for alle gruppene samlet, og median og
+    persentiler leses rett ut av den sorterte tabellen i stedet for å sortere hver gruppe for seg.
+    For en filsti, eller en DataFrame med versjon, mellomlagres resultatet, så nye kall med samme
+    datasett og valg gjenbruker det.
+
+    Args:
+    df (DataFrame eller str): Værdata med kolonnene by, variable og value (og referenceTime hvis
+        periode er valgt), eller filstien til dem. Med filsti leses filen bare når den er endret.
+    periode (str): None, "måned" (1-12), "sesong" (DJF, MAM, JJA, SON) eller "år".
+    persentiler (tuple): Persentiler som skal beregnes, som tall mellom 0 og 1.
+    versjon: Valgfri nøkkel for en DataFrame, f.eks. filversjon() for filen den er lest fra. Den
+        som kaller, må bytte versjon når dataene endres. Uten versjon mellomlagres ikke resultatet.
+
+    Returns:
+    DataFrame: Én rad per gruppe med kolonnene by, variable, (periode,) antall, gjennomsnitt,
+    median, standardavvik, min, maks og én kolonne per persentil (f.eks. p05 og p95).
+    """
+    if periode not in (None, "måned", "sesong", "år"):
+        raise ValueError(f"Ukjent periode: {periode}")
+
+    kolonner = ["by", "variable", "value"] + (["referenceTime"] if periode else [])
+    datasett_nøkkel = _datasett_versjon(df, versjon)
+    nøkkel = (datasett_nøkkel, periode, tuple(persentiler))
+    if datasett_nøkkel is not None and nøkkel in _statistikk_cache:
+        _statistikk_cache.move_to_end(nøkkel)
+        return _statistikk_cache[nøkkel].copy()
+
+    data = les_data(df, kolonner=kolonner) if isinstance(df, str) else df[kolonner]
+    data = data[data["value"].notna()]
+    grupper = ["by", "variable"]
+    if periode:
+        tid = pd.to_datetime(data["referenceTime"], utc=True)
+        if periode == "måned":
+            verdi = tid.dt.month
+        elif periode == "sesong":
+            verdi = tid.dt.month.map(SESONGER)
+        else:
+            verdi = tid.dt.year
+        data = data.assign(**{periode: verdi.to_numpy()})
+        grupper.append(periode)
+
+    gruppert = data.groupby(grupper, observed=True, sort=True)["value"]
+    resultat = gruppert.agg(antall="count", gjennomsnitt="mean", standardavvik="std", min="min", maks="max")
+
+    # Samler verdiene gruppe for gruppe med en stabil sortering på gruppekoden (radix sort når
+    # kodene er små heltall), og sorterer så hver gruppe for seg på plass. Det er raskere enn én
+    # felles sortering på gruppe og verdi (np.lexsort) over alle verdiene.
+    koder = gruppert.ngroup().to_numpy()
+    if len(resultat) < np.iinfo(np.int16).max:
+        koder = koder.astype(np.int16)
+    sortert = data["value"].to_numpy(dtype=np.float64)[np.argsort(koder, kind="stable")]
+    antall = resultat["antall"].to_numpy()
+    start = np.concatenate(([0], np.cumsum(antall)[:-1]))
+    for fra, til in zip(start.tolist(), (start + antall).tolist()):
+        sortert[fra:til].sort()
+
+    def kvantil(q):
+        # Lineær interpolasjon mellom nærmeste verdier, som Series.quantile
+        posisjon = q * (antall - 1)
+        nedre = np.floor(posisjon).astype(np.int64)
+        øvre = np.ceil(posisjon).astype(np.int64)
+        andel = posisjon - nedre
+        return sortert[start + nedre] * (1 - andel) + sortert[start + øvre] * andel
+
+    if len(resultat):
+        resultat.insert(2, "median", kvantil(0.5))
+        for q in persentiler:
+            resultat[f"p{round(q * 100):02d}"] = kvantil(q)
+    else:
+        resultat.insert(2, "median", pd.Series(dtype=np.float64))
+        for q in persentiler:
+            resultat[f"p{round(q * 100):02d}"] = pd.Series(dtype=np.float64)
+
+    resultat = resultat.reset_index()
+    if datasett_nøkkel is None:
+        return resultat
+    _statistikk_cache[nøkkel] = resultat
+    while len(_statistikk_cache) > MAKS_STATISTIKK_CACHE:
+        _statistikk_cache.popitem(last=False)
+    return resultat.copy()
+
+
+def beregn_statistikk(df, variabelnavn, visningsnavn, statistikk=("gjennomsnitt", "median", "standardavvik"),
+                      versjon=None):
     """
     Beregn statistikk for en gitt variabel (gjennomsnitt, median, standardavvik)
-    per by.
+    per by. Statistikken hentes fra beregn_all_statistikk. Med versjon regnes den ut
+    for alle variablene én gang og gjenbrukes i kallene for de andre variablene;
+    ellers regnes den bare ut for radene med denne variabelen.
         
     Args:
     df (DataFrame): Pandas DataFrame med værdata.
     variabelnavn (str): Navnet på variabelen som skal analyseres (f.eks. "air_temperature P1D").
     visningsnavn (str): Navnet som skal vises i utskriften (f.eks. "lufttemperatur").
+    statistikk (tuple): Kolonnene fra beregn_all_statistikk som skal tas med, f.eks. "maks" eller "p95".
+    versjon: Valgfri versjon av df, se beregn_all_statistikk.
         
     Returns:
-    None
+    DataFrame: Statistikk per by.
     """
-    data = df[df["variable"] == variabelnavn]
-    
-    if "by" in data.columns:
-        gruppert = data.groupby("by")["value"].agg(
-            gjennomsnitt="mean",
-            median="median",
-            standardavvik="std"
-            )
+    if "by" in df.columns:
+        if versjon is None:
+            alle = beregn_all_statistikk(df[df["variable"] == variabelnavn])
+        else:
+            alle = beregn_all_statistikk(df, versjon=versjon)
+        gruppert = alle[alle["variable"] == variabelnavn].set_index("by")[list(statistikk)]
         print(f"\nStatistiske værdata for {visningsnavn} per by:")
         print(gruppert.round(2))
         return gruppert
@@ -41,7 +163,7 @@ def beregn_statistikk(df, variabelnavn, visningsnavn):
         print(f"Variabelen '{variabelnavn}' finnes ikke i datasettet.")
         return None
 
-def plott_statistikk(statistikk_df, statistikk_type_list, variabelnavn):
+def plott_statistikk(statistikk_df, statistikk_type_list, variabelnavn, vis=True):
     """
     Plotter valgt type statistikk (gjennomsnitt, median, standardavvik) for en variabel per by,
     og grupperer plottene horisontalt etter statistikk-type.
@@ -49,8 +171,15 @@ def plott_statistikk(statistikk_df, statistikk_type_list, variabelnavn):
     Args:
     statistikk_df (DataFrame): DataFrame med statistikk per by (returnert fra beregn_statistikk).
     statistikk_type_list (list): Liste med statistikk-typer som skal vises, f.eks. ["gjennomsnitt", "standardavvik"].
+        Kan være alle kolonnene fra beregn_all_statistikk som er tatt med i beregn_statistikk.
     variabelnavn (str): Navn på værvariabelen (for tittel).
+    vis (bool): Vis figuren. Sett til False for å bare lage den (f.eks. for å lagre til fil).
+
+    Returns:
+    Figure: Matplotlib-figuren.
     """
+    import matplotlib.pyplot as plt
+
     # Oppretter subplot med én rad og så mange kolonner som det er statistikk-typer
     fig, axes = plt.subplots(1, len(statistikk_type_list), figsize=(10 * len(statistikk_type_list), 6))
 
@@ -58,14 +187,7 @@ def plott_statistikk(statistikk_df, statistikk_type_list, variabelnavn):
     if len(statistikk_type_list) == 1:
         axes = [axes]
     # Tilpasser y-aksen avhengig av variabelen
-    if variabelnavn == "lufttemperatur":
-        y_benevning = "grader celcius"
-    elif variabelnavn == "nedbør":
-        y_benevning = "mm nedbør"
-    elif variabelnavn == "vindstyrke":
-        y_benevning = "m/s"
-    else:
-        y_benevning = "verdi"
+    y_benevning = benevning(variabelnavn)
 
     #Går igjenom listen med statistikk-typer og lager plot for hver
     for i, statistikk_type in enumerate(statistikk_type_list):
@@ -81,95 +203,243 @@ def plott_statistikk(statistikk_df, statistikk_type_list, variabelnavn):
         axes[i].tick_params(axis='x', rotation=90)
         axes[i].grid(axis='y', linestyle='--', alpha=0.7)
 
-    plt.tight_layout()
-    plt.show()
+    return ferdig_figur(fig, vis)
 
 
-# Funksjon for å undersøke korrelasjon mellom ulike parametere
-def undersok_korrelasjon(df, var1, var2, by=None):
+def korrelasjon_fra_summer(n, sum_x, sum_y, kvadratsum_x, kvadratsum_y, kryss):
     """
-    Undersøker sammenhengen mellom to værvariabler i datasettet for en spesifikk by.
-    Beregner Pearsons korrelasjonskoeffisient og viser scatter-plot med regresjonslinje.
+    Beregner Pearsons korrelasjon fra summene over de felles observasjonene til hvert par
+    (antall, sum, kvadratsum og sum av kryssproduktet). Alle argumentene er tabeller med
+    samme form, så mange par beregnes samtidig.
+
+    Returns:
+    ndarray: Korrelasjonen, eller NaN der et par har færre enn to felles observasjoner
+    eller en av seriene er konstant.
     """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kovarians = kryss - sum_x * sum_y / n
+        varians_x = kvadratsum_x - sum_x ** 2 / n
+        varians_y = kvadratsum_y - sum_y ** 2 / n
+        r = np.clip(kovarians / np.sqrt(varians_x * varians_y), -1.0, 1.0)
+    r[(n < 2) | (varians_x <= 0) | (varians_y <= 0)] = np.nan
+    return r
 
-    if by:
-        df = df[df["by"] == by]
 
-    # Henter ut verdiene for hver variabel
-    df1 = df[df["variable"] == var1][["referenceTime", "value"]].rename(columns={"value": var1})
-    df2 = df[df["variable"] == var2][["referenceTime", "value"]].rename(columns={"value": var2})
+def korrelasjonsmatrise(matrise, metode="pearson"):
+    """
+    Beregner korrelasjonen mellom alle kolonnene i en bred tabell, med p-verdier, i vektorisert
+    form. Manglende verdier håndteres parvis: hvert par bruker bare datoene der begge har verdi.
 
-    # Slår sammen på dato
-    felles = pd.merge(df1, df2, on="referenceTime")
+    Summene som trengs (antall, sum, kvadratsum og kryssprodukt for hvert par) hentes fra fire
+    matriseprodukter med en maske for manglende verdier, så alle par beregnes samtidig.
 
-    if felles.empty:
-        print("Ingen overlappende data for valgte variabler.")
-        return
+    Args:
+    matrise (DataFrame): Én rad per dato og én kolonne per serie, f.eks. fra VaerDatasett.matrise().
+    metode (str): "pearson" eller "spearman". For Spearman rangeres hver kolonne én gang over
+        alle sine verdier; når to kolonner mangler verdier på ulike datoer, blir korrelasjonen
+        derfor et anslag.
 
-    x = felles[var1]
-    y = felles[var2]
+    Returns:
+    dict: 'r' (korrelasjon), 'p' (p-verdi, tosidig) og 'n' (antall felles datoer), alle som
+    DataFrame med kolonnene i matrise som både rader og kolonner.
+    """
+    from scipy import stats
+
+    if metode not in ("pearson", "spearman"):
+        raise ValueError(f"Ukjent metode: {metode}")
+    if metode == "spearman":
+        matrise = matrise.rank()
+
+    verdier = matrise.to_numpy(dtype=np.float64)
+    maske = (~np.isnan(verdier)).astype(np.float64)
+    x = np.where(maske > 0, verdier, 0.0)
+
+    n = maske.T @ maske
+    summer = x.T @ maske            # summer[i, j]: sum av kolonne i der også j har verdi
+    kvadratsummer = (x * x).T @ maske
+    kryss = x.T @ x
+
+    r = korrelasjon_fra_summer(n, summer, summer.T, kvadratsummer, kvadratsummer.T, kryss)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # t-test med n - 2 frihetsgrader, som i scipy.stats.pearsonr
+        frihetsgrader = n - 2
+        t = r * np.sqrt(frihetsgrader / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), frihetsgrader)
+        p[np.abs(r) == 1] = 0.0
+        p[frihetsgrader < 1] = np.nan
+    p[np.isnan(r)] = np.nan
+
+    kolonner = matrise.columns
+    return {
+        "r": pd.DataFrame(r, index=kolonner, columns=kolonner),
+        "p": pd.DataFrame(p, index=kolonner, columns=kolonner),
+        "n": pd.DataFrame(n.astype(np.int64), index=kolonner, columns=kolonner),
+    }
 
-    # Beregner korrelasjon
-    r, p = pearsonr(x, y)
-    print(f"\nKorrelasjon mellom '{var1}' og '{var2}' i {by or 'alle byer'}:")
-    print(f"Korrelasjonskoeffisient (r): {r:.2f}")
-    print(f"P-verdi: {p:.4f}")
 
-    # Plotter scatter-plot med regresjonslinje
+def beregn_korrelasjonsmatrise(df, byer=None, variabler=None, metode="pearson"):
+    """
+    Beregner korrelasjonen mellom alle kombinasjoner av by og variabel. Dataene pivoteres én
+    gang til en tabell med én rad per dato og én kolonne per (by, variabel).
+
+    Args:
+    df (DataFrame): Værdata med kolonnene by, referenceTime, variable og value.
+    byer (list): Byene som skal være med. Standard er alle.
+    variabler (list): Variablene som skal være med. Standard er alle.
+    metode (str): "pearson" eller "spearman".
+
+    Returns:
+    dict: Se korrelasjonsmatrise.
+    """
+    matrise = VaerDatasett(df).matrise(byer, variabler)
+    return korrelasjonsmatrise(matrise, metode)
+
+
+def plott_korrelasjonsmatrise(korrelasjon, tittel="Korrelasjon mellom byer og variabler", maks_p=None, vis=True):
+    """
+    Plotter en korrelasjonsmatrise som varmekart.
+
+    Args:
+    korrelasjon (dict): Resultatet fra beregn_korrelasjonsmatrise.
+    tittel (str): Tittel på plottet.
+    maks_p (float): Hvis oppgitt skjules korrelasjoner med p-verdi over denne grensen.
+    vis (bool): Vis figuren. Sett til False for å bare lage den.
+
+    Returns:
+    Figure: Matplotlib-figuren.
+    """
+    r = korrelasjon["r"]
+    skjul = r.isna()
+    if maks_p is not None:
+        skjul |= korrelasjon["p"] > maks_p
+    etiketter = [" – ".join(map(str, k)) if isinstance(k, tuple) else str(k) for k in r.columns]
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    størrelse = max(6, 0.6 * len(etiketter))
+    fig = plt.figure(figsize=(størrelse + 2, størrelse))
+    sns.heatmap(r.to_numpy(), mask=skjul.to_numpy(), vmin=-1, vmax=1, cmap="coolwarm", annot=len(etiketter) <= 15,
+                fmt=".2f", xticklabels=etiketter, yticklabels=etiketter, square=True)
+    plt.title(tittel)
+    return ferdig_figur(fig, vis)
+
+
+def plott_korrelasjon(x, y, var1, var2, by=None, vis=True):
+    """
+    Viser scatter-plot med regresjonslinje for to serier, og returnerer figuren.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     sns.set(style="whitegrid")
-    plt.figure(figsize=(8, 5))
+    fig = plt.figure(figsize=(8, 5))
     sns.regplot(x=x, y=y, scatter_kws={'alpha':0.6}, line_kws={'color':'red'})
     plt.xlabel(var1)
     plt.ylabel(var2)
     plt.title(f"Sammenheng mellom {var1} og {var2} ({by})")
     plt.grid(True, linestyle="--", alpha=0.5)
-    plt.tight_layout()
-    plt.show()
+    return ferdig_figur(fig, vis)
 
-def plott_trend_over_tid(df, variabelnavn, visningsnavn="værdata"):
+
+# Funksjon for å undersøke korrelasjon mellom ulike parametere
+def undersok_korrelasjon(df, var1, var2, by=None, vis=True):
     """
-    Plotter en trendanalyse for en valgt værvariabel over tid per by, aggregert per måned.
+    Undersøker sammenhengen mellom to værvariabler i datasettet for en spesifikk by.
+    Beregner Pearsons korrelasjonskoeffisient og viser scatter-plot med regresjonslinje.
+    Uten by brukes gjennomsnittet av alle byer per dato.
+
+    Returns:
+    tuple: (r, p), eller None hvis variablene ikke har overlappende data.
+    """
+    felles = VaerDatasett(df).bred(by, [var1, var2]).dropna()
+
+    if felles.empty:
+        print("Ingen overlappende data for valgte variabler.")
+        return
+
+    korrelasjon = korrelasjonsmatrise(felles)
+    r = korrelasjon["r"].iloc[0, 1]
+    p = korrelasjon["p"].iloc[0, 1]
+    print(f"\nKorrelasjon mellom '{var1}' og '{var2}' i {by or 'alle byer'}:")
+    print(f"Korrelasjonskoeffisient (r): {r:.2f}")
+    print(f"P-verdi: {p:.4f}")
+
+    if vis:
+        plott_korrelasjon(felles[var1], felles[var2], var1, var2, by)
+    return r, p
+
+
+PERIODENAVN = {"uke": "Uke", "måned": "Måned", "sesong": "Sesong", "år": "År"}
+
+
+def hent_trend(df, variabelnavn, aggregater=None, oppløsning="måned"):
+    """
+    Henter gjennomsnitt per periode og by for en variabel, fra ferdige aggregater hvis de finnes.
+
+    Args:
+    df (DataFrame): Værdata. Brukes bare hvis aggregater ikke er oppgitt.
+    variabelnavn (str): Navnet på værvariabelen i kolonnen "variable".
+    aggregater (DataFrame eller str): Aggregater for oppløsningen (fra tidsaggregater), eller
+        mappen de er lagret i.
+    oppløsning (str): "uke", "måned", "sesong" eller "år".
+
+    Returns:
+    DataFrame: Kolonnene periode, by og value (gjennomsnittet i perioden).
+    """
+    if aggregater is None:
+        aggregater = beregn_aggregater(df[df["variable"] == variabelnavn], [oppløsning])[oppløsning]
+    elif isinstance(aggregater, str):
+        aggregater = les_aggregater(aggregater, oppløsning, variabel=variabelnavn)
+    trend = aggregater[aggregater["variable"] == variabelnavn]
+    return trend[["periode", "by", "gjennomsnitt"]].rename(columns={"gjennomsnitt": "value"}).reset_index(drop=True)
+
+
+def plott_trend_over_tid(df, variabelnavn, visningsnavn="værdata", aggregater=None, oppløsning="måned", vis=True):
+    """
+    Plotter en trendanalyse for en valgt værvariabel over tid per by, aggregert per måned
+    (eller en annen oppløsning).
     Bruker Seaborn for visuell forbedring.
 
     Args:
-    df (DataFrame): Værdata.
+    df (DataFrame): Værdata. Kan være None når aggregater er oppgitt.
     variabelnavn (str): Navnet på værvariabelen i kolonnen "variable".
     visningsnavn (str): Forståelig navn som vises i tittel istedet for kronglete variabelnavn.
+    aggregater (DataFrame eller str): Ferdige aggregater (fra tidsaggregater) eller mappen de er
+        lagret i. Da grupperes ikke dagverdiene på nytt.
+    oppløsning (str): "uke", "måned", "sesong" eller "år". Standard er måned.
+    vis (bool): Vis figuren. Sett til False for å bare lage den.
+
+    Returns:
+    Figure: Matplotlib-figuren.
     """
-    
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Forbered Seaborn-stil
     sns.set_theme(style="whitegrid")
 
-    # Filtrerer og forbereder data
-    data = df[df["variable"] == variabelnavn].copy()
-    data["referenceTime"] = pd.to_datetime(data["referenceTime"])
-    data["måned"] = data["referenceTime"].dt.to_period("M")
-    trend = data.groupby(["måned", "by"])["value"].mean().reset_index()
-    trend["måned"] = trend["måned"].dt.to_timestamp()
+    # Henter gjennomsnitt per periode og by
+    trend = hent_trend(df, variabelnavn, aggregater, oppløsning)
+    periodenavn = PERIODENAVN[oppløsning]
 
     # Setter y-akse basert på type variabel
-    if variabelnavn == "air_temperature P1D":
-        y_akse = "Temperatur (°C)" 
-    elif variabelnavn == "precipitation_amount P1D": 
-        y_akse = "Nedbør (mm)"
-    elif variabelnavn == "wind_speed P1D": 
-        y_akse = "Vindstyrke (m/s)"
-    else: 
-        y_akse = "Verdi"
+    y_akse = benevning(variabelnavn, "Verdi")
 
     # Lager selve plottet
-    plt.figure(figsize=(14, 6))
-    sns.lineplot(data=trend, x="måned", y="value", hue="by", marker="o")
-    plt.title(f"Trend for {visningsnavn.capitalize()} over tid (per måned)", fontsize=14)
-    plt.xlabel("Måned")
+    fig = plt.figure(figsize=(14, 6))
+    sns.lineplot(data=trend, x="periode", y="value", hue="by", marker="o")
+    plt.title(f"Trend for {visningsnavn.capitalize()} over tid (per {oppløsning})", fontsize=14)
+    plt.xlabel(periodenavn)
     plt.ylabel(y_akse)
     plt.xticks(rotation=45)
     plt.grid(True, linestyle='--', alpha=0.6)
     plt.legend(title="By")
-    plt.tight_layout()
-    plt.show()
+    return ferdig_figur(fig, vis)
 
-def interaktiv_trend_plot(df, variabelnavn, visningsnavn="Miljødata"):
+def interaktiv_trend_plot(df, variabelnavn, visningsnavn="Miljødata", aggregater=None, oppløsning=None,
+                          maks_punkter=STANDARD_MAKS_PUNKTER, metode="lttb", zoom=False, vis=True):
     """
     Lager en interaktiv tidsserie-visualisering av en valgt værvariabel med Plotly.
     
@@ -177,23 +447,37 @@ def interaktiv_trend_plot(df, variabelnavn, visningsnavn="Miljødata"):
     - df (DataFrame): Datasettet som inneholder værdata
     - variabelnavn (str): Navnet på variabelen i 'variable'-kolonnen, f.eks. "air_temperature P1D"
     - visningsnavn (str): Tittel som vises i grafen
+    - aggregater (DataFrame eller str): Ferdige aggregater eller mappen de er lagret i (se plott_trend_over_tid).
+    - oppløsning (str): Hvis oppgitt ("uke", "måned", "sesong" eller "år") vises gjennomsnitt per
+      periode i stedet for dagverdier.
+    - maks_punkter (int): Høyeste antall punkter per by som sendes til grafen. Lengre serier
+      nedsamples (se nedsampling.py), slik at grafen er rask uansett hvor lang historikken er.
+      None viser alle punktene.
+    - metode (str): Nedsamplingsmetode, "lttb" eller "min_maks".
+    - zoom (bool): Hvis True returneres en FigureWidget som henter frem flere detaljer når man
+      zoomer inn (se nedsampling.zoombar_figur), i stedet for å vise figuren.
+    - vis (bool): Vis figuren. Sett til False for å bare lage den.
     
     Returnerer:
-    - Interaktiv Plotly-graf
+    - Interaktiv Plotly-graf (go.Figure)
     """
-    # Filtrer data basert på valgt variabel
-    data = df[df["variable"] == variabelnavn].copy()
-    data["referenceTime"] = pd.to_datetime(data["referenceTime"])
+    if oppløsning or aggregater is not None:
+        data = hent_trend(df, variabelnavn, aggregater, oppløsning or "måned")
+        data = data.rename(columns={"periode": "referenceTime"})
+    else:
+        # Filtrer data basert på valgt variabel
+        data = df[df["variable"] == variabelnavn]
+        if not pd.api.types.is_datetime64_any_dtype(data["referenceTime"]):
+            data = data.assign(referenceTime=pd.to_datetime(data["referenceTime"]))
     
+    import plotly.express as px
+
     # Tilpasser hva y-aksen skal vise basert på variabelnavn
-    if variabelnavn == "air_temperature P1D":
-        y_akse = "Temperatur (°C)"
-    elif variabelnavn == "precipitation_amount P1D":
-        y_akse = "Nedbør (mm)"
-    elif variabelnavn == "wind_speed P1D":
-        y_akse = "Vindstyrke (m/s)"
-    else:
-        y_akse = "Verdi"
+    y_akse = benevning(variabelnavn, "Verdi")
+
+    # Nedsampler hver by før figuren bygges; alle punktene beholdes for zoom
+    fulle = serier_per_gruppe(data, "referenceTime", "value", "by") if zoom else None
+    data = nedsample_per_gruppe(data, "referenceTime", "value", "by", maks_punkter, metode)
 
     # Lager interaktiv figur
     fig = px.line(
@@ -211,42 +495,78 @@ def interaktiv_trend_plot(df, variabelnavn, visningsnavn="Miljødata"):
     
     fig.update_traces(mode="lines+markers", hovertemplate="Dato: %{x}<br>Verdi: %{y}")
     fig.update_layout(hovermode="x unified")
-    
-    fig.show()
 
-def interaktiv_by_og_variabel_plot(df):
+    if zoom:
+        return zoombar_figur(fig, [(x, y) for _, x, y in fulle], maks_punkter, metode)
+    if vis:
+        fig.show()
+    return fig
+
+def interaktiv_by_og_variabel_plot(df, maks_punkter=STANDARD_MAKS_PUNKTER, metode="min_maks", vis=True):
     """
     Lager en interaktiv Plotly-graf med to dropdown-menyer:
     - En for valg av by
     - En for valg av værvariabel (temperatur, nedbør, vind)
+
+    Hver serie nedsamples til høyst maks_punkter punkter (None viser alle), med metoden
+    "min_maks" (standard, helt vektorisert, som passer når det er mange spor) eller "lttb".
+    Dataene deles opp i (by, variabel) med én sortering, slik at hver rad bare behandles
+    én gang, og df endres ikke. Med vis=False vises ikke figuren; den returneres uansett.
     """
 
-    # Konverter dato
-    df["referenceTime"] = pd.to_datetime(df["referenceTime"])
+    import plotly.graph_objects as go
 
     # Variabler og visningsnavn
-    variabler = {
-        "air_temperature P1D": "Temperatur (°C)",
-        "precipitation_amount P1D": "Nedbør (mm)",
-        "wind_speed P1D": "Vindstyrke (m/s)"
-    }
-
-    byer = df["by"].unique()
+    variabler = {variabel: benevning(variabel) for variabel in
+                 ("air_temperature P1D", "precipitation_amount P1D", "wind_speed P1D")}
+
+    # Konverter dato (uten å endre df)
+    tid = df["referenceTime"]
+    if not pd.api.types.is_datetime64_any_dtype(tid):
+        tid = pd.to_datetime(tid)
+    tid = tid.to_numpy()
+    verdier = df["value"].to_numpy(dtype=np.float64)
+
+    # Byene i den rekkefølgen de først dukker opp, og én kode per (by, variabel)
+    by_koder, byer = pd.factorize(df["by"])
+    byer = list(byer)
+    variabel_koder = pd.Categorical(df["variable"], categories=list(variabler)).codes
+    gyldig = (by_koder >= 0) & (variabel_koder >= 0)
+    nøkkel = np.where(gyldig, by_koder * len(variabler) + variabel_koder, -1)
+
+    # Én sortering på (by, variabel, dato) deler opp alle radene samtidig
+    rekkefølge = np.lexsort((tid, nøkkel))
+    rekkefølge = rekkefølge[nøkkel[rekkefølge] >= 0]
+    grenser = np.searchsorted(nøkkel[rekkefølge], np.arange(len(byer) * len(variabler) + 1))
+
+    # Lag en trace for hver (by, variabel)-kombinasjon, med byen ytterst slik at
+    # indeksen er i * len(variabler) + j, som knappene under forventer
     traces = []
-    visibility_matrix = []
-
-    # Lag en trace for hver (by, variabel)-kombinasjon
-    for variabel in variabler:
-        for by in byer:
-            filtrert = df[(df["by"] == by) & (df["variable"] == variabel)]
-            trace = go.Scatter(
-                x=filtrert["referenceTime"],
-                y=filtrert["value"],
+    for i, by in enumerate(byer):
+        rader = [rekkefølge[grenser[i * len(variabler) + j]:grenser[i * len(variabler) + j + 1]]
+                 for j in range(len(variabler))]
+        # Felles x-akse for byen: alle datoene der en av variablene har verdi
+        datoer = np.unique(tid[np.concatenate(rader)])
+        serier = []
+        valgte = []
+        for rad in rader:
+            y = np.full(len(datoer), np.nan)
+            y[np.searchsorted(datoer, tid[rad])] = verdier[rad]
+            serier.append(y)
+            valgte.append(nedsample_indekser(datoer, y, maks_punkter, metode))
+        # Punktene som er valgt for en av variablene brukes for alle, så x kan deles
+        felles = np.unique(np.concatenate(valgte)) if valgte else np.empty(0, dtype=np.int64)
+        x = datoer[felles]
+        for j, (variabel, navn) in enumerate(variabler.items()):
+            traces.append(go.Scatter(
+                x=x,
+                y=serier[j][felles],
                 mode="lines+markers",
-                name=f"{by} – {variabler[variabel]}",
+                # NaN betyr bare at en annen variabel har verdi den dagen, så linjen skal ikke brytes
+                connectgaps=True,
+                name=f"{by} – {navn}",
                 visible=False
-            )
-            traces.append(trace)
+            ))
 
     # By default: første kombinasjon skal være synlig
     traces[0].visible = True
@@ -260,28 +580,28 @@ def interaktiv_by_og_variabel_plot(df):
     # Dropdown for byvalg
     by_knapper = []
     for i, by in enumerate(byer):
-        vis = [False] * total
+        synlige = [False] * total
         for j, variabel in enumerate(variabler):
             index = i * len(variabler) + j
-            vis[index] = (variabel == "air_temperature P1D")  # standardvariabel
+            synlige[index] = (variabel == "air_temperature P1D")  # standardvariabel
         by_knapper.append(dict(
             label=by,
             method="update",
-            args=[{"visible": vis},
+            args=[{"visible": synlige},
                   {"title": f"Temperatur over tid – {by}"}]
         ))
 
     # Dropdown for variabelvalg
     var_knapper = []
     for j, (variabel, navn) in enumerate(variabler.items()):
-        vis = [False] * total
+        synlige = [False] * total
         for i, by in enumerate(byer):
             index = i * len(variabler) + j
-            vis[index] = (by == byer[0])  # standardby
+            synlige[index] = (by == byer[0])  # standardby
         var_knapper.append(dict(
             label=navn,
             method="update",
-            args=[{"visible": vis},
+            args=[{"visible": synlige},
                   {"title": f"{navn} over tid – {byer[0]}"}]
         ))
 
@@ -299,4 +619,6 @@ def interaktiv_by_og_variabel_plot(df):
         height=600
     )
 
-    fig.show()
+    if vis:
+        fig.show()
+    return fig
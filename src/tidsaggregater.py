@@ -0,0 +1,179 @@
+import os
+import numpy as np
+import pandas as pd
+from lagring import les_i_biter
+
+# Forhåndsberegnede aggregater per uke, måned, sesong og år for hver (by, variabel). Aggregatene
+# lagres som sum, antall, min og maks, som kan slås sammen uten å se på dagverdiene igjen. Når nye
+# dager kommer inn, oppdateres bare periodene de nye dagene hører til, og trendplott kan lese de
+# ferdige aggregatene i stedet for å gruppere millioner av dagverdier på nytt.
+
+OPPLØSNINGER = ("uke", "måned", "sesong", "år")
+NØKLER = ["by", "variable", "periode"]
+
+
+def _periodestart(tid, oppløsning):
+    """
+    Returnerer første dag i perioden hver dato hører til. Uker starter på mandag, og sesongene
+    er DJF, MAM, JJA og SON, der desember regnes til vinteren i året etter.
+    """
+    dager = tid.to_numpy(dtype="datetime64[D]")
+    if oppløsning == "uke":
+        # 1970-01-01 var en torsdag; mandag har ukedag 0
+        ukedag = (dager.astype(np.int64) + 3) % 7
+        return (dager - ukedag).astype("datetime64[ns]")
+    måneder = dager.astype("datetime64[M]")
+    if oppløsning == "måned":
+        return måneder.astype("datetime64[ns]")
+    if oppløsning == "sesong":
+        månedsnummer = måneder.astype(np.int64) % 12 + 1
+        return (måneder - månedsnummer % 3).astype("datetime64[ns]")
+    if oppløsning == "år":
+        return dager.astype("datetime64[Y]").astype("datetime64[ns]")
+    raise ValueError(f"Ukjent oppløsning: {oppløsning}")
+
+
+def _med_gjennomsnitt(aggregat):
+    aggregat["gjennomsnitt"] = aggregat["sum"] / aggregat["antall"].where(aggregat["antall"] > 0)
+    return aggregat
+
+
+def beregn_aggregater(df, oppløsninger=OPPLØSNINGER):
+    """
+    Beregner aggregater per (by, variabel, periode) for de valgte oppløsningene.
+
+    Parametre:
+    - df (DataFrame): Værdata med kolonnene by, referenceTime, variable og value.
+    - oppløsninger (tuple): Noen av "uke", "måned", "sesong" og "år".
+
+    Returnerer:
+    - dict: Oppløsning -> DataFrame med kolonnene by, variable, periode (første dag i perioden),
+      antall, sum, min, maks og gjennomsnitt.
+    """
+    data = df[["by", "referenceTime", "variable", "value"]]
+    data = data[data["value"].notna()]
+    # Datoene tolkes én gang og brukes for alle oppløsningene
+    tid = pd.to_datetime(data["referenceTime"], utc=True).dt.tz_localize(None)
+
+    aggregater = {}
+    for oppløsning in oppløsninger:
+        gruppert = (data.assign(periode=_periodestart(tid, oppløsning))
+                        .groupby(NØKLER, observed=True, sort=True)["value"])
+        aggregat = gruppert.agg(antall="count", sum="sum", min="min", maks="max").reset_index()
+        aggregater[oppløsning] = _med_gjennomsnitt(aggregat)
+    return aggregater
+
+
+def slå_sammen_aggregater(gamle, nye):
+    """
+    Slår sammen aggregater for samme oppløsning, f.eks. lagrede aggregater og aggregater for nye dager.
+    Bare periodene som finnes i de nye aggregatene endres.
+
+    Parametre:
+    - gamle (DataFrame): Eksisterende aggregater (kan være None).
+    - nye (DataFrame): Aggregater for nye dager.
+
+    Returnerer:
+    - DataFrame: De sammenslåtte aggregatene.
+    """
+    if gamle is None or gamle.empty:
+        return nye.copy()
+    if nye is None or nye.empty:
+        return gamle.copy()
+    alle = pd.concat([gamle, nye], ignore_index=True)
+    alle = alle.astype({"by": str, "variable": str})
+    sammenslått = (alle.groupby(NØKLER, sort=True)
+                       .agg(antall=("antall", "sum"), sum=("sum", "sum"), min=("min", "min"), maks=("maks", "max"))
+                       .reset_index())
+    return _med_gjennomsnitt(sammenslått)
+
+
+def _filsti(mappe, oppløsning):
+    return os.path.join(mappe, f"{oppløsning}.parquet")
+
+
+def lagre_aggregater(aggregater, mappe='../data/Aggregater'):
+    """
+    Lagrer aggregatene som én Parquet-fil per oppløsning (f.eks. måned.parquet).
+
+    Parametre:
+    - aggregater (dict): Oppløsning -> DataFrame, som fra beregn_aggregater.
+    - mappe (str): Mappen filene lagres i. Standard er '../data/Aggregater'.
+    """
+    os.makedirs(mappe, exist_ok=True)
+    for oppløsning, aggregat in aggregater.items():
+        midlertidig = _filsti(mappe, oppløsning) + ".tmp"
+        aggregat.astype({"by": str, "variable": str}).to_parquet(midlertidig, index=False)
+        os.replace(midlertidig, _filsti(mappe, oppløsning))
+
+
+def les_aggregater(mappe='../data/Aggregater', oppløsning="måned", by=None, variabel=None):
+    """
+    Leser lagrede aggregater for én oppløsning.
+
+    Parametre:
+    - mappe (str): Mappen aggregatene ligger i.
+    - oppløsning (str): "uke", "måned", "sesong" eller "år".
+    - by (str eller list): Behold bare disse byene.
+    - variabel (str eller list): Behold bare disse variablene.
+
+    Returnerer:
+    - DataFrame: Aggregatene, eller None hvis de ikke finnes.
+    """
+    filsti = _filsti(mappe, oppløsning)
+    if not os.path.exists(filsti):
+        print(f"Fant ingen aggregater for {oppløsning} i {mappe}.")
+        return None
+    filtre = []
+    for kolonne, verdi in (("by", by), ("variable", variabel)):
+        if verdi is not None:
+            filtre.append((kolonne, "in", [verdi] if isinstance(verdi, str) else list(verdi)))
+    return pd.read_parquet(filsti, filters=filtre or None)
+
+
+def oppdater_aggregater(nye_rader, mappe='../data/Aggregater', oppløsninger=OPPLØSNINGER):
+    """
+    Oppdaterer lagrede aggregater med nye dager. Kostnaden avhenger av antall nye rader og antall
+    perioder, ikke av hvor mange dager som allerede er aggregert. Radene må være nye dager (som fra
+    hente_data.hent_inkrementelt); dager som allerede er med, ville blitt telt to ganger.
+
+    Parametre:
+    - nye_rader (DataFrame): Behandlede værdata med kolonnene by, referenceTime, variable og value.
+    - mappe (str): Mappen aggregatene ligger i. Mangler de, opprettes de fra de nye radene.
+    - oppløsninger (tuple): Oppløsningene som skal oppdateres.
+
+    Returnerer:
+    - dict: De oppdaterte aggregatene.
+    """
+    nye = beregn_aggregater(nye_rader, oppløsninger)
+    oppdaterte = {}
+    for oppløsning in oppløsninger:
+        gamle = pd.read_parquet(_filsti(mappe, oppløsning)) if os.path.exists(_filsti(mappe, oppløsning)) else None
+        oppdaterte[oppløsning] = slå_sammen_aggregater(gamle, nye[oppløsning])
+    lagre_aggregater(oppdaterte, mappe)
+    return oppdaterte
+
+
+def bygg_aggregater(filsti='../data/BehandletVaerData.csv', mappe='../data/Aggregater',
+                    oppløsninger=OPPLØSNINGER, bitestørrelse=1_000_000):
+    """
+    Bygger aggregatene på nytt fra behandlede data (CSV eller Parquet). Filen leses i biter,
+    så dataene trenger ikke å få plass i minnet.
+
+    Parametre:
+    - filsti (str): Filsti til de behandlede dataene.
+    - mappe (str): Mappen aggregatene lagres i. Eksisterende aggregater erstattes.
+    - oppløsninger (tuple): Oppløsningene som skal bygges.
+    - bitestørrelse (int): Antall rader som leses om gangen.
+
+    Returnerer:
+    - dict: Aggregatene.
+    """
+    aggregater = {oppløsning: None for oppløsning in oppløsninger}
+    for bit in les_i_biter(filsti, bitestørrelse, kolonner=["by", "referenceTime", "variable", "value"]):
+        for oppløsning, aggregat in beregn_aggregater(bit, oppløsninger).items():
+            aggregater[oppløsning] = slå_sammen_aggregater(aggregater[oppløsning], aggregat)
+    aggregater = {k: v for k, v in aggregater.items() if v is not None}
+    lagre_aggregater(aggregater, mappe)
+    print(f"\nAggregater lagret i: {mappe}")
+    return aggregater
@@ -0,0 +1,41 @@
+# Felles hjelpefunksjoner for figurene i statistikk_funksjoner.py og prediktiv_analyse.py.
+# Matplotlib, Seaborn og Plotly importeres først når en figur faktisk lages, slik at moduler som
+# bare trenger beregningene (f.eks. i arbeidsprosesser) importeres raskt.
+
+# Tekst på y-aksen for hver variabel, både med variabelnavnene fra Frost og de norske navnene.
+# Samme variabel har samme tekst uansett hvilket navn som brukes.
+BENEVNINGER = {
+    "air_temperature P1D": "Temperatur (°C)",
+    "precipitation_amount P1D": "Nedbør (mm)",
+    "wind_speed P1D": "Vindstyrke (m/s)",
+    "temperatur": "Temperatur (°C)",
+    "lufttemperatur": "Temperatur (°C)",
+    "nedbør": "Nedbør (mm)",
+    "vindstyrke": "Vindstyrke (m/s)",
+}
+
+
+def benevning(variabel, standard="verdi"):
+    """
+    Returnerer teksten på y-aksen for en variabel.
+
+    Parametre:
+    - variabel (str): Variabelnavnet fra Frost (f.eks. "air_temperature P1D") eller det norske navnet.
+    - standard (str): Teksten som brukes for ukjente variabler.
+    """
+    return BENEVNINGER.get(variabel, standard)
+
+
+def ferdig_figur(fig, vis=True):
+    """
+    Strammer inn marginene, viser figuren hvis vis er True, og returnerer den.
+
+    Parametre:
+    - fig: Matplotlib-figuren.
+    - vis (bool): Vis figuren. Sett til False for å bare lage den (f.eks. for å lagre til fil).
+    """
+    import matplotlib.pyplot as plt
+    plt.tight_layout()
+    if vis:
+        plt.show()
+    return fig
@@ -5,6 +5,7 @@ import os
 # Legger til src-mappen i Python's søkesti
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from data_behandling import DataBehandler
+from lagring import les_data
 
 def test_fyll_manglende_codequality():
     # Eksempeldata med én manglende verdi
@@ -110,3 +111,144 @@ def test_lagre_data(tmp_path):
     innlest = pd.read_csv(filsti)
     assert len(innlest) == 1
     assert innlest.iloc[0]['value'] == 3.5
+
+def test_lagre_data_parquet_og_les_med_filter(tmp_path):
+    data = {
+        'by': ['Oslo', 'Oslo', 'Bergen', 'Oslo'],
+        'sourceId': ['SN18700', 'SN18700', 'SN50540', 'SN18700'],
+        'referenceTime': ['2022-01-01', '2023-01-01', '2022-01-01', '2022-01-01'],
+        'statistikk': ['mean', 'mean', 'mean', 'sum'],
+        'variable': ['air_temperature P1D', 'air_temperature P1D', 'air_temperature P1D', 'precipitation_amount P1D'],
+        'value': [3.5, -2.1, 5.0, 1.2],
+        'unit': ['degC', 'degC', 'degC', 'mm'],
+        'codequality': ['God', 'God', 'Middels', 'God']
+    }
+
+    df = pd.DataFrame(data)
+    behandler = DataBehandler(df, {'Oslo': 'SN18700', 'Bergen': 'SN50540'})
+
+    mappe = tmp_path / "BehandletVaerData"
+    behandler.lagre_data_parquet(mappe=str(mappe))
+
+    # Partisjonert på variabel og år
+    assert (mappe / "variable=air_temperature%20P1D" / "år=2022").exists()
+
+    innlest = les_data(str(mappe), kolonner=['referenceTime', 'value'], by='Oslo',
+                       variabel='air_temperature P1D', fra_dato='2022-01-01', til_dato='2022-12-31')
+    assert list(innlest['value']) == [3.5]
+    assert pd.api.types.is_datetime64_any_dtype(innlest['referenceTime'])
+
+
+def test_les_data_til_dato_tar_med_hele_dagen_for_parquet_og_csv(tmp_path):
+    from lagring import lagre_parquet
+    df = pd.DataFrame({
+        'by': ['Oslo'] * 3,
+        'referenceTime': ['2022-01-01T00:00:00.000Z', '2022-01-02T06:00:00.000Z', '2022-01-03T00:00:00.000Z'],
+        'variable': ['air_temperature PT1H'] * 3,
+        'value': [1.0, 2.0, 3.0],
+    })
+    mappe, csv = str(tmp_path / "data"), str(tmp_path / "data.csv")
+    lagre_parquet(df, mappe, partisjoner=('variable', 'år'))
+    df.to_csv(csv, index=False)
+
+    for filsti in (mappe, csv):
+        assert list(les_data(filsti, til_dato='2022-01-02')['value']) == [1.0, 2.0]
+
+def test_klassifiser_codequality_vektorisert_med_kategorier():
+    data = {
+        'sourceId': ['SN18700'] * 7,
+        'codequality': [2, 3, 5.0, None, 2.5, -1, 'God']
+    }
+
+    behandler = DataBehandler(pd.DataFrame(data), {'Oslo': 'SN18700'})
+    behandler.klassifiser_codequality()
+
+    kolonne = behandler.df['codequality']
+    assert isinstance(kolonne.dtype, pd.CategoricalDtype)
+    assert list(kolonne.cat.categories) == ['God', 'Middels', 'Dårlig']
+    assert list(kolonne.astype(object).fillna('NaN')) == ['God', 'Middels', 'Middels', 'NaN', 'Dårlig', 'Dårlig', 'God']
+
+def test_omstrukturerer_data_gir_kategoriske_kolonner():
+    data = {
+        'sourceId': ['SN18700', 'SN50540'],
+        'referenceTime': ['2022-01-01T00:00:00.000Z', '2022-01-01T00:00:00.000Z'],
+        'elementId': ['mean(air_temperature P1D)', 'sum(precipitation_amount P1D)'],
+        'value': [3.5, 1.0],
+        'unit': ['degC', 'mm'],
+        'codequality': [0, 2]
+    }
+
+    behandler = DataBehandler(pd.DataFrame(data), {'Oslo': 'SN18700', 'Bergen': 'SN50540'})
+    df = behandler.omstrukturerer_data()
+
+    assert list(df['by']) == ['Oslo', 'Bergen']
+    assert list(df['variable']) == ['air_temperature P1D', 'precipitation_amount P1D']
+    for kolonne in ['by', 'sourceId', 'statistikk', 'variable', 'unit']:
+        assert isinstance(df[kolonne].dtype, pd.CategoricalDtype)
+
+
+def test_omstrukturerer_data_uten_tidspunkter_gir_nat():
+    data = {
+        'sourceId': ['SN18700', 'SN18700'],
+        'referenceTime': [None, None],
+        'elementId': ['mean(air_temperature P1D)', 'mean(air_temperature P1D)'],
+        'value': [3.5, 1.0],
+        'unit': ['degC', 'degC'],
+        'codequality': [0, 2]
+    }
+    df = DataBehandler(pd.DataFrame(data), {'Oslo': 'SN18700'}).omstrukturerer_data()
+    assert df['referenceTime'].isna().all()
+
+    # Manglende tidspunkt blant gyldige gir NaT bare for den raden
+    data['referenceTime'] = ['2022-01-01T00:00:00.000Z', None]
+    df = DataBehandler(pd.DataFrame(data), {'Oslo': 'SN18700'}).omstrukturerer_data()
+    assert df['referenceTime'].iloc[0] == pd.Timestamp('2022-01-01') and pd.isna(df['referenceTime'].iloc[1])
+
+def test_behandle_i_biter_gir_samme_resultat_som_i_minnet(tmp_path):
+    data = {
+        'sourceId': ['SN18700', 'SN50540', 'SN18700', 'SN50540', 'SN18700'],
+        'referenceTime': ['2022-01-01T00:00:00.000Z', '2022-01-01T00:00:00.000Z', '2022-01-02T00:00:00.000Z',
+                          '2022-01-02T00:00:00.000Z', '2023-01-01T00:00:00.000Z'],
+        'elementId': ['mean(air_temperature P1D)', 'sum(precipitation_amount P1D)', 'mean(air_temperature P1D)',
+                      'sum(precipitation_amount P1D)', 'mean(air_temperature P1D)'],
+        'value': [3.5, 1.0, -2.1, 0.0, 4.2],
+        'unit': ['degC', 'mm', 'degC', 'mm', 'degC'],
+        'codequality': [4, None, 4, 0, None]
+    }
+    byer = {'Oslo': 'SN18700', 'Bergen': 'SN50540'}
+    kilde = tmp_path / "VaerData.csv"
+    pd.DataFrame(data).to_csv(kilde, index=False)
+
+    # Samme behandling med hele datasettet i minnet
+    behandler = DataBehandler(pd.read_csv(kilde), byer)
+    behandler.omstrukturerer_data()
+    behandler.fyll_manglende_codequality()
+    forventet = behandler.klassifiser_codequality()
+
+    mål_csv = tmp_path / "BehandletVaerData.csv"
+    assert DataBehandler.behandle_i_biter(str(kilde), str(mål_csv), byer, bitestørrelse=2) == 5
+    # Modusen (4 -> Middels) gjelder hele datasettet, også biter uten verdien 4
+    assert list(pd.read_csv(mål_csv)['codequality']) == list(forventet['codequality'])
+
+    mål_parquet = tmp_path / "BehandletVaerData"
+    DataBehandler.behandle_i_biter(str(kilde), str(mål_parquet), byer, bitestørrelse=2)
+    innlest = les_data(str(mål_parquet)).sort_values(['referenceTime', 'sourceId']).reset_index(drop=True)
+    assert list(innlest['value']) == list(forventet['value'])
+    assert list(innlest['codequality']) == list(forventet['codequality'])
+
+    # Et datasett fra en tidligere kjøring overskrives, men ikke en mappe med annet innhold
+    assert DataBehandler.behandle_i_biter(str(kilde), str(mål_parquet), byer, bitestørrelse=2) == 5
+    annen = tmp_path / "annet"
+    annen.mkdir()
+    (annen / "viktig.txt").write_text("ikke slett")
+    assert DataBehandler.behandle_i_biter(str(kilde), str(annen), byer, bitestørrelse=2) is None
+    assert (annen / "viktig.txt").exists()
+
+
+def test_import_laster_ikke_lagring_aggregater_eller_analyse():
+    import subprocess
+    kode = ("import sys, data_behandling; print([m for m in ('lagring', 'tidsaggregater', 'hendelser', "
+            "'datasett', 'imputering', 'statistikk_funksjoner') if m in sys.modules])")
+    src = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+    utdata = subprocess.run([sys.executable, "-c", kode], cwd=src, capture_output=True, text=True, check=True)
+    assert utdata.stdout.strip() == "[]"
@@ -0,0 +1,57 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+from figurgenerering import generer_figurer
+
+
+def lag_data():
+    rng = np.random.default_rng(3)
+    datoer = pd.date_range("2022-01-01", periods=40, freq="D")
+    rader = []
+    for by in ["Oslo", "Bergen"]:
+        for variabel in ["air_temperature P1D", "precipitation_amount P1D"]:
+            for dato in datoer:
+                rader.append({"by": by, "variable": variabel, "referenceTime": dato.isoformat(),
+                              "value": rng.normal()})
+    return pd.DataFrame(rader)
+
+
+def test_generer_figurer_lager_filer_og_hopper_over_uendrede(tmp_path):
+    df = lag_data()
+    mappe = str(tmp_path)
+
+    første = generer_figurer(df, mappe, maks_arbeidere=0)
+    assert første["feilet"] == []
+    assert "korrelasjonsmatrise" in første["laget"]
+    assert os.path.exists(os.path.join(mappe, "trend_lufttemperatur.png"))
+    assert os.path.exists(os.path.join(mappe, "interaktiv_trend_nedbør.html"))
+    assert os.path.exists(os.path.join(mappe, "regresjon_Oslo_temperatur_linje.png"))
+
+    andre = generer_figurer(df, mappe, maks_arbeidere=0)
+    assert andre["laget"] == []
+    assert sorted(andre["hoppet_over"]) == sorted(første["laget"])
+
+    # Bare figurene som bruker Bergen-dataene lages på nytt
+    df.loc[(df["by"] == "Bergen") & (df["variable"] == "air_temperature P1D"), "value"] += 1
+    tredje = generer_figurer(df, mappe, maks_arbeidere=0)
+    assert "regresjon_Bergen_temperatur_scatter" in tredje["laget"]
+    assert "regresjon_Oslo_temperatur_scatter" in tredje["hoppet_over"]
+
+
+def test_generer_figurer_i_prosesspool_hopper_over_uendrede(tmp_path):
+    df = lag_data()
+    mappe = str(tmp_path)
+
+    første = generer_figurer(df, mappe, byer=["Oslo"], maks_arbeidere=2)
+    assert første["feilet"] == [] and første["laget"]
+    assert os.path.exists(os.path.join(mappe, "regresjon_Oslo_nedbør_søyle.png"))
+
+    # Manifestet fra prosesspoolen gjør at ingenting lages på nytt, heller ikke i poolen
+    andre = generer_figurer(df, mappe, byer=["Oslo"], maks_arbeidere=2)
+    assert andre["laget"] == []
+    assert sorted(andre["hoppet_over"]) == sorted(første["laget"])
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from hendelser import finn_hendelser, zverdier, oppsummer_hendelser
+from data_behandling import DataBehandler
+from datasett import VaerDatasett
+
+
+def lag_data(antall_år=10, seed=0):
+    """Syntetiske døgndata for to byer med en kuldeperiode, en hetebølge, et kraftig regnskyll og en feilmåling."""
+    rng = np.random.default_rng(seed)
+    datoer = pd.date_range("2000-01-01", periods=antall_år * 365, freq="D")
+    sesong = 10 * np.sin(2 * np.pi * (datoer.dayofyear.to_numpy() - 100) / 365.25)
+    deler = []
+    for by in ["Oslo", "Bergen"]:
+        temperatur = sesong + rng.normal(0, 1, len(datoer))
+        nedbør = np.where(rng.random(len(datoer)) < 0.4, rng.gamma(1.0, 4.0, len(datoer)), 0.0)
+        if by == "Oslo":
+            temperatur[1000:1005] -= 3.5
+            temperatur[2000:2004] = sesong[2000:2004] + [3.0, 3.5, 4.5, 3.0]
+            nedbør[1500] = 80.0
+            temperatur[3000] = 60.0
+        for variabel, verdier in (("air_temperature P1D", temperatur), ("precipitation_amount P1D", nedbør)):
+            deler.append(pd.DataFrame({"by": by, "referenceTime": datoer, "variable": variabel, "value": verdier}))
+    return pd.concat(deler, ignore_index=True), datoer
+
+
+def test_zverdier_har_snitt_null_og_standardavvik_en():
+    data, _ = lag_data()
+    z = zverdier(VaerDatasett(data).daglig(variabler=["air_temperature P1D"]))
+    assert abs(np.nanmean(z.to_numpy())) < 0.05
+    assert abs(np.nanstd(z.to_numpy()) - 1) < 0.1
+
+
+def test_finn_hendelser_finner_de_innlagte_hendelsene():
+    data, datoer = lag_data()
+    hendelser = finn_hendelser(data)
+    oslo = hendelser[hendelser["by"] == "Oslo"]
+
+    kulde = oslo[oslo["hendelse"] == "kuldeperiode"]
+    rad = kulde[kulde["fra_dato"] <= datoer[1000]].iloc[-1]
+    assert rad["til_dato"] >= datoer[1004] and rad["varighet"] >= 5
+
+    hete = oslo[(oslo["hendelse"] == "hetebølge") & (oslo["fra_dato"] <= datoer[2000]) & (oslo["til_dato"] >= datoer[2003])]
+    assert len(hete) == 1 and hete.iloc[0]["topp_dato"] == datoer[2002]
+
+    assert datoer[1500] in set(oslo.loc[oslo["hendelse"] == "kraftig_nedbør", "topp_dato"])
+
+    uteliggere = hendelser[hendelser["hendelse"] == "uteligger"]
+    assert list(uteliggere["topp_dato"]) == [datoer[3000]] and uteliggere.iloc[0]["topp"] == 60.0
+
+    assert (hendelser["varighet"] == (hendelser["til_dato"] - hendelser["fra_dato"]).dt.days + 1).all()
+    assert oppsummer_hendelser(hendelser).loc["Oslo", "uteligger"] == 1
+
+
+def test_databehandler_finn_hendelser(capsys):
+    data, _ = lag_data()
+    hendelser = DataBehandler(data, {}).finn_hendelser(["uteligger"])
+    assert list(hendelser["hendelse"]) == ["uteligger"]
+    assert "1 uteligger" in capsys.readouterr().out
@@ -0,0 +1,293 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from hente_data import hent_data_fra_frost, hent_data_parallelt, del_opp_tidsrom, hent_inkrementelt
+from respons_cache import ResponsCache
+from frost_parser import FrostStrømParser
+import json
+
+
+class FalskRespons:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FalskSession:
+    """Enkel erstatning for requests.Session som svarer med forhåndsdefinerte svar."""
+
+    def __init__(self, svar):
+        self.svar = svar
+        self.kall = []
+
+    def get(self, url, params=None, auth=None):
+        self.kall.append((url, params))
+        if params is None:
+            return self.svar[url]
+        return self.svar[(params['sources'], params['referencetime'])]
+
+
+def test_del_opp_tidsrom():
+    vinduer = del_opp_tidsrom('2022-01-01', '2022-03-01', vindu_dager=31)
+    assert vinduer == ['2022-01-01/2022-02-01', '2022-02-01/2022-03-01']
+
+
+def test_hent_data_fra_frost_stopper_ved_401():
+    session = FalskSession({('SN18700', '2022-01-01/2022-01-02'): FalskRespons(401)})
+    params = {'sources': 'SN18700', 'referencetime': '2022-01-01/2022-01-02'}
+
+    assert hent_data_fra_frost('https://frost.test/obs', params, 'id', session=session) is None
+    assert len(session.kall) == 1
+
+
+def test_hent_data_parallelt_folger_nextlink_og_bevarer_rekkefolge():
+    session = FalskSession({
+        ('SN18700', '2022-01-01/2022-01-03'): FalskRespons(200, {'data': [{'nr': 1}], 'nextLink': 'https://frost.test/side2'}),
+        'https://frost.test/side2': FalskRespons(200, {'data': [{'nr': 2}]}),
+        ('SN18700', '2022-01-03/2022-01-05'): FalskRespons(200, {'data': [{'nr': 3}]}),
+        ('SN50540', '2022-01-01/2022-01-03'): FalskRespons(200, {'data': [{'nr': 4}]}),
+        ('SN50540', '2022-01-03/2022-01-05'): FalskRespons(401),
+    })
+    params = {'sources': 'SN18700,SN50540', 'referencetime': '2022-01-01/2022-01-05'}
+
+    resultat = hent_data_parallelt('https://frost.test/obs', params, 'id', vindu_dager=2,
+                                   maks_arbeidere=3, maks_per_sekund=None, session=session)
+
+    assert [rad['nr'] for rad in resultat['data']] == [1, 2, 3, 4]
+    assert resultat['feilede_deler'] == [{'sources': 'SN50540', 'referencetime': '2022-01-03/2022-01-05'}]
+
+
+def lag_frost_svar(kilde, datoer):
+    return {'data': [{
+        'sourceId': f'{kilde}:0',
+        'referenceTime': f'{dato}T00:00:00.000Z',
+        'observations': [{'elementId': 'mean(air_temperature P1D)', 'value': 1.0, 'unit': 'degC', 'qualityCode': 0}]
+    } for dato in datoer]}
+
+
+def test_hent_inkrementelt_henter_bare_nye_dager(tmp_path):
+    rådata = tmp_path / "VaerData.csv"
+    vannmerker = tmp_path / "vannmerker.json"
+    pd.DataFrame({
+        'sourceId': ['SN18700', 'SN18700'],
+        'referenceTime': ['2022-01-01T00:00:00.000Z', '2022-01-02T00:00:00.000Z'],
+        'elementId': ['mean(air_temperature P1D)'] * 2,
+        'value': [1.0, 2.0],
+        'unit': ['degC'] * 2,
+        'codequality': [0, 0]
+    }).to_csv(rådata, index=False)
+
+    # SN18700 har data til og med 2. januar, SN50540 har ingen data fra før.
+    # Svaret for SN18700 inneholder også 2. januar, som ikke skal lagres på nytt.
+    session = FalskSession({
+        ('SN18700', '2022-01-03/2022-01-04'): FalskRespons(200, lag_frost_svar('SN18700', ['2022-01-02', '2022-01-03'])),
+        ('SN50540', '2022-01-01/2022-01-04'): FalskRespons(200, lag_frost_svar('SN50540', ['2022-01-01'])),
+    })
+    params = {'sources': 'SN18700,SN50540', 'elements': 'mean(air_temperature P1D)',
+              'referencetime': '2022-01-01/2022-01-04', 'timeresolutions': 'P1D'}
+
+    nye = hent_inkrementelt('https://frost.test/obs', params, 'id', rådata_filsti=str(rådata),
+                            vannmerke_filsti=str(vannmerker), session=session)
+
+    assert len(nye) == 2
+    assert len(pd.read_csv(rådata)) == 4
+
+    # Ny kjøring for SN18700 skal ikke hente noe, fordi vannmerket nå er 3. januar
+    session.kall.clear()
+    params['sources'] = 'SN18700'
+    nye = hent_inkrementelt('https://frost.test/obs', params, 'id', rådata_filsti=str(rådata),
+                            vannmerke_filsti=str(vannmerker), session=session)
+    assert nye.empty
+    assert session.kall == []
+
+
+class FalskFrost:
+    """Svarer med én observasjon per dag for hver stasjon og hvert element i forespørselen."""
+
+    def __init__(self):
+        self.kall = []
+
+    def get(self, url, params=None, auth=None):
+        self.kall.append(params)
+        fra, til = params['referencetime'].split('/')
+        data = [{
+            'sourceId': f'{kilde}:0',
+            'referenceTime': f'{dato:%Y-%m-%d}T00:00:00.000Z',
+            'observations': [{'elementId': element, 'value': 1.0, 'unit': 'x', 'qualityCode': 0}
+                             for element in params['elements'].split(',')]
+        } for kilde in params['sources'].split(',') for dato in pd.date_range(fra, til, inclusive='left')]
+        return FalskRespons(200, {'data': data})
+
+
+def test_hent_inkrementelt_henter_ikke_samme_rad_to_ganger(tmp_path):
+    rådata = tmp_path / "VaerData.csv"
+    vannmerker = tmp_path / "vannmerker.json"
+    # Ulike vannmerker på tvers av stasjoner og elementer
+    vannmerker.write_text(json.dumps({
+        'X|A': '2022-01-10T00:00:00.000Z', 'Y|B': '2022-01-10T00:00:00.000Z',
+        'X|B': '2022-01-05T00:00:00.000Z', 'Y|A': '2022-01-05T00:00:00.000Z',
+    }))
+    session = FalskFrost()
+    params = {'sources': 'X,Y', 'elements': 'A,B', 'referencetime': '2022-01-01/2022-01-15',
+              'timeresolutions': 'P1D'}
+
+    nye = hent_inkrementelt('https://frost.test/obs', params, 'id', rådata_filsti=str(rådata),
+                            vannmerke_filsti=str(vannmerker), session=session)
+
+    # X|A og Y|B mangler 11.–14. januar, X|B og Y|A mangler 6.–14. januar
+    assert len(nye) == 2 * 4 + 2 * 9
+    lagret = pd.read_csv(rådata)
+    assert not lagret.duplicated(['sourceId', 'elementId', 'referenceTime']).any()
+    assert len(lagret) == len(nye)
+    assert sorted((kall['sources'], kall['elements']) for kall in session.kall) == [
+        ('X', 'A'), ('X', 'B'), ('Y', 'A'), ('Y', 'B')]
+
+
+def test_legg_til_rådata_sjekker_kolonnene(tmp_path):
+    from hente_data import legg_til_rådata
+    rådata = tmp_path / "VaerData.csv"
+    pd.DataFrame({'sourceId': ['SN18700'], 'referenceTime': ['2022-01-01'], 'value': [1.0]}).to_csv(rådata, index=False)
+
+    # Samme kolonner i en annen rekkefølge ordnes som i filen
+    assert legg_til_rådata(pd.DataFrame({'value': [2.0], 'sourceId': ['SN18700'], 'referenceTime': ['2022-01-02']}),
+                           str(rådata))
+    assert list(pd.read_csv(rådata)['value']) == [1.0, 2.0]
+
+    # Andre kolonner enn i filen legges ikke til
+    assert not legg_til_rådata(pd.DataFrame({'sourceId': ['SN18700'], 'value': [3.0]}), str(rådata))
+    assert len(pd.read_csv(rådata)) == 2
+
+
+def test_hent_data_fra_frost_bruker_cache(tmp_path):
+    params = {'sources': 'SN18700', 'referencetime': '2022-01-01/2022-01-02'}
+    session = FalskSession({('SN18700', '2022-01-01/2022-01-02'): FalskRespons(200, {'data': [{'nr': 1}]})})
+    cache = ResponsCache(mappe=str(tmp_path))
+
+    første = hent_data_fra_frost('https://frost.test/obs', params, 'id', session=session, cache=cache)
+    # Samme parametere i annen rekkefølge skal gi treff i cachen
+    andre = hent_data_fra_frost('https://frost.test/obs', dict(reversed(list(params.items()))), 'id',
+                                session=session, cache=cache)
+
+    assert første == andre == {'data': [{'nr': 1}]}
+    assert len(session.kall) == 1
+    assert cache.statistikk()['treff'] == 1
+    assert cache.statistikk()['bom'] == 1
+
+
+def test_respons_cache_sletter_minst_nylig_brukte_og_utlopte(tmp_path):
+    cache = ResponsCache(mappe=str(tmp_path), maks_størrelse_mb=0.0004, ttl_sekunder=-1)
+    historisk = {'referencetime': '2020-01-01/2020-02-01'}
+
+    cache.lagre('https://frost.test/obs', dict(historisk, sources='SN1'), {'data': 'x' * 10})
+    cache.lagre('https://frost.test/obs', dict(historisk, sources='SN2'), {'data': 'y' * 10})
+    assert cache.hent('https://frost.test/obs', dict(historisk, sources='SN1')) is not None
+    cache.lagre('https://frost.test/obs', dict(historisk, sources='SN3'), {'data': 'z' * 10})
+
+    # Cachen har bare plass til to svar, og SN2 er brukt minst nylig
+    assert cache.statistikk()['antall_svar'] == 2
+    assert cache.hent('https://frost.test/obs', dict(historisk, sources='SN2')) is None
+
+    # Tidsrom som når frem til i dag bruker ttl_sekunder, som her allerede er utløpt
+    cache.lagre('https://frost.test/obs', {'sources': 'SN4', 'referencetime': '2020-01-01/2999-01-01'}, {'data': []})
+    assert cache.hent('https://frost.test/obs', {'sources': 'SN4', 'referencetime': '2020-01-01/2999-01-01'}) is None
+
+
+def test_respons_cache_sletter_ødelagte_filer_og_tåler_at_filen_forsvinner(tmp_path, monkeypatch):
+    import respons_cache
+    cache = ResponsCache(mappe=str(tmp_path))
+    params = {'sources': 'SN1', 'referencetime': '2020-01-01/2020-02-01'}
+    filsti = cache._filsti(cache.lag_nøkkel('https://frost.test/obs', params))
+
+    # En fil som ikke kan leses, regnes som bom og slettes
+    with open(filsti, 'wb') as f:
+        f.write(b'ikke gzip')
+    assert cache.hent('https://frost.test/obs', params) is None
+    assert not os.path.exists(filsti)
+
+    # Slettes filen av en annen tråd etter at den er lest, gis svaret likevel
+    cache.lagre('https://frost.test/obs', params, {'data': [1]})
+
+    def slettet(filsti, *args, **kwargs):
+        raise FileNotFoundError(filsti)
+
+    monkeypatch.setattr(respons_cache.os, 'utime', slettet)
+    assert cache.hent('https://frost.test/obs', params) == {'data': [1]}
+
+
+def test_cache_beholder_historiske_sider_fra_nextlink(tmp_path):
+    from hente_data import hent_alle_sider
+    neste = 'https://frost.test/obs?sources=SN18700&referencetime=2020-01-01%2F2020-02-01&offset=1'
+    session = FalskSession({
+        ('SN18700', '2020-01-01/2020-02-01'): FalskRespons(200, {'data': [{'nr': 1}], 'nextLink': neste}),
+        neste: FalskRespons(200, {'data': [{'nr': 2}]}),
+    })
+    # Med utløpt TTL er det bare historiske svar som kan hentes fra cachen
+    cache = ResponsCache(mappe=str(tmp_path), ttl_sekunder=-1)
+    params = {'sources': 'SN18700', 'referencetime': '2020-01-01/2020-02-01'}
+
+    hent_alle_sider('https://frost.test/obs', params, 'id', session=session, cache=cache)
+    session.kall.clear()
+    svar = hent_alle_sider('https://frost.test/obs', params, 'id', session=session, cache=cache)
+
+    assert [rad['nr'] for rad in svar['data']] == [1, 2]
+    assert session.kall == []
+
+
+class FalskStrøm:
+    """Svar som leses i biter, som requests.get(..., stream=True)."""
+
+    def __init__(self, innhold):
+        self.status_code = 200
+        self.innhold = innhold
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.innhold), chunk_size):
+            yield self.innhold[i:i + chunk_size]
+
+
+def test_hent_data_strømmende_prøver_på_nytt_ved_avbrutt_svar():
+    from hente_data import hent_data_strømmende
+    tekst = json.dumps(lag_frost_svar('SN18700', ['2022-01-01', '2022-01-02'])).encode('utf-8')
+    svar = [FalskStrøm(tekst[:len(tekst) // 2]), FalskStrøm(tekst)]
+
+    class Session:
+        def get(self, url, params=None, auth=None, stream=False):
+            return svar.pop(0)
+
+    df = hent_data_strømmende('https://frost.test/obs', {}, 'id', session=Session(), bitstørrelse=16, ventetid=0)
+
+    assert svar == []
+    assert list(df['referenceTime']) == ['2022-01-01T00:00:00.000Z', '2022-01-02T00:00:00.000Z']
+
+
+def test_frost_strom_parser_tolker_svar_delt_i_sma_biter():
+    svar = {
+        '@context': 'https://frost.met.no/schema',
+        'data': lag_frost_svar('SN18700', ['2022-01-01', '2022-01-02'])['data'],
+        'nextLink': 'https://frost.test/side2?enhet=°C'
+    }
+    tekst = json.dumps(svar, ensure_ascii=False).encode('utf-8')
+
+    parser = FrostStrømParser()
+    # Små biter sørger for at både elementer og tegn som 'ø' og '°' deles mellom bitene
+    for i in range(0, len(tekst), 7):
+        parser.mat(tekst[i:i + 7])
+    metadata = parser.avslutt()
+    df = parser.til_dataframe()
+
+    assert metadata == {'@context': 'https://frost.met.no/schema', 'nextLink': 'https://frost.test/side2?enhet=°C'}
+    assert list(df['sourceId']) == ['SN18700', 'SN18700']
+    assert list(df['value']) == [1.0, 1.0]
+    assert str(df['elementId'].dtype) == 'category'
+    assert parser.til_arrow().num_rows == 2
@@ -0,0 +1,37 @@
+import sys
+import os
+# Legger til src-mappen og benchmarks-mappen (lokal Frost-stub) i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+from hente_data_async import hent_mange_fra_frost, tolk_retry_after
+from frost_stub import FrostStub
+
+
+def test_tolk_retry_after():
+    assert tolk_retry_after('3') == 3.0
+    assert tolk_retry_after(None) is None
+    assert tolk_retry_after('ikke en dato') is None
+
+
+def test_hent_mange_prover_igjen_ved_429_og_bevarer_rekkefolge():
+    liste_med_params = [{'sources': f'SN{i}', 'referencetime': '2022-01-01/2022-02-01'} for i in range(10)]
+
+    with FrostStub(hver_n_te_429=3, antall_dager=2) as stub:
+        svar = hent_mange_fra_frost(stub.endpoint, liste_med_params, 'id',
+                                    maks_samtidige=4, basis_ventetid=0.01)
+        antall_kall = stub.antall_kall
+
+    assert len(svar) == 10
+    assert all(s is not None and len(s['data']) == 2 for s in svar)
+    # Svarene kommer i samme rekkefølge som forespørslene, selv om noen måtte sendes på nytt
+    assert [s['data'][0]['sourceId'] for s in svar] == [f'SN{i}:0' for i in range(10)]
+    # Hver tredje forespørsel fikk 429 og måtte sendes på nytt
+    assert antall_kall > 10
+
+
+def test_hent_mange_gir_none_ved_404():
+    with FrostStub() as stub:
+        endpoint = stub.endpoint.replace('/observations/v0.jsonld', '/finnes/ikke')
+        svar = hent_mange_fra_frost(endpoint, [{'sources': 'SN1'}], 'id', maks_forsøk=1)
+
+    assert svar == [None]
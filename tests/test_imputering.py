@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from imputering import løpelengder, løpemaske, finn_hull, imputer, klimatologi
+from datasett import VaerDatasett
+from prediktiv_analyse import hent_og_strukturer_data
+
+
+def lag_matrise(antall_dager=3 * 365, seed=0):
+    rng = np.random.default_rng(seed)
+    datoer = pd.date_range("2000-01-01", periods=antall_dager, freq="D", name="dato")
+    sesong = 10 * np.sin(2 * np.pi * datoer.dayofyear.to_numpy() / 365.25)
+    felles = rng.normal(0, 2, antall_dager)
+    kolonner = pd.MultiIndex.from_product([["Oslo", "Bergen", "Tromsø"], ["air_temperature P1D"]],
+                                          names=["by", "variable"])
+    verdier = np.column_stack([sesong + felles + forskyvning + rng.normal(0, 0.3, antall_dager)
+                               for forskyvning in (0.0, 2.0, -5.0)])
+    return pd.DataFrame(verdier, index=datoer, columns=kolonner)
+
+
+def test_løpelengder_finner_løp_per_kolonne_og_kan_gjenskapes():
+    maske = np.array([[1, 0], [1, 1], [0, 1], [1, 1]], dtype=bool)
+    kolonne, start, lengde = løpelengder(maske)
+    assert list(zip(kolonne, start, lengde)) == [(0, 0, 2), (0, 3, 1), (1, 1, 3)]
+    assert (løpemaske(kolonne, start, lengde, maske.shape) == maske).all()
+
+
+def test_finn_hull_gir_en_rad_per_hull():
+    matrise = lag_matrise(30)
+    matrise.iloc[5:8, 0] = np.nan
+    matrise.iloc[20, 2] = np.nan
+    hull = finn_hull(matrise)
+    assert list(hull["by"]) == ["Oslo", "Tromsø"]
+    assert list(hull["lengde"]) == [3, 1]
+    assert hull.loc[0, "fra_dato"] == pd.Timestamp("2000-01-06")
+    assert hull.loc[0, "til_dato"] == pd.Timestamp("2000-01-08")
+
+
+def test_lineær_interpolasjon_fyller_bare_innenfor_serien():
+    matrise = pd.DataFrame({"a": [np.nan, 1.0, np.nan, np.nan, 4.0, np.nan]},
+                           index=pd.date_range("2000-01-01", periods=6, freq="D"))
+    fylt = imputer(matrise, "lineær")
+    assert np.allclose(fylt["a"].to_numpy()[1:5], [1.0, 2.0, 3.0, 4.0])
+    assert np.isnan(fylt["a"].iloc[0]) and np.isnan(fylt["a"].iloc[-1])
+    # Med maks_lengde fylles ikke lengre hull
+    assert imputer(matrise, "lineær", maks_lengde=1)["a"].isna().sum() == 4
+
+
+def test_klimatologi_og_nabostasjon():
+    matrise = lag_matrise()
+    fasit = matrise.copy()
+    matrise.iloc[100:130, 0] = np.nan
+
+    normal = klimatologi(matrise)
+    assert normal.shape == (366, 3)
+
+    nabo = imputer(matrise, "nabostasjon")
+    klima = imputer(matrise, "klimatologi")
+    feil_nabo = (nabo - fasit).iloc[100:130, 0].abs().mean()
+    feil_klima = (klima - fasit).iloc[100:130, 0].abs().mean()
+    # Nabostasjonen følger været den dagen, klimatologien bare årstiden
+    assert feil_nabo < 0.6 < feil_klima
+    assert not nabo.isna().any().any()
+
+
+def test_hent_og_strukturer_data_med_imputering():
+    rader = []
+    for dag, temperatur, nedbør in [("2022-01-01", 1.0, 2.0), ("2022-01-02", None, 3.0), ("2022-01-03", 3.0, 4.0)]:
+        rader.append({"by": "Oslo", "referenceTime": dag, "variable": "precipitation_amount P1D", "value": nedbør})
+        if temperatur is not None:
+            rader.append({"by": "Oslo", "referenceTime": dag, "variable": "air_temperature P1D", "value": temperatur})
+    datasett = VaerDatasett(pd.DataFrame(rader))
+
+    assert len(hent_og_strukturer_data(datasett, by="Oslo")) == 2
+    fylt = hent_og_strukturer_data(datasett, by="Oslo", imputer="lineær")
+    assert list(fylt.columns) == ["dato", "temperatur", "nedbør"]
+    assert list(fylt["temperatur"]) == [1.0, 2.0, 3.0]
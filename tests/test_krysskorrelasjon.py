@@ -0,0 +1,47 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from krysskorrelasjon import krysskorrelasjon, beste_forsinkelse, rullerende_korrelasjon
+
+
+def lag_matrise():
+    # Oslo følger Bergen med to dagers forsinkelse
+    rng = np.random.default_rng(0)
+    bergen = rng.normal(size=402)
+    matrise = pd.DataFrame({
+        "Bergen": bergen[2:],
+        "Oslo": bergen[:-2] + 0.3 * rng.normal(size=400),
+        "Tromsø": rng.normal(size=400),
+    }, index=pd.date_range("2020-01-01", periods=400, freq="D"))
+    matrise.iloc[::9, 0] = np.nan
+    matrise.iloc[::13, 1] = np.nan
+    return matrise
+
+
+def test_krysskorrelasjon_direkte_og_fft_stemmer_med_pandas():
+    matrise = lag_matrise()
+    direkte = krysskorrelasjon(matrise, maks_forsinkelse=4, metode="direkte")
+    med_fft = krysskorrelasjon(matrise, maks_forsinkelse=4, metode="fft")
+
+    assert np.allclose(direkte["r"], med_fft["r"], equal_nan=True)
+    assert (direkte["n"] == med_fft["n"]).all()
+    for forsinkelse in (-2, 0, 2):
+        rad = direkte[(direkte["fra"] == "Bergen") & (direkte["til"] == "Oslo") & (direkte["forsinkelse"] == forsinkelse)]
+        forventet = matrise["Bergen"].corr(matrise["Oslo"].shift(-forsinkelse))
+        assert np.isclose(rad["r"].item(), forventet)
+
+    beste = beste_forsinkelse(direkte).set_index(["fra", "til"])
+    assert beste.loc[("Bergen", "Oslo"), "forsinkelse"] == 2
+    assert beste.loc[("Oslo", "Bergen"), "forsinkelse"] == -2
+
+
+def test_rullerende_korrelasjon_stemmer_med_pandas_rolling():
+    matrise = lag_matrise()
+    rullerende = rullerende_korrelasjon(matrise, vindu=30, forsinkelse=2)
+
+    forventet = matrise["Bergen"].rolling(30, min_periods=15).corr(matrise["Oslo"].shift(-2))
+    assert np.allclose(rullerende[("Bergen", "Oslo")], forventet, equal_nan=True)
+    assert list(rullerende.columns) == [("Bergen", "Oslo"), ("Bergen", "Tromsø"), ("Oslo", "Tromsø")]
@@ -0,0 +1,35 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from lopende_statistikk import LøpendeStatistikk
+
+
+def lag_data(antall, frø):
+    rng = np.random.default_rng(frø)
+    return pd.DataFrame({
+        "sourceId": rng.choice(["SN18700", "SN50540"], antall),
+        "variable": rng.choice(["air_temperature P1D", "wind_speed P1D"], antall),
+        "value": rng.normal(5, 3, antall).round(1),
+    })
+
+
+def test_oppdatering_og_sammenslaing_gir_samme_som_hele_datasettet(tmp_path):
+    del1, del2, del3 = lag_data(500, 1), lag_data(300, 2), lag_data(200, 3)
+    alle = pd.concat([del1, del2, del3], ignore_index=True)
+
+    # Én partisjon oppdateres løpende, den andre beregnes for seg og slås sammen til slutt
+    løpende = LøpendeStatistikk(oppløsning=0.1).oppdater(del1).oppdater(del2)
+    løpende.lagre(str(tmp_path / "statistikk"))
+    samlet = LøpendeStatistikk.les(str(tmp_path / "statistikk")).slå_sammen(LøpendeStatistikk(0.1).oppdater(del3))
+    resultat = samlet.resultat().set_index(["sourceId", "variable"])
+
+    forventet = alle.groupby(["sourceId", "variable"])["value"].agg(["count", "mean", "std", "min", "max", "median"])
+    assert (resultat["antall"] == forventet["count"]).all()
+    assert np.allclose(resultat["gjennomsnitt"], forventet["mean"])
+    assert np.allclose(resultat["standardavvik"], forventet["std"])
+    assert (resultat["min"] == forventet["min"]).all() and (resultat["maks"] == forventet["max"]).all()
+    # Medianen anslås fra histogrammet og er innenfor en halv oppløsning
+    assert (resultat["median"] - forventet["median"]).abs().max() <= 0.05 + 1e-9
@@ -0,0 +1,49 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from modellregister import Modellregister
+
+
+def test_modellen_trenes_bare_når_dataene_endres(tmp_path):
+    filsti = tmp_path / "data.csv"
+    pd.DataFrame({"value": [1.0, 2.0]}).to_csv(filsti, index=False)
+    treninger = []
+
+    def tren():
+        treninger.append(1)
+        return {"koeffisient": len(treninger)}
+
+    register = Modellregister(str(tmp_path / "modeller"), maks_versjoner=1)
+    modell, nøkkel = register.hent_eller_tren("test", {"by": "Oslo"}, str(filsti), tren)
+    assert register.hent_eller_tren("test", {"by": "Oslo"}, str(filsti), tren) == (modell, nøkkel)
+    # En Path til samme fil gir samme nøkkel
+    assert register.hent_eller_tren("test", {"by": "Oslo"}, filsti, tren) == (modell, nøkkel)
+
+    # Et nytt register (f.eks. en ny prosess) leser modellen fra disk
+    nytt = Modellregister(str(tmp_path / "modeller"), maks_versjoner=1)
+    assert nytt.hent_eller_tren("test", {"by": "Oslo"}, str(filsti), tren)[0] == {"koeffisient": 1}
+    # Annen konfigurasjon gir egen modell, og endrede data gir ny versjon som erstatter den gamle
+    nytt.hent_eller_tren("test", {"by": "Bergen"}, str(filsti), tren)
+    pd.DataFrame({"value": [1.0, 2.0, 3.0]}).to_csv(filsti, index=False)
+    assert nytt.hent_eller_tren("test", {"by": "Oslo"}, str(filsti), tren)[0] == {"koeffisient": 3}
+    assert len(treninger) == 3
+    assert len(nytt.oversikt()) == 2
+    assert not os.path.exists(os.path.join(str(tmp_path / "modeller"), f"{nøkkel}.pkl"))
+
+
+def test_prediksjoner_lagres_per_modell_og_tidsrom(tmp_path):
+    register = Modellregister(str(tmp_path))
+    beregninger = []
+
+    def beregn():
+        beregninger.append(1)
+        return pd.DataFrame({"by": ["Oslo"], "prognose": [1.5]})
+
+    første = register.hent_prediksjon("modell", "2024-01-01", "2024-01-02", beregn, by="Oslo")
+    register.hent_prediksjon("modell", "2024-01-01", "2024-01-02", beregn, by="Oslo")
+    assert Modellregister(str(tmp_path)).hent_prediksjon(
+        "modell", "2024-01-01", "2024-01-02", beregn, by="Oslo").equals(første)
+    register.hent_prediksjon("modell", "2024-01-03", "2024-01-03", beregn, by="Oslo")
+    assert len(beregninger) == 2
@@ -0,0 +1,38 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from nedsampling import lttb_indekser, min_maks_indekser, nedsample, nedsample_per_gruppe
+
+
+def lag_serie(antall=20_000):
+    x = pd.date_range("1970-01-01", periods=antall, freq="D").to_numpy()
+    y = np.sin(np.arange(antall) / 500) + np.random.default_rng(0).normal(0, 0.1, antall)
+    y[antall // 2 + 345] = 25.0
+    return x, y
+
+
+def test_lttb_og_min_maks_beholder_endepunkter_og_topper():
+    x, y = lag_serie()
+    for funksjon in (lttb_indekser, min_maks_indekser):
+        indekser = funksjon(x, y, 500)
+        assert len(indekser) <= 502
+        assert indekser[0] == 0 and indekser[-1] == len(y) - 1
+        assert (np.diff(indekser) > 0).all()
+        assert len(y) // 2 + 345 in indekser
+    # Min/maks tar med både laveste og høyeste verdi
+    assert np.argmin(y) in min_maks_indekser(x, y, 500)
+
+
+def test_nedsample_per_gruppe_hopper_over_manglende_verdier():
+    x, y = lag_serie(5000)
+    y[10] = np.nan
+    df = pd.DataFrame({"referenceTime": np.tile(x, 2), "value": np.tile(y, 2), "by": np.repeat(["Oslo", "Bergen"], 5000)})
+
+    nedsamplet = nedsample_per_gruppe(df, "referenceTime", "value", "by", maks_punkter=300)
+    assert list(nedsamplet["by"].unique()) == ["Oslo", "Bergen"]
+    assert (nedsamplet.groupby("by")["value"].size() == 300).all()
+    assert nedsamplet["value"].notna().all()
+    assert len(nedsample(x[:100], y[:100], maks_punkter=300)[0]) == 99
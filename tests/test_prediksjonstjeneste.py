@@ -0,0 +1,118 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import http.client
+import json
+import threading
+import urllib.request
+import numpy as np
+import pandas as pd
+from datasett import VaerDatasett
+from modellregister import Modellregister
+from prediksjonstjeneste import Prediksjonstjeneste, lag_server, kjør_batch
+from prediktiv_analyse import tren_modeller
+
+
+def lag_data(antall_dager=400):
+    rng = np.random.default_rng(7)
+    datoer = pd.date_range("2000-01-01", periods=antall_dager, freq="D").strftime("%Y-%m-%d")
+    normal = -10 * np.cos(2 * np.pi * np.arange(antall_dager) / 365.25)
+    deler = []
+    for by in ["Oslo", "Bergen", "Tromsø"]:
+        temperatur = normal + rng.normal(0, 2, antall_dager)
+        nedbør = np.maximum(0, 2 + 0.1 * temperatur + rng.normal(0, 3, antall_dager))
+        for variabel, verdier in (("air_temperature P1D", temperatur), ("precipitation_amount P1D", nedbør)):
+            deler.append(pd.DataFrame({"by": by, "referenceTime": datoer, "variable": variabel, "value": verdier}))
+    return pd.concat(deler, ignore_index=True)
+
+
+def lag_tjeneste(tmp_path):
+    datasett = VaerDatasett(lag_data())
+    return datasett, Prediksjonstjeneste(datasett, register=Modellregister(str(tmp_path)))
+
+
+def test_bunke_gir_samme_svar_som_modellene(tmp_path):
+    datasett, tjeneste = lag_tjeneste(tmp_path)
+    modeller = tren_modeller(datasett).set_index(["by", "maalvariabel"])
+
+    svar = tjeneste.prediker([
+        {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {"nedbør": 2.0}},
+        {"by": "Bergen", "maalvariabel": "nedbør", "egenskaper": {"temperatur": -3.0}},
+        {"by": "Oslo"},
+        {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {}},
+        {"by": "Paris", "maalvariabel": "temperatur", "egenskaper": {"nedbør": 1.0}},
+        {"by": "Oslo", "dato": "1999-01-01"},
+    ])
+
+    oslo = modeller.loc[("Oslo", "temperatur")]
+    bergen = modeller.loc[("Bergen", "nedbør")]
+    assert np.isclose(svar[0]["prediksjon"], oslo["skjæringspunkt"] + 2.0 * oslo["koef_nedbør"])
+    assert np.isclose(svar[1]["prediksjon"], bergen["skjæringspunkt"] - 3.0 * bergen["koef_temperatur"])
+    assert svar[2]["dato"] == "2001-02-04" and svar[2]["prediksjon"] is not None
+    assert ["feil" in s for s in svar[3:]] == [True, True, True]
+    statistikk = tjeneste.statistikk()
+    assert statistikk["antall_kall"] == 1 and statistikk["antall_prediksjoner"] == 6
+
+
+def test_ugyldig_forespørsel_gir_feil_bare_for_seg_selv(tmp_path):
+    _, tjeneste = lag_tjeneste(tmp_path)
+    gyldig = {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {"nedbør": 2.0}}
+
+    svar = tjeneste.prediker([
+        gyldig,
+        {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": [1.0]},
+        {"by": "Oslo", "maalvariabel": "temperatur", "egenskaper": {"nedbør": "abc"}},
+        {"by": ["Oslo"], "maalvariabel": "temperatur", "egenskaper": {"nedbør": 1.0}},
+        gyldig,
+    ])
+
+    assert ["feil" in s for s in svar] == [False, True, True, True, False]
+    assert svar[0] == svar[4] == tjeneste.prediker(gyldig)
+
+    # Prognoseforespørsler (uten egenskaper) sjekkes også hver for seg
+    svar = tjeneste.prediker([{"by": ["Oslo"]}, {"by": "Oslo", "dato": {"a": 1}}, {"by": "Oslo", "dato": "abc"},
+                              {"by": "Oslo"}])
+    assert ["feil" in s for s in svar] == [True, True, True, False]
+
+
+def test_kjør_batch_gir_feil_for_ugyldig_linje(tmp_path):
+    _, tjeneste = lag_tjeneste(tmp_path)
+    inn, ut = tmp_path / "inn.jsonl", tmp_path / "ut.jsonl"
+    inn.write_text('{"by": "Oslo"}\n{"by": \n\n{"by": "Bergen"}\n', encoding="utf-8")
+
+    kjør_batch(tjeneste, str(inn), str(ut), bitestørrelse=2)
+
+    svar = [json.loads(linje) for linje in ut.read_text(encoding="utf-8").splitlines()]
+    assert [s.get("by") for s in svar] == ["Oslo", None, "Bergen"]
+    assert "linje 2" in svar[1]["feil"]
+
+
+def test_http_server(tmp_path):
+    _, tjeneste = lag_tjeneste(tmp_path)
+    server = lag_server(tjeneste, port=0)
+    tråd = threading.Thread(target=server.serve_forever, daemon=True)
+    tråd.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        forespørsel = urllib.request.Request(f"{url}/prediker", method="POST",
+                                             data=json.dumps({"by": "Tromsø"}).encode("utf-8"))
+        with urllib.request.urlopen(forespørsel) as respons:
+            assert json.load(respons)["by"] == "Tromsø"
+        with urllib.request.urlopen(f"{url}/statistikk") as respons:
+            statistikk = json.load(respons)
+        assert statistikk["antall_kall"] == 1 and statistikk["p99_ms"] is not None
+
+        # Uten gyldig Content-Length svares det med 400
+        tilkobling = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        for hode in ({}, {"Content-Length": "abc"}):
+            tilkobling.putrequest("POST", "/prediker")
+            for navn, verdi in hode.items():
+                tilkobling.putheader(navn, verdi)
+            tilkobling.endheaders()
+            respons = tilkobling.getresponse()
+            assert respons.status == 400 and "Content-Length" in json.loads(respons.read())["feil"]
+        tilkobling.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from prediktiv_analyse import hent_og_strukturer_data, filtrer_byer, tren_modell, tren_modeller
+from datasett import VaerDatasett
+
+
+def lag_behandlet_data():
+    return pd.DataFrame({
+        'by': ['Oslo', 'Oslo', 'Oslo', 'Bergen', 'Bergen', 'Oslo', 'Oslo'],
+        'referenceTime': ['2022-01-01', '2022-01-01', '2022-01-01', '2022-01-01', '2022-01-01', '2022-01-02', '2022-01-02'],
+        'variable': ['air_temperature P1D', 'precipitation_amount P1D', 'wind_speed P1D',
+                     'air_temperature P1D', 'precipitation_amount P1D', 'air_temperature P1D', 'wind_speed P1D'],
+        'value': [1.0, 2.0, 3.0, 5.0, 10.0, -1.0, 4.0],
+    })
+
+
+def test_hent_og_strukturer_data_for_by_og_alle_byer(tmp_path):
+    filsti = tmp_path / "BehandletVaerData.csv"
+    lag_behandlet_data().to_csv(filsti, index=False)
+
+    oslo = hent_og_strukturer_data(str(filsti), by='Oslo')
+    alle = hent_og_strukturer_data(str(filsti))
+
+    # 2. januar mangler nedbør i Oslo og fjernes
+    assert list(oslo.columns) == ['dato', 'temperatur', 'nedbør']
+    assert list(oslo['temperatur']) == [1.0]
+    # Uten by brukes gjennomsnittet på tvers av byene
+    assert list(alle['temperatur']) == [3.0]
+    assert list(alle['nedbør']) == [6.0]
+
+
+def test_datasett_leser_filen_bare_en_gang(tmp_path, monkeypatch):
+    filsti = tmp_path / "BehandletVaerData.csv"
+    lag_behandlet_data().to_csv(filsti, index=False)
+
+    antall_innlesinger = []
+    original = VaerDatasett.fra_fil.__func__
+    monkeypatch.setattr(VaerDatasett, 'fra_fil',
+                        classmethod(lambda cls, f: antall_innlesinger.append(f) or original(cls, f)))
+
+    assert filtrer_byer(str(filsti)) == ['Oslo', 'Bergen']
+    hent_og_strukturer_data(str(filsti), by='Oslo')
+    hent_og_strukturer_data(str(filsti), by='Bergen')
+
+    assert len(antall_innlesinger) == 1
+
+
+def test_import_laster_ikke_plotte_eller_ml_biblioteker():
+    import subprocess
+    kode = ("import sys, prediktiv_analyse, statistikk_funksjoner; "
+            "print([m for m in ('matplotlib', 'seaborn', 'plotly', 'sklearn', 'scipy') if m in sys.modules])")
+    src = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+    utdata = subprocess.run([sys.executable, "-c", kode], cwd=src, capture_output=True, text=True, check=True)
+    assert utdata.stdout.strip() == "[]"
+
+
+def test_tren_modeller_gir_samme_resultat_som_tren_modell_per_by():
+    rng = np.random.default_rng(0)
+    datoer = pd.date_range("2000-01-01", periods=200, freq="D").strftime("%Y-%m-%d")
+    deler = []
+    for by in ["Oslo", "Bergen", "Tromsø"]:
+        temperatur = rng.normal(5, 8, len(datoer))
+        nedbør = np.abs(0.3 * temperatur + rng.normal(0, 2, len(datoer)))
+        for variabel, verdier in (("air_temperature P1D", temperatur), ("precipitation_amount P1D", nedbør)):
+            beholdes = rng.random(len(datoer)) > 0.1
+            deler.append(pd.DataFrame({"by": by, "referenceTime": datoer[beholdes], "variable": variabel,
+                                       "value": verdier[beholdes]}))
+    datasett = VaerDatasett(pd.concat(deler, ignore_index=True))
+
+    resultat = tren_modeller(datasett)
+    assert len(resultat) == 6
+    for _, rad in resultat.iterrows():
+        data = hent_og_strukturer_data(datasett, by=rad["by"])
+        modell, _, y_test, _, r2, mape = tren_modell(data, rad["maalvariabel"])
+        forklarende = "nedbør" if rad["maalvariabel"] == "temperatur" else "temperatur"
+        assert np.isclose(modell.intercept_, rad["skjæringspunkt"])
+        assert np.isclose(modell.coef_[0], rad[f"koef_{forklarende}"])
+        assert np.isclose(r2, rad["r2"]) and np.isclose(mape, rad["mape"])
+        assert rad["antall_test"] == len(y_test)
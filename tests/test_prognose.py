@@ -0,0 +1,82 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from datasett import VaerDatasett
+from modellregister import Modellregister
+from prognose import Prognosemodell, lag_egenskaper, prognose_neste_dag, walk_forward
+
+
+def lag_data(antall_dager=3 * 365):
+    rng = np.random.default_rng(5)
+    datoer = pd.date_range("2000-01-01", periods=antall_dager, freq="D")
+    deler = []
+    for by in ["Oslo", "Bergen", "Tromsø"]:
+        # Temperatur som følger årstiden og gårsdagen, slik at den kan forutsies
+        temperatur = np.empty(antall_dager)
+        temperatur[0] = 0
+        for t in range(1, antall_dager):
+            normal = -10 * np.cos(2 * np.pi * t / 365.25)
+            temperatur[t] = normal + 0.7 * (temperatur[t - 1] + 10 * np.cos(2 * np.pi * (t - 1) / 365.25)) \
+                + rng.normal(0, 2)
+        nedbør = np.maximum(0, rng.normal(2, 3, antall_dager))
+        for variabel, verdier in (("air_temperature P1D", temperatur), ("precipitation_amount P1D", nedbør)):
+            beholdes = rng.random(antall_dager) > 0.05
+            deler.append(pd.DataFrame({"by": by, "referenceTime": datoer[beholdes].strftime("%Y-%m-%d"),
+                                       "variable": variabel, "value": verdier[beholdes]}))
+    return pd.concat(deler, ignore_index=True)
+
+
+def test_egenskapene_bruker_bare_dagene_før():
+    verdier = np.arange(10, dtype=np.float64).reshape(1, 10, 1)
+    X = lag_egenskaper(verdier, pd.date_range("2020-01-01", periods=10), forsinkelser=(1, 3), vinduer=(4,))
+    # Dag 5: verdien i går (4), for tre dager siden (2) og snittet av dag 1-4 (2.5)
+    assert list(X[0, 5, :3]) == [4.0, 2.0, 2.5]
+    assert np.isnan(X[0, 0, 0]) and np.isnan(X[0, 1, 2])
+    # Uten verdi for tre dager siden brukes snittet av dagene før (0 og 1) i stedet
+    assert X[0, 2, 1] == 0.5
+
+    # Samme erstatning når en dag mangler i serien, både for trening og prognose
+    verdier[0, 6, 0] = np.nan
+    X = lag_egenskaper(verdier, pd.date_range("2020-01-01", periods=10), forsinkelser=(1, 3), vinduer=(4,))
+    assert X[0, 7, 0] == X[0, 7, 2] == np.mean([3.0, 4.0, 5.0])
+
+
+def test_oppdatering_gir_samme_modell_som_trening_fra_bunnen():
+    df = lag_data()
+    tid = pd.to_datetime(df["referenceTime"])
+    hel = Prognosemodell().tren(VaerDatasett(df))
+
+    inkrementell = Prognosemodell().tren(df[tid < "2001-06-01"])
+    inkrementell.oppdater(df[(tid >= "2001-06-01") & (tid < "2002-03-01")])
+    inkrementell.oppdater(df[tid >= "2002-03-01"])
+
+    assert np.allclose(hel.koeffisienter().to_numpy(), inkrementell.koeffisienter().to_numpy())
+    pd.testing.assert_frame_equal(hel.prediker(), inkrementell.prediker())
+
+
+def test_walk_forward_slår_persistens():
+    resultat = walk_forward(VaerDatasett(lag_data()), antall_fold=3)
+    assert len(resultat) == 9
+    assert list(resultat["by"].unique()) == ["Oslo", "Bergen", "Tromsø"]
+    # Testperiodene kommer etter hverandre, og modellen er bedre enn å bruke gårsdagens verdi
+    assert (resultat.groupby("by")["fra_dato"].diff().dropna() > pd.Timedelta(0)).all()
+    assert resultat["mae"].mean() < resultat["mae_persistens"].mean()
+
+
+def test_prognose_neste_dag_trener_bare_første_gang(tmp_path, monkeypatch):
+    filsti = str(tmp_path / "BehandletVaerData.csv")
+    lag_data(400).to_csv(filsti, index=False)
+    register = Modellregister(str(tmp_path / "modeller"))
+
+    første = prognose_neste_dag(filsti, by="Bergen", register=register)
+    assert list(første["dato"]) == [pd.Timestamp("2001-02-04")]
+    assert første["prognose"].notna().all()
+
+    monkeypatch.setattr(Prognosemodell, "tren", lambda *args: (_ for _ in ()).throw(AssertionError("trener")))
+    pd.testing.assert_frame_equal(prognose_neste_dag(filsti, by="Bergen", register=register), første)
+    # Samme fil som Path bruker den samme lagrede modellen
+    pd.testing.assert_frame_equal(prognose_neste_dag(tmp_path / "BehandletVaerData.csv", by="Bergen",
+                                                     register=register), første)
@@ -0,0 +1,121 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from statistikk_funksjoner import beregn_all_statistikk, beregn_statistikk
+
+
+def lag_data():
+    rng = np.random.default_rng(1)
+    datoer = pd.date_range("2022-01-01", periods=60, freq="7D")
+    rader = []
+    for by in ["Oslo", "Bergen"]:
+        for variabel in ["air_temperature P1D", "precipitation_amount P1D"]:
+            for dato in datoer:
+                rader.append({"by": by, "variable": variabel, "referenceTime": dato.isoformat(),
+                              "value": rng.normal()})
+    df = pd.DataFrame(rader)
+    df.loc[3, "value"] = np.nan
+    return df
+
+
+def test_beregn_all_statistikk_stemmer_med_groupby_per_gruppe():
+    df = lag_data()
+    resultat = beregn_all_statistikk(df, periode="sesong").set_index(["by", "variable", "sesong"])
+
+    df["sesong"] = pd.to_datetime(df["referenceTime"]).dt.month.map(
+        {12: "DJF", 1: "DJF", 2: "DJF", 3: "MAM", 4: "MAM", 5: "MAM",
+         6: "JJA", 7: "JJA", 8: "JJA", 9: "SON", 10: "SON", 11: "SON"})
+    gruppert = df.groupby(["by", "variable", "sesong"])["value"]
+
+    assert np.allclose(resultat["median"], gruppert.median().reindex(resultat.index))
+    assert np.allclose(resultat["p05"], gruppert.quantile(0.05).reindex(resultat.index))
+    assert np.allclose(resultat["standardavvik"], gruppert.std().reindex(resultat.index))
+    assert (resultat["antall"] == gruppert.count().reindex(resultat.index)).all()
+
+
+def test_beregn_statistikk_beholder_format_og_gjenbruker_resultat():
+    df = lag_data()
+    temperatur = beregn_statistikk(df, "air_temperature P1D", "lufttemperatur")
+    nedbør = beregn_statistikk(df, "precipitation_amount P1D", "nedbør", statistikk=("maks", "p95"))
+
+    forventet = df[df["variable"] == "air_temperature P1D"].groupby("by")["value"].agg(
+        gjennomsnitt="mean", median="median", standardavvik="std")
+    pd.testing.assert_frame_equal(temperatur, forventet, check_names=False)
+    assert list(nedbør.columns) == ["maks", "p95"]
+    pd.testing.assert_frame_equal(beregn_statistikk(df, "air_temperature P1D", "lufttemperatur", versjon=1), temperatur)
+
+
+def test_beregn_all_statistikk_cache_er_begrenset_og_leser_fil_bare_ved_endring(tmp_path, monkeypatch):
+    import statistikk_funksjoner
+    df = lag_data()
+    statistikk_funksjoner._statistikk_cache.clear()
+    # En DataFrame uten versjon mellomlagres ikke (og hashes ikke)
+    monkeypatch.setattr(pd.util, "hash_pandas_object", None)
+    beregn_all_statistikk(df)
+    assert len(statistikk_funksjoner._statistikk_cache) == 0
+    for i in range(statistikk_funksjoner.MAKS_STATISTIKK_CACHE + 3):
+        beregn_all_statistikk(df.assign(value=df["value"] + i), versjon=i)
+    assert len(statistikk_funksjoner._statistikk_cache) == statistikk_funksjoner.MAKS_STATISTIKK_CACHE
+    # Med samme versjon brukes resultatet fra cachen, selv om tabellen er en annen
+    siste = statistikk_funksjoner.MAKS_STATISTIKK_CACHE + 2
+    pd.testing.assert_frame_equal(beregn_all_statistikk(df, versjon=siste),
+                                  beregn_all_statistikk(df.assign(value=df["value"] + siste)))
+
+    filsti = str(tmp_path / "data.csv")
+    df.to_csv(filsti, index=False)
+    innlesinger = []
+    original = statistikk_funksjoner.les_data
+    monkeypatch.setattr(statistikk_funksjoner, "les_data", lambda *a, **k: innlesinger.append(a) or original(*a, **k))
+    fra_fil = beregn_all_statistikk(filsti)
+    pd.testing.assert_frame_equal(beregn_all_statistikk(filsti), fra_fil)
+    assert len(innlesinger) == 1
+    pd.testing.assert_frame_equal(fra_fil, beregn_all_statistikk(df), check_dtype=False)
+
+def test_korrelasjonsmatrise_handterer_manglende_dager_parvis():
+    from scipy.stats import pearsonr
+    from statistikk_funksjoner import beregn_korrelasjonsmatrise
+
+    df = lag_data()
+    korrelasjon = beregn_korrelasjonsmatrise(df, metode="pearson")
+    kolonner = korrelasjon["r"].columns
+    assert len(kolonner) == 4
+
+    # Oslo mangler én dag for temperatur; paret bruker bare de felles datoene
+    oslo_temp, bergen_nedbør = ("Oslo", "air_temperature P1D"), ("Bergen", "precipitation_amount P1D")
+    x = df[(df["by"] == "Oslo") & (df["variable"] == "air_temperature P1D")]["value"].to_numpy()
+    y = df[(df["by"] == "Bergen") & (df["variable"] == "precipitation_amount P1D")]["value"].to_numpy()
+    felles = ~np.isnan(x) & ~np.isnan(y)
+    r, p = pearsonr(x[felles], y[felles])
+
+    assert korrelasjon["n"].loc[oslo_temp, bergen_nedbør] == felles.sum()
+    assert np.isclose(korrelasjon["r"].loc[oslo_temp, bergen_nedbør], r)
+    assert np.isclose(korrelasjon["p"].loc[oslo_temp, bergen_nedbør], p)
+
+
+def test_interaktiv_by_og_variabel_plot_endrer_ikke_df_og_ordner_spor_per_by(monkeypatch):
+    import plotly.graph_objects as go
+    from statistikk_funksjoner import interaktiv_by_og_variabel_plot
+
+    viste = []
+    monkeypatch.setattr(go.Figure, "show", lambda self, *args, **kwargs: viste.append(self))
+    df = lag_data()
+    kopi = df.copy()
+    interaktiv_by_og_variabel_plot(df, maks_punkter=20)
+
+    pd.testing.assert_frame_equal(df, kopi)
+    figur = viste[0]
+    assert [spor.name for spor in figur.data][:4] == [
+        "Oslo – Temperatur (°C)", "Oslo – Nedbør (mm)", "Oslo – Vindstyrke (m/s)", "Bergen – Temperatur (°C)"]
+    # Knappen for Bergen viser temperaturen i Bergen
+    synlig = figur.layout.updatemenus[0].buttons[1].args[0]["visible"]
+    assert [spor.name for spor, vis in zip(figur.data, synlig) if vis] == ["Bergen – Temperatur (°C)"]
+    # Sporene for samme by deler x-akse
+    assert list(figur.data[0].x) == list(figur.data[1].x)
+    # Datoer der bare en annen variabel har verdi, bryter ikke linjen
+    assert all(spor.connectgaps for spor in figur.data)
+    # Med vis=False returneres figuren uten å vises
+    assert interaktiv_by_og_variabel_plot(df, maks_punkter=20, vis=False) is not None
+    assert len(viste) == 1
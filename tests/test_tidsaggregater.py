@@ -0,0 +1,51 @@
+import sys
+import os
+# Legger til src-mappen i Python's søkesti
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+from tidsaggregater import beregn_aggregater, oppdater_aggregater, bygg_aggregater, les_aggregater
+
+
+def lag_data():
+    datoer = pd.date_range("2021-11-25", "2022-03-05", freq="D")
+    return pd.DataFrame({
+        "by": np.repeat(["Oslo", "Bergen"], len(datoer)),
+        "referenceTime": np.tile(datoer.strftime("%Y-%m-%d"), 2),
+        "variable": "air_temperature P1D",
+        "value": np.arange(2 * len(datoer), dtype=float),
+    })
+
+
+def test_aggregater_per_maned_og_sesong():
+    df = lag_data()
+    aggregater = beregn_aggregater(df)
+
+    måned = aggregater["måned"].set_index(["by", "periode"])
+    forventet = df.assign(måned=pd.to_datetime(df["referenceTime"]).dt.to_period("M").dt.to_timestamp())
+    forventet = forventet.groupby(["by", "måned"])["value"].mean()
+    assert np.allclose(måned["gjennomsnitt"].sort_index(), forventet.sort_index())
+
+    # Desember 2021 og januar/februar 2022 er samme vinter (DJF), som starter 1. desember
+    sesong = aggregater["sesong"]
+    oslo = sesong[sesong["by"] == "Oslo"].set_index("periode")["antall"]
+    assert oslo[pd.Timestamp("2021-12-01")] == 31 + 31 + 28
+    assert set(pd.to_datetime(aggregater["uke"]["periode"]).dt.dayofweek) == {0}
+
+
+def test_oppdater_aggregater_gir_samme_som_full_bygging(tmp_path):
+    df = lag_data()
+    filsti = tmp_path / "BehandletVaerData.csv"
+    df.to_csv(filsti, index=False)
+    bygg_aggregater(str(filsti), str(tmp_path / "hele"), bitestørrelse=50)
+
+    # Først de gamle dagene, så de nye dagene for seg
+    ny_dag = df["referenceTime"] >= "2022-02-15"
+    oppdater_aggregater(df[~ny_dag], str(tmp_path / "løpende"))
+    oppdater_aggregater(df[ny_dag], str(tmp_path / "løpende"))
+
+    for oppløsning in ("uke", "måned", "sesong", "år"):
+        hele = les_aggregater(str(tmp_path / "hele"), oppløsning)
+        løpende = les_aggregater(str(tmp_path / "løpende"), oppløsning)
+        pd.testing.assert_frame_equal(hele, løpende)
+    assert len(les_aggregater(str(tmp_path / "hele"), "måned", by="Oslo")) == 5